@@ -0,0 +1,199 @@
+"""
+Admission control for robot runs.
+
+Every run on a host is admitted against the capacity of that host before robot starts: at most MAX_CONCURRENT_RUNS
+runs at once, at most the application's max_concurrent_runs (or MAX_RUNS_PER_APPLICATION) of one application, and
+none while less than MIN_AVAILABLE_MEMORY_MB of memory is available. A run over capacity waits as a ``queued``
+RobotExecution, in submission order, for up to ADMISSION_QUEUE_TIMEOUT seconds; when the queue is full or the wait
+times out it is rejected with a RobotAdmissionException telling the caller when to retry. Rejections are counted in
+the cache, per host. The capacity check and the start of the run happen in one transaction that first writes the
+RobotHost row of the host, which takes its write lock in every database, so concurrent admissions on one host are
+serialized and cannot both take the last free slot.
+"""
+import logging
+import math
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from testrunner.models import RobotExecution, RobotHost
+from . import metrics
+from .exceptions import RobotAdmissionException
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_RUNS = getattr(settings, 'TESTRUNNER_MAX_CONCURRENT_RUNS', None) or os.cpu_count() or 1
+MAX_RUNS_PER_APPLICATION = getattr(settings, 'TESTRUNNER_MAX_RUNS_PER_APPLICATION', None)
+MIN_AVAILABLE_MEMORY_MB = getattr(settings, 'TESTRUNNER_MIN_AVAILABLE_MEMORY_MB', 512)
+ADMISSION_QUEUE_TIMEOUT = getattr(settings, 'TESTRUNNER_ADMISSION_QUEUE_TIMEOUT', 0)
+MAX_QUEUED_RUNS = getattr(settings, 'TESTRUNNER_MAX_QUEUED_RUNS', 20)
+ADMISSION_RETRY_AFTER = getattr(settings, 'TESTRUNNER_ADMISSION_RETRY_AFTER', 30)
+ADMISSION_POLL_INTERVAL = 2
+
+
+def available_memory_mb():
+    """The memory available for new processes (MemAvailable in /proc/meminfo), or None where it is unknown."""
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _host_executions(status):
+    return RobotExecution.objects.filter(host=socket.gethostname(), status=status)
+
+
+def capacity_problem(application, execution=None):
+    """
+    Why a run of ``application`` cannot start on this host now, or None if it can.
+    :param execution: the RobotExecution of the run if it is queued already, so it only waits for the runs queued
+    before it.
+    """
+    queued = _host_executions('queued')
+    if execution is not None and execution.status == 'queued':
+        queued = queued.filter(pk__lt=execution.pk)
+    if queued.exists():
+        return 'Earlier runs are queued.'
+    running = _host_executions('in progress')
+    if running.count() >= MAX_CONCURRENT_RUNS:
+        return 'This host runs {n} robot processes at once at most.'.format(n=MAX_CONCURRENT_RUNS)
+    limit = application.max_concurrent_runs
+    limit = MAX_RUNS_PER_APPLICATION if limit is None else limit
+    if limit is not None and running.filter(application=application).count() >= limit:
+        return '{app} runs {n} robot processes at once at most.'.format(app=application.name, n=limit)
+    memory = available_memory_mb()
+    if memory is not None and memory < MIN_AVAILABLE_MEMORY_MB:
+        return 'Only {m} MB of memory is available.'.format(m=memory)
+    return None
+
+
+def retry_after(now=None):
+    """The number of seconds until the first run on this host is expected to finish, ADMISSION_RETRY_AFTER at least."""
+    now = now or timezone.now()
+    first_end = _host_executions('in progress').aggregate(first_end=Min('estimated_end'))['first_end']
+    if first_end is None:
+        return ADMISSION_RETRY_AFTER
+    return max(ADMISSION_RETRY_AFTER, math.ceil((first_end - now).total_seconds()))
+
+
+def _lock_host():
+    """Take the write lock of the RobotHost row of this host, until the end of the current transaction."""
+    host = socket.gethostname()
+    if not RobotHost.objects.filter(name=host).update(last_admission=timezone.now()):
+        RobotHost.objects.get_or_create(name=host)
+        RobotHost.objects.filter(name=host).update(last_admission=timezone.now())
+
+
+def _try_admit(application, execution=None, **fields):
+    """
+    Start a run of ``application`` if this host has capacity for it, in one transaction with the capacity check.
+    :param execution: the queued or ``waiting`` RobotExecution of the run; a new one is created with ``fields``
+    otherwise.
+    :return: a tuple of the ``in progress`` RobotExecution (or None) and the capacity problem (or None).
+    """
+    with transaction.atomic():
+        _lock_host()
+        problem = capacity_problem(application, execution)
+        if problem is not None:
+            return None, problem
+        if execution is None:
+            return RobotExecution.objects.create(application=application, status='in progress',
+                                                 host=socket.gethostname(), worker_pid=os.getpid(), **fields), None
+        execution.status, execution.start_time = 'in progress', timezone.now()
+        execution.save(update_fields=['status', 'start_time'])
+        return execution, None
+
+
+def _queue(application, execution=None, **fields):
+    """
+    Queue a run of ``application`` unless the queue of this host is full. A ``waiting`` ``execution`` is queued in
+    the place of its primary key, ahead of the runs queued since it was created, as it holds its resources already.
+    :return: the queued RobotExecution, or None.
+    """
+    with transaction.atomic():
+        _lock_host()
+        if _host_executions('queued').count() >= MAX_QUEUED_RUNS:
+            return None
+        if execution is None:
+            return RobotExecution.objects.create(application=application, status='queued', host=socket.gethostname(),
+                                                 worker_pid=os.getpid(), **fields)
+        execution.status = 'queued'
+        execution.save(update_fields=['status'])
+        return execution
+
+
+def _rejection_key():
+    return 'testrunner:admission-rejected:{host}'.format(host=socket.gethostname())
+
+
+def _reject(problem):
+    if not cache.add(_rejection_key(), 1, timeout=None):
+        cache.incr(_rejection_key())
+    metrics.ADMISSIONS.inc(outcome='rejected')
+    seconds = retry_after()
+    logger.warning('Rejected a robot run: {p} Retry after {s} seconds.'.format(p=problem, s=seconds))
+    raise RobotAdmissionException(problem, seconds)
+
+
+def rejected_runs():
+    """The number of runs rejected on this host since the cache was last cleared."""
+    return cache.get(_rejection_key(), 0)
+
+
+def admission_status():
+    """The capacity of this host and how much of it is in use, for monitoring."""
+    return {'host': socket.gethostname(),
+            'running': _host_executions('in progress').count(),
+            'queued': _host_executions('queued').count(),
+            'waiting': _host_executions('waiting').count(),
+            'max_concurrent_runs': MAX_CONCURRENT_RUNS,
+            'max_queued_runs': MAX_QUEUED_RUNS,
+            'available_memory_mb': available_memory_mb(),
+            'min_available_memory_mb': MIN_AVAILABLE_MEMORY_MB,
+            'rejected': rejected_runs()}
+
+
+def admit_execution(application, queue_timeout=None, poll_interval=None, execution=None, **fields):
+    """
+    Create the RobotExecution of a run of ``application`` once this host has capacity for it, waiting in the queue
+    for at most ``queue_timeout`` seconds (ADMISSION_QUEUE_TIMEOUT by default).
+    :param execution: the RobotExecution of the run if it was created before admission, ``waiting`` for resources
+    (see robotapi.locks). It is started instead of a new one, and deleted with its locks when the run is rejected.
+    :param fields: further fields of a new RobotExecution.
+    :return: the admitted, ``in progress`` RobotExecution.
+    :raises RobotAdmissionException: when the host has no capacity and the queue is full or the wait timed out.
+    """
+    queue_timeout = ADMISSION_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+    poll_interval = ADMISSION_POLL_INTERVAL if poll_interval is None else poll_interval
+    admitted, problem = _try_admit(application, execution, **fields)
+    if admitted is not None:
+        metrics.ADMISSIONS.inc(outcome='admitted')
+        metrics.QUEUE_WAIT_SECONDS.observe(0)
+        return admitted
+    queued = _queue(application, execution, **fields) if queue_timeout > 0 else None
+    if queued is None:
+        if execution is not None:
+            execution.delete()
+        _reject(problem)
+    queued_since = time.monotonic()
+    deadline = queued_since + queue_timeout
+    logger.info('{e} is queued: {p}'.format(e=queued, p=problem))
+    while admitted is None:
+        if time.monotonic() >= deadline:
+            queued.delete()
+            _reject(problem)
+        time.sleep(poll_interval)
+        admitted, problem = _try_admit(application, queued)
+    metrics.ADMISSIONS.inc(outcome='queued')
+    metrics.QUEUE_WAIT_SECONDS.observe(time.monotonic() - queued_since)
+    return admitted
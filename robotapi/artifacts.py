@@ -0,0 +1,154 @@
+"""
+Content-addressed storage for the artifacts of robot runs.
+
+Every file a run promotes (see robotapi.workspace) is stored once per distinct content: a RobotArtifactBlob keyed by
+the SHA-256 of the file, gzip compressed under TESTRUNNER_BLOB_ROOT. A RobotArtifact links each run's file name to its
+blob, so screenshots and other files that are byte-identical across runs take the space of one. Only the output.xml
+of each run and its log index stay on disk uncompressed, because merging reruns and reading the log need them.
+``prune_artifacts`` applies the retention of each application and removes the blobs no run refers to any more.
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import ProtectedError
+from django.utils import timezone
+
+from testrunner.models import RobotApplicationUnderTest, RobotArtifact, RobotArtifactBlob, RobotExecution
+from .logindex import LOG_INDEX_SUFFIX
+from .workspace import artifact_dir
+
+logger = logging.getLogger(__name__)
+
+BLOB_ROOT = getattr(settings, 'TESTRUNNER_BLOB_ROOT', os.path.join(settings.BASE_DIR, 'blobs'))
+ARTIFACT_RETENTION_DAYS = getattr(settings, 'TESTRUNNER_ARTIFACT_RETENTION_DAYS', None)
+# Files kept in the artifact directory of a run next to their blob.
+WORKING_FILES = ('output.xml',)
+# Blobs created or reused more recently than this are never pruned, so a run storing a blob that already exists does not
+# lose it to a concurrent prune.
+PRUNE_GRACE_PERIOD = timedelta(hours=1)
+PRUNE_BATCH_SIZE = 500
+
+
+def blob_path(digest):
+    return os.path.join(BLOB_ROOT, digest[:2], digest[2:4], digest + '.gz')
+
+
+def _digest(path):
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as source:
+        for block in iter(lambda: source.read(65536), b''):
+            digest.update(block)
+            size += len(block)
+    return digest.hexdigest(), size
+
+
+def store_blob(path):
+    """Store the content of a file, compressed, unless the same content is stored already. Returns its blob."""
+    digest, size = _digest(path)
+    blob = RobotArtifactBlob.objects.filter(digest=digest).first()
+    if blob is not None and os.path.isfile(blob_path(digest)):
+        # Restart the grace period of the blob; if a prune deleted it in the meantime, store it again.
+        if RobotArtifactBlob.objects.filter(pk=blob.pk).update(created=timezone.now()):
+            return blob
+        blob = None
+    destination = blob_path(digest)
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(destination), delete=False) as compressed:
+        with open(path, 'rb') as source, gzip.GzipFile(fileobj=compressed, mode='wb', mtime=0) as target:
+            shutil.copyfileobj(source, target, 65536)
+    os.replace(compressed.name, destination)
+    if blob is None:
+        try:
+            blob = RobotArtifactBlob.objects.create(digest=digest, size=size, stored_size=os.path.getsize(destination))
+        except IntegrityError:  # Stored by a concurrent run in the meantime
+            blob = RobotArtifactBlob.objects.get(digest=digest)
+    return blob
+
+
+def store_artifacts(execution, directory):
+    """
+    Store every file below ``directory`` but log indexes as an artifact of ``execution``, replacing the artifacts of the
+    same name, and remove the stored files from the directory except for the WORKING_FILES.
+    :return: the list of RobotArtifact objects.
+    """
+    artifacts = list()
+    for path, _, files in os.walk(directory):
+        for file_name in files:
+            file_path = os.path.join(path, file_name)
+            if file_name.endswith(LOG_INDEX_SUFFIX):
+                continue    # Derived from the output.xml next to it, see robotapi.logindex
+            name = os.path.relpath(file_path, directory).replace(os.path.sep, '/')
+            content_type = mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+            artifact, _ = RobotArtifact.objects.update_or_create(execution=execution, name=name,
+                                                                 defaults={'blob': store_blob(file_path),
+                                                                           'content_type': content_type})
+            artifacts.append(artifact)
+            if name not in WORKING_FILES:
+                os.remove(file_path)
+    logger.info('Stored {n} artifacts of {e}'.format(n=len(artifacts), e=execution))
+    return artifacts
+
+
+def open_blob(blob, decompress=False):
+    """Open the content of a blob for reading, as stored (gzip compressed) or decompressed."""
+    return gzip.open(blob_path(blob.digest), 'rb') if decompress else open(blob_path(blob.digest), 'rb')
+
+
+def prune_artifacts(now=None):
+    """
+    Delete the artifacts of finished runs older than the retention of their application (its artifact_retention_days,
+    or TESTRUNNER_ARTIFACT_RETENTION_DAYS), together with their artifact directories and log indexes, then the blobs no
+    artifact refers to any more.
+    :return: a tuple of the number of deleted artifacts and the number of deleted blobs.
+    """
+    now = now or timezone.now()
+    deleted_artifacts = 0
+    for application in RobotApplicationUnderTest.objects.all():
+        days = application.artifact_retention_days
+        days = ARTIFACT_RETENTION_DAYS if days is None else days
+        if days is None:
+            continue
+        expired = RobotExecution.objects.filter(application=application, end_time__lt=now - timedelta(days=days))
+        for execution in expired.filter(artifact__isnull=False).distinct():
+            deleted_artifacts += RobotArtifact.objects.filter(execution=execution).delete()[0]
+            directory = artifact_dir(execution)
+            shutil.rmtree(directory, ignore_errors=True)
+            if execution.output_file.startswith(directory + os.path.sep):
+                RobotExecution.objects.filter(pk=execution.pk).update(output_file='')
+    deleted_blobs = 0
+    orphans = RobotArtifactBlob.objects.filter(artifact__isnull=True, created__lt=now - PRUNE_GRACE_PERIOD)
+    orphans = orphans.order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(orphans.filter(pk__gt=last_pk).values_list('pk', flat=True)[:PRUNE_BATCH_SIZE])
+        if not batch:
+            break
+        last_pk = batch[-1]
+        try:
+            with transaction.atomic():
+                # Lock the batch, so a run reusing one of its blobs waits for the prune and then stores it again, and
+                # only prune the blobs still orphaned once locked. Files go before their rows, so a file is never left
+                # without a row.
+                list(RobotArtifactBlob.objects.select_for_update().filter(pk__in=batch).values_list('pk'))
+                blobs = list(orphans.filter(pk__in=batch).values_list('pk', 'digest'))
+                for _, digest in blobs:
+                    try:
+                        os.remove(blob_path(digest))
+                    except FileNotFoundError:
+                        pass
+                RobotArtifactBlob.objects.filter(pk__in=[pk for pk, _ in blobs]).delete()
+        except ProtectedError as e:
+            logger.warning('Blobs reused during the prune were not pruned: {e}'.format(e=e))
+            continue
+        deleted_blobs += len(blobs)
+    logger.info('Pruned {a} artifacts and {b} blobs.'.format(a=deleted_artifacts, b=deleted_blobs))
+    return deleted_artifacts, deleted_blobs
@@ -0,0 +1,166 @@
+"""
+Collector for the progress events sent by robotapi.listener.
+
+A background thread accepts the listener's connection on a loopback port and queues the events it reads. The thread
+never touches the database: the engine calls ``flush`` from the thread that started robot while it waits for the
+run, which applies everything queued so far in one transaction. Tests that start get an ``in progress`` RobotTestRun
+and tests that end get their result, so progress is visible while robot is still running. Finished tests also move
+the progress and estimated finish time of the execution (see robotapi.estimates). New runs are bulk created and the
+catalog version of the application is bumped once per flush, not once per test.
+"""
+import json
+import logging
+import queue
+import socket
+import threading
+
+from django.db import transaction
+
+from testrunner.cache import bump_catalog_version
+from testrunner.models import RobotTest, RobotTestRun, milliseconds_between
+from .estimates import update_progress
+from .results import robot_time
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCollector:
+
+    def __init__(self, execution, estimates=None, host='127.0.0.1'):
+        """
+        Start listening for the progress events of one robot run.
+        :param execution: the testrunner.models.RobotExecution the events belong to.
+        :param estimates: a dict mapping the primary keys of the RobotTests of the run to their expected duration.
+        :param host: the loopback address to listen on.
+        """
+        self.execution = execution
+        self.estimates = estimates or dict()
+        self.events = queue.Queue()
+        self.test_runs = dict()     # test full name -> (RobotTest primary key, start time)
+        self.started = dict()       # test full name -> RobotTestRun started in the current flush, not saved yet
+        self.finished_tests = 0
+        self.finished_duration = 0.0
+        self.suites = list()        # full names of the suites currently running, outermost first
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.bind((host, 0))
+        self._server.listen(1)
+        self.address = '{h}:{p}'.format(h=host, p=self._server.getsockname()[1])
+        self._thread = threading.Thread(target=self._receive, name='robotweb-collector', daemon=True)
+        self._thread.start()
+
+    def _receive(self):
+        try:
+            connection, _ = self._server.accept()
+        except OSError:
+            return      # Closed before robot connected.
+        with connection, connection.makefile('r', encoding='utf-8') as lines:
+            for line in lines:
+                try:
+                    self.events.put(json.loads(line))
+                except ValueError:
+                    logger.warning('Ignored a malformed progress event: ' + line)
+
+    def flush(self):
+        """Apply every event received so far. Returns the number of events applied."""
+        events = list()
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+        if not events:
+            return 0
+        tests = self._tests({name: key for name, key in self._test_names(events).items() if name not in self.test_runs})
+        finished_tests = self.finished_tests
+        with transaction.atomic():
+            for event in events:
+                handler = getattr(self, '_' + event['event'], None)
+                if handler is not None:
+                    handler(event, tests)
+            RobotTestRun.objects.bulk_create(self.started.values())
+            if self.finished_tests != finished_tests:
+                update_progress(self.execution, self.finished_tests, self.finished_duration)
+        if self.started or self.finished_tests != finished_tests:
+            bump_catalog_version(self.execution.application_id)
+        self.started = dict()
+        return len(events)
+
+    def _test_names(self, events):
+        """
+        Map the full names of the tests in ``events`` to the full name of the suite they run in and their own name.
+        Test names may contain dots, so the suite is the one the events started, not whatever precedes the last dot.
+        """
+        suites = list(self.suites)
+        names = dict()
+        for event in events:
+            if event['event'] == 'start_suite':
+                suites.append(event['name'])
+            elif event['event'] == 'end_suite':
+                if suites and suites[-1] == event['name']:
+                    suites.pop()
+            elif event['event'] in ('start_test', 'end_test') and suites \
+                    and event['name'].startswith(suites[-1] + '.'):
+                names[event['name']] = (suites[-1], event['name'][len(suites[-1]) + 1:])
+        return names
+
+    def _tests(self, names):
+        """
+        Map the full names of tests to their RobotTest primary keys, with one query.
+        :param names: a dict mapping full test names to their suite's full name and their own name.
+        """
+        if not names:
+            return dict()
+        candidates = RobotTest.objects.filter(robot_suite__application=self.execution.application_id,
+                                              robot_suite__full_name__in={s for s, _ in names.values()},
+                                              name__in={t for _, t in names.values()})
+        pks = {(suite, test): pk for suite, test, pk in candidates.values_list('robot_suite__full_name', 'name', 'pk')}
+        return {name: pks[key] for name, key in names.items() if key in pks}
+
+    def _start_suite(self, event, tests):
+        self.suites.append(event['name'])
+
+    def _end_suite(self, event, tests):
+        if self.suites and self.suites[-1] == event['name']:
+            self.suites.pop()
+
+    def _start_test(self, event, tests):
+        if event['name'] not in tests:
+            return
+        start_time = robot_time(event['starttime']) or self.execution.start_time
+        self.started[event['name']] = RobotTestRun(robot_test_id=tests[event['name']],
+                                                   application_id=self.execution.application_id,
+                                                   execution=self.execution,
+                                                   result='',
+                                                   start_time=start_time,
+                                                   end_time=start_time,
+                                                   status='in progress')
+        self.test_runs[event['name']] = (tests[event['name']], start_time)
+
+    def _end_test(self, event, tests):
+        self.finished_tests += 1
+        if event['name'] not in self.test_runs:
+            return
+        test_id, start_time = self.test_runs[event['name']]
+        self.finished_duration += self.estimates.get(test_id, 0)
+        end_time = robot_time(event['endtime']) or start_time
+        finished = {'end_time': end_time,
+                    'duration_ms': milliseconds_between(start_time, end_time),
+                    'result': 'pass' if event['status'] == 'PASS' else 'fail',
+                    'status': 'complete',
+                    'reason': (event.get('message') or '')[:400]}
+        if event['name'] in self.started:
+            for field, value in finished.items():
+                setattr(self.started[event['name']], field, value)
+        else:
+            RobotTestRun.objects.filter(execution=self.execution, robot_test_id=test_id,
+                                        status='in progress').update(**finished)
+
+    def close(self):
+        """Stop listening and apply the events that are still queued."""
+        try:
+            self._server.shutdown(socket.SHUT_RDWR)     # Wakes up the thread if robot never connected
+        except OSError:
+            pass
+        self._server.close()
+        self._thread.join(timeout=5)
+        self.flush()
@@ -0,0 +1,74 @@
+"""
+Run-to-run comparison.
+
+The results of two RobotExecutions are read with one indexed query each (RobotTestRun rows by execution and test),
+as bare (test, result, status, duration) tuples, and joined on the test in memory, so comparing two runs of tens of
+thousands of tests costs two index range scans. Names are looked up only for the tests whose outcome changed.
+"""
+from django.conf import settings
+
+from testrunner.models import RobotExecution, RobotTest, RobotTestRun
+
+# A test got slower when it took at least SLOWER_RATIO times as long as before, and at least SLOWER_MIN_MS more.
+SLOWER_RATIO = getattr(settings, 'TESTRUNNER_SLOWER_RATIO', 1.5)
+SLOWER_MIN_MS = getattr(settings, 'TESTRUNNER_SLOWER_MIN_MS', 1000)
+FAILED_RESULTS = ('fail', 'error')
+
+
+def previous_execution(execution):
+    """The latest finished execution of the same application that started before ``execution``, or None."""
+    return (RobotExecution.objects.filter(application=execution.application_id, start_time__lt=execution.start_time)
+            .exclude(status='in progress').order_by('-start_time', '-pk').first())
+
+
+def _results(execution):
+    return {test_id: (result, status, duration) for test_id, result, status, duration in RobotTestRun.objects.filter(
+        execution=execution).values_list('robot_test', 'result', 'status', 'duration_ms').iterator()}
+
+
+def compare_executions(base, head, slower_ratio=None, slower_min_ms=None):
+    """
+    Compare the per-test results and durations of two executions.
+    :param base: the RobotExecution to compare with, e.g. the previous run or a baseline.
+    :param head: the RobotExecution to compare.
+    :return: a dict of lists of changed tests (``newly_failed``, ``fixed``, ``slower``, ``faster``, ``added`` and
+    ``removed``), each a dict with the test's primary key, name, suite, and its result and duration in milliseconds in
+    both runs, and the ``unchanged`` number of tests.
+    """
+    slower_ratio = slower_ratio or SLOWER_RATIO
+    slower_min_ms = SLOWER_MIN_MS if slower_min_ms is None else slower_min_ms
+    before, after = _results(base), _results(head)
+    changes = {'newly_failed': [], 'fixed': [], 'slower': [], 'faster': [], 'added': [], 'removed': []}
+    for test_id in after.keys() - before.keys():
+        changes['added'].append(test_id)
+    for test_id in before.keys() - after.keys():
+        changes['removed'].append(test_id)
+    unchanged = 0
+    for test_id in after.keys() & before.keys():
+        (old_result, old_status, old_ms), (new_result, new_status, new_ms) = before[test_id], after[test_id]
+        timed = 'cached' not in (old_status, new_status)
+        if new_result in FAILED_RESULTS and old_result not in FAILED_RESULTS:
+            changes['newly_failed'].append(test_id)
+        elif old_result in FAILED_RESULTS and new_result not in FAILED_RESULTS:
+            changes['fixed'].append(test_id)
+        elif timed and new_ms >= old_ms * slower_ratio and new_ms - old_ms >= slower_min_ms:
+            changes['slower'].append(test_id)
+        elif timed and old_ms >= new_ms * slower_ratio and old_ms - new_ms >= slower_min_ms:
+            changes['faster'].append(test_id)
+        else:
+            unchanged += 1
+    changed = {t for test_ids in changes.values() for t in test_ids}
+    names = {pk: (name, suite) for pk, name, suite in RobotTest.objects.filter(pk__in=changed).values_list(
+        'pk', 'name', 'robot_suite__full_name')}
+
+    def describe(test_id):
+        name, suite = names.get(test_id, ('', ''))
+        old, new = before.get(test_id, (None, None, None)), after.get(test_id, (None, None, None))
+        return {'test': test_id, 'name': name, 'suite': suite,
+                'base_result': old[0], 'base_duration': old[2], 'head_result': new[0], 'head_duration': new[2]}
+
+    comparison = {kind: sorted((describe(t) for t in test_ids), key=lambda c: (c['suite'], c['name']))
+                  for kind, test_ids in changes.items()}
+    comparison['slower'].sort(key=lambda c: c['base_duration'] - c['head_duration'])
+    comparison['unchanged'] = unchanged
+    return comparison
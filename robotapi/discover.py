@@ -5,12 +5,26 @@ from robot.errors import DataError
 from robot.parsing.model import TestCase
 from django.db.utils import IntegrityError
 
-from testrunner.models import RobotApplicationUnderTest, RobotTestSuite, RobotTest
+from testrunner.cache import bump_catalog_version
+from testrunner.models import RobotApplicationUnderTest, RobotTestSuite, RobotTest, RobotTag, RobotTestStep, \
+    RobotKeywordUsage, RobotSuiteDependency
+from testrunner.search import rebuild_search_index, update_search_index
+from . import metrics
 from .exceptions import RobotDiscoveryException
+from .flakiness import QUARANTINE_TAG
+from .keywords import KeywordLibrary, suites_depending_on
+from .tags import effective_test_tags, merge_tags, normalize_tag, tag_vocabulary
 
 logger = logging.getLogger(__name__)
 
 
+def _bulk_create(model, objs, **kwargs):
+    """Bulk create rows of ``model`` and count them in the discovery metrics."""
+    created = model.objects.bulk_create(objs, **kwargs)
+    metrics.DISCOVERY_ROWS_WRITTEN.inc(len(created), table=model._meta.db_table)
+    return created
+
+
 class DiscoveredRobotApplication:
 
     def __init__(self, robot_app: RobotApplicationUnderTest):
@@ -25,12 +39,14 @@ class DiscoveredRobotApplication:
         self.source = robot_app.app_test_location
         self.root_suite = None
         try:
-            self.robot_test_data = TestData(source=robot_app.app_test_location)
+            with metrics.DISCOVERY_PHASE_SECONDS.time(phase='parse'):
+                self.robot_test_data = TestData(source=robot_app.app_test_location)
         except (TypeError, PermissionError, DataError) as e:
             raise RobotDiscoveryException('There was an issue accessing data in the test location for this application.'
                                           ' Make sure it was created correctly. The error message was: ' + str(e))
         self.test_suites = list()   # list of DiscoveredRobotTestSuite
 
+    @metrics.DISCOVERY_PHASE_SECONDS.time(phase='discover')
     def discover_suites_and_tests(self):
         """
         Recursively discover all child test suites (directory or file-based) for this application. This function assumes
@@ -46,7 +62,156 @@ class DiscoveredRobotApplication:
         if self.root_suite is None:
             raise RobotDiscoveryException('Tests and suites must be discovered before they can be configured.')
         else:
-            self.root_suite.configure()
+            with metrics.DISCOVERY_PHASE_SECONDS.time(phase='suites'):
+                self.root_suite.configure()
+            self.configure_tags()
+            self.configure_steps_and_keywords()
+            self.configure_dependencies()
+            with metrics.DISCOVERY_PHASE_SECONDS.time(phase='search_index'):
+                rebuild_search_index(self.app)
+            bump_catalog_version(self.app.pk)
+
+    def rediscover_dependents(self, paths):
+        """
+        Read again only the suites affected by changes to the files at ``paths``, following the dependency graph
+        recorded at discovery (see ``suites_depending_on``), and refresh their tests, tags, steps, keyword usage,
+        dependencies and search index. Tests that were removed from a suite file are deactivated. New suite files are
+        not found this way; they need a full discovery.
+        :param paths: changed suite, resource, variable or library files (or library names).
+        :return: the list of RobotTestSuite objects that were read again.
+        """
+        robot_suites = list(suites_depending_on(self.app, paths).select_related('parent').order_by('full_name'))
+        self.root_suite = None
+        self.test_suites = list()
+        for robot_suite in robot_suites:
+            discovered_suite = DiscoveredRobotTestSuite(discovered_robot_app=self, robot_suite=robot_suite)
+            discovered_suite._discover_tests()
+            self.test_suites.append(discovered_suite)
+        for discovered_suite in self.test_suites:
+            discovered_suite._configure_tests()
+            suite_tests = RobotTest.objects.filter(robot_suite__application=self.app,
+                                                   robot_suite__full_name=discovered_suite.name)
+            test_names = [t.name for t in discovered_suite.tests]
+            suite_tests.filter(name__in=test_names).update(active=True)
+            suite_tests.exclude(name__in=test_names).update(active=False)
+        self.configure_tags()
+        self.configure_steps_and_keywords()
+        self.configure_dependencies()
+        with metrics.DISCOVERY_PHASE_SECONDS.time(phase='search_index'):
+            update_search_index(self._configured_test_ids().values())
+        bump_catalog_version(self.app.pk)
+        logger.info('Rediscovered {n} suites of {app} affected by changes to: {p}'.format(n=len(robot_suites),
+                                                                                        app=self.app,
+                                                                                        p=', '.join(paths)))
+        return robot_suites
+
+    @metrics.DISCOVERY_PHASE_SECONDS.time(phase='tags')
+    def configure_tags(self):
+        """
+        Bulk load the tags of every discovered suite and test. Suites are given their Force Tags (including those
+        inherited from parent suites) and tests their effective tags, replacing whatever was recorded for this
+        application before. Missing RobotTag rows are created in one batch, so the cost does not grow with the number
+        of tests per tag. The quarantine tag of flaky tests (see robotapi.flakiness) is kept.
+        """
+        suite_tags = {s.name: s.force_tags for s in self.test_suites}
+        test_tags = {(s.name, t.name): t.tags for s in self.test_suites for t in s.tests}
+        tag_names = dict()
+        for tags in list(suite_tags.values()) + list(test_tags.values()):
+            for tag in tags:
+                tag_names.setdefault(normalize_tag(tag), tag)
+        tag_ids = {n: pks[0] for n, pks in tag_vocabulary(self.app).items()}
+        _bulk_create(RobotTag, [RobotTag(name=name, normalized_name=normalized, application=self.app)
+                                for normalized, name in tag_names.items() if normalized not in tag_ids])
+        tag_ids = {n: pks[0] for n, pks in tag_vocabulary(self.app).items()}
+        suite_ids = self._configured_suite_ids()
+        test_ids = self._configured_test_ids()
+        suite_through = RobotTestSuite.robot_tags.through
+        test_through = RobotTest.robot_tags.through
+        quarantine = normalize_tag(QUARANTINE_TAG)
+        test_scope = test_through.objects.filter(**self._suite_scope('robottest__robot_suite__'))
+        quarantined = set(test_scope.filter(robottag__normalized_name=quarantine).values_list('robottest_id',
+                                                                                              flat=True))
+        suite_through.objects.filter(**self._suite_scope('robottestsuite__')).delete()
+        test_scope.exclude(robottag__normalized_name=quarantine).delete()
+        _bulk_create(suite_through, [suite_through(robottestsuite_id=suite_ids[name],
+                                                   robottag_id=tag_ids[normalize_tag(tag)])
+                                     for name, tags in suite_tags.items() if name in suite_ids
+                                     for tag in tags])
+        _bulk_create(test_through, [test_through(robottest_id=test_ids[key],
+                                                 robottag_id=tag_ids[normalize_tag(tag)])
+                                    for key, tags in test_tags.items() if key in test_ids
+                                    for tag in tags
+                                    if not (test_ids[key] in quarantined and normalize_tag(tag) == quarantine)])
+        logger.info('Configured {n} tags for {app}.'.format(n=len(tag_names), app=self.app))
+
+    @metrics.DISCOVERY_PHASE_SECONDS.time(phase='steps')
+    def configure_steps_and_keywords(self):
+        """
+        Bulk load the steps of every discovered test, and index every keyword each test runs (directly or through the
+        user keywords of its suite file and imported resource files) so the tests using a keyword can be found with one
+        indexed query. Both replace whatever was recorded for this application before.
+        """
+        test_ids = self._configured_test_ids()
+        discovered = [(test_ids[(s.name, t.name)], t) for s in self.test_suites for t in s.tests
+                      if (s.name, t.name) in test_ids]
+        RobotTestStep.objects.filter(**self._suite_scope('robot_test__robot_suite__')).delete()
+        RobotKeywordUsage.objects.filter(**self._suite_scope('robot_test__robot_suite__')).delete()
+        _bulk_create(RobotTestStep, [RobotTestStep(name=keyword[:200],
+                                                   keyword=keyword[:200],
+                                                   arguments='\n'.join(arguments)[:4000],
+                                                   order=order,
+                                                   robot_test_id=test_id)
+                                     for test_id, test in discovered
+                                     for order, (keyword, arguments) in enumerate(test.steps)],
+                                    batch_size=1000)
+        _bulk_create(RobotKeywordUsage, [RobotKeywordUsage(application=self.app,
+                                                           robot_test_id=test_id,
+                                                           keyword=name[:200],
+                                                           normalized_keyword=normalized[:200],
+                                                           depth=depth)
+                                         for test_id, test in discovered
+                                         for normalized, (name, depth) in test.keywords.items()],
+                                        batch_size=1000)
+        logger.info('Configured steps and keyword usage of {n} tests for {app}.'.format(n=len(discovered),
+                                                                                       app=self.app))
+
+    @metrics.DISCOVERY_PHASE_SECONDS.time(phase='dependencies')
+    def configure_dependencies(self):
+        """
+        Bulk load the dependency graph of every discovered suite: the resource files, variable files and libraries it
+        imports, directly or through its resource files. Replaces whatever was recorded for these suites before.
+        """
+        suite_ids = self._configured_suite_ids()
+        RobotSuiteDependency.objects.filter(**self._suite_scope('robot_suite__')).delete()
+        _bulk_create(RobotSuiteDependency, [RobotSuiteDependency(application=self.app,
+                                                                 robot_suite_id=suite_ids[s.name],
+                                                                 path=path[:1000],
+                                                                 kind=kind,
+                                                                 direct=direct)
+                                            for s in self.test_suites if s.name in suite_ids
+                                            for path, (kind, direct) in s.keyword_library.dependencies.items()],
+                                           batch_size=1000)
+        logger.info('Configured the dependencies of {n} suites for {app}.'.format(n=len(self.test_suites),
+                                                                                 app=self.app))
+
+    def _suite_scope(self, lookup=''):
+        """
+        Filter arguments limiting a query to the suites configured by this discovery: the whole application after a
+        full discovery, only the suites read again after ``rediscover_dependents``.
+        """
+        scope = {lookup + 'application': self.app}
+        if self.root_suite is None:
+            scope[lookup + 'full_name__in'] = [s.name for s in self.test_suites]
+        return scope
+
+    def _configured_suite_ids(self):
+        """Map the full name of every configured suite in scope to its primary key."""
+        return dict(RobotTestSuite.objects.filter(**self._suite_scope()).values_list('full_name', 'pk'))
+
+    def _configured_test_ids(self):
+        """Map (suite full name, test name) to the primary key of every configured test in scope."""
+        return {(suite_name, name): pk for suite_name, name, pk in RobotTest.objects.filter(
+            **self._suite_scope('robot_suite__')).values_list('robot_suite__full_name', 'name', 'pk')}
 
     def remove_discovered_test_suite(self, verbose_suite_name):
         """Remove a test suite from the discovered list if it should not be configured in RobotWeb. This will remove the
@@ -87,15 +252,16 @@ class DiscoveredRobotTestSuite:
         the first time. An instance of robot.api.TestData that describes the root test suite for all application tests.
         If not provided, ``robot_suite`` is required.
         :param robot_suite: An instance of testrunner.models.RobotTestSuite that describes an existing Robot test suite
-        that needs to be refactored. NOTE: if robot_suite is provided, ``discovered_robot_app`` and ``suite_test_data``
-        will be ignored.
+        that needs to be refactored. NOTE: if robot_suite is provided, ``suite_test_data`` will be ignored, and
+        ``discovered_robot_app`` is optional (it is only used to avoid reading the whole application again).
         :param _parent: Internal attribute that is used to track the naming of child tests and suites during discovery.
         This is another instance of DiscoveredRobotTestSuite.
         """
         if robot_suite and robot_suite.suite_location:
-            self.discovered_app = DiscoveredRobotApplication(robot_suite.application)
+            self.discovered_app = discovered_robot_app or DiscoveredRobotApplication(robot_suite.application)
             self.suite_test_data = TestData(source=robot_suite.suite_location)
             self.name = robot_suite.verbose_name
+            inherited_tags = [t.name for t in robot_suite.parent.robot_tags.all()] if robot_suite.parent else []
         elif robot_suite and not robot_suite.suite_location:
             raise RobotDiscoveryException('The RobotTestSuite has no associated location on the file system. No tests '
                                           'can be discovered until that information is supplied.')
@@ -108,10 +274,17 @@ class DiscoveredRobotTestSuite:
             self.suite_test_data = suite_test_data
             if _parent is None:
                 self.name = suite_test_data.name
+                inherited_tags = list()
             else:
                 self.name = _parent.name + '.' + self.suite_test_data.name
+                inherited_tags = _parent.force_tags
         self.documentation = self.suite_test_data.setting_table.doc.value
+        settings = self.suite_test_data.setting_table
+        # Force Tags apply to every test in this suite and its children, Default Tags only to tests in this file.
+        self.force_tags = merge_tags(inherited_tags, settings.force_tags.value or [])
+        self.default_tags = settings.default_tags.value or []
         self.location = self.suite_test_data.source
+        self.keyword_library = KeywordLibrary(self.suite_test_data)
         self.child_suites = list()  # list of DiscoveredRobotTestSuite
         self.tests = list()     # list of DiscoveredRobotTest
 
@@ -155,6 +328,7 @@ class DiscoveredRobotTestSuite:
                                             suite_location=self.location)
         try:
             configurable_suite.save()
+            metrics.DISCOVERY_ROWS_WRITTEN.inc(table=RobotTestSuite._meta.db_table)
             logger.info('Added test suite: ' + configurable_suite.verbose_name)
         except IntegrityError:
             logger.info('(Skipped) Existing test suite found with the same name and parent suite for {app}: '
@@ -187,8 +361,8 @@ class DiscoveredRobotTestSuite:
         logger.info('Looking for parent of: ' + self.name)
         parent_name = '.'.join(self.name.split('.')[:-1])
         try:
-            return [s for s in RobotTestSuite.objects.all() if s.verbose_name == parent_name][0]
-        except IndexError:
+            return RobotTestSuite.objects.get(application=self.discovered_app.app, full_name=parent_name)
+        except RobotTestSuite.DoesNotExist:
             raise RobotDiscoveryException('There should have been an existing parent suite, but one was not found. '
                                           'Tried to find a test suite with this verbose/display name: ' + parent_name)
 
@@ -205,6 +379,9 @@ class DiscoveredRobotTest:
         self.name = test.name
         self.discovered_suite = discovered_suite
         self.documentation = test.doc.value
+        self.tags = effective_test_tags(discovered_suite.force_tags, discovered_suite.default_tags, test.tags.value)
+        self.steps = discovered_suite.keyword_library.test_steps(test)     # list of (keyword, arguments)
+        self.keywords = discovered_suite.keyword_library.test_keywords(test)
 
     def configure(self):
         """Create a RobotTest for this discovered test case."""
@@ -214,6 +391,7 @@ class DiscoveredRobotTest:
                                       robot_suite=self._get_existing_robot_suite())
         try:
             configurable_test.save()
+            metrics.DISCOVERY_ROWS_WRITTEN.inc(table=RobotTest._meta.db_table)
             logger.info('Added test: ' + configurable_test.verbose_name)
         except IntegrityError:
             logger.info('(Skipped) There is an existing test with the same name and parent suite for {app}: '
@@ -221,8 +399,9 @@ class DiscoveredRobotTest:
 
     def _get_existing_robot_suite(self):
         try:
-            return [s for s in RobotTestSuite.objects.all() if s.verbose_name == self.discovered_suite.name][0]
-        except IndexError:
+            return RobotTestSuite.objects.get(application=self.discovered_suite.discovered_app.app,
+                                              full_name=self.discovered_suite.name)
+        except RobotTestSuite.DoesNotExist:
             raise RobotDiscoveryException('There should have been an existing test suite for this test, '
                                           'but one was not found: ' + self.discovered_suite.name)
 
@@ -0,0 +1,57 @@
+"""
+Duration statistics of test runs.
+
+Every RobotTestRun stores its duration in whole milliseconds, and its application, with an index on (application,
+robot_test, start_time), so the runs of an application within a time window are found by index and their durations can
+be sorted and aggregated by the database. Percentiles are exact (nearest rank), computed from the durations the
+database returns sorted per test.
+"""
+import math
+
+from django.db.models import Avg, Count, Max
+
+from testrunner.models import RobotTestRun
+
+# Only runs that ran to the end have a meaningful duration.
+TIMED_STATUSES = ('complete',)
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+def timed_runs(application, since=None, until=None, tests=None):
+    """The finished RobotTestRuns of ``application`` started within [``since``, ``until``), optionally of ``tests``."""
+    runs = RobotTestRun.objects.filter(application=application, status__in=TIMED_STATUSES)
+    if tests is not None:
+        runs = runs.filter(robot_test__in=tests)
+    if since is not None:
+        runs = runs.filter(start_time__gte=since)
+    if until is not None:
+        runs = runs.filter(start_time__lt=until)
+    return runs
+
+
+def slowest_tests(application, since=None, until=None, limit=20):
+    """
+    The tests of ``application`` with the longest mean duration over the runs within the window.
+    :return: a list of dicts with the test's primary key and name, and the run count and mean and longest duration in
+    milliseconds.
+    """
+    return list(timed_runs(application, since, until).values('robot_test', 'robot_test__name')
+                .annotate(runs=Count('pk'), mean_ms=Avg('duration_ms'), max_ms=Max('duration_ms'))
+                .order_by('-mean_ms', 'robot_test')[:limit])
+
+
+def _nearest_rank(durations, fraction):
+    return durations[max(1, math.ceil(fraction * len(durations))) - 1]
+
+
+def duration_percentiles(application, since=None, until=None, tests=None, percentiles=PERCENTILES):
+    """
+    The percentiles of the durations of each test of ``application`` over the runs within the window.
+    :return: a dict mapping RobotTest primary keys to dicts mapping each of ``percentiles`` (e.g. 0.95) to a duration in
+    milliseconds.
+    """
+    durations = dict()
+    for test_id, duration in timed_runs(application, since, until, tests).order_by(
+            'robot_test', 'duration_ms').values_list('robot_test', 'duration_ms').iterator():
+        durations.setdefault(test_id, list()).append(duration)
+    return {test_id: {p: _nearest_rank(values, p) for p in percentiles} for test_id, values in durations.items()}
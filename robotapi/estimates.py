@@ -0,0 +1,80 @@
+"""
+Duration estimates and run progress.
+
+Each RobotTest keeps ``duration_estimate``, an exponentially weighted moving average of its recorded run times that is
+updated in place whenever a result is recorded, so no estimate ever needs the test's full history. When a run starts,
+the estimates of its tests are summed into the execution's ``expected_duration``; as the listener reports finished
+tests, their estimates are added to ``completed_duration`` and ``estimated_end`` is moved accordingly. Reading the
+progress of a run is therefore a single row lookup, however often it is polled.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from testrunner.models import RobotTest
+
+# Tests that never ran are expected to take as long as the average test of their application, or this many seconds.
+DEFAULT_TEST_DURATION = getattr(settings, 'TESTRUNNER_DEFAULT_TEST_DURATION', 10)
+# The weight of the latest run time in a test's moving average.
+SMOOTHING = 0.3
+# The pace of a run so far (its elapsed time against the estimates of the tests it finished) is applied to the
+# estimate of the remaining tests within these bounds, so a slow robot start does not throw the first estimates off.
+PACE_BOUNDS = (0.5, 2.0)
+
+
+def update_duration_estimates(durations):
+    """
+    Fold recorded run times into the moving average of each test.
+    :param durations: a dict mapping RobotTest primary keys to the number of seconds a run of the test took.
+    """
+    with transaction.atomic():
+        for test_id, seconds in durations.items():
+            RobotTest.objects.filter(pk=test_id).update(duration_estimate=(
+                Value(SMOOTHING * seconds) + (1 - SMOOTHING) * Coalesce(F('duration_estimate'), Value(seconds))))
+
+
+def duration_estimates(tests):
+    """
+    The expected duration of each of the given RobotTests (a queryset of one application's tests).
+    :return: a dict mapping the primary key of each test to its expected number of seconds.
+    """
+    estimates = dict(tests.values_list('pk', 'duration_estimate'))
+    known = [e for e in estimates.values() if e is not None]
+    if known:
+        default = sum(known) / len(known)
+    else:
+        default = RobotTest.objects.filter(robot_suite__application__in=tests.values('robot_suite__application'),
+                                           duration_estimate__isnull=False).aggregate(
+            average=Avg('duration_estimate'))['average'] or DEFAULT_TEST_DURATION
+    return {pk: default if estimate is None else estimate for pk, estimate in estimates.items()}
+
+
+def start_progress(execution, estimates):
+    """Set the expected tests, duration and finish time of an execution about to run the tests in ``estimates``."""
+    execution.expected_tests = len(estimates)
+    execution.expected_duration = sum(estimates.values())
+    execution.completed_tests = 0
+    execution.completed_duration = 0
+    execution.estimated_end = execution.start_time + timedelta(seconds=execution.expected_duration)
+    execution.save(update_fields=['expected_tests', 'expected_duration', 'completed_tests', 'completed_duration',
+                                  'estimated_end'])
+
+
+def update_progress(execution, completed_tests, completed_duration, now=None):
+    """
+    Record how many tests of a running execution finished, with their estimated duration, and move the estimated
+    finish time: the estimate of the remaining tests is scaled by how fast the run went compared with its estimates.
+    """
+    now = now or timezone.now()
+    execution.completed_tests = completed_tests
+    execution.completed_duration = completed_duration
+    remaining = max(execution.expected_duration - completed_duration, 0)
+    elapsed = (now - execution.start_time).total_seconds()
+    pace = elapsed / completed_duration if completed_duration else 1
+    pace = min(max(pace, PACE_BOUNDS[0]), PACE_BOUNDS[1])
+    execution.estimated_end = now + timedelta(seconds=remaining * pace)
+    execution.save(update_fields=['completed_tests', 'completed_duration', 'estimated_end'])
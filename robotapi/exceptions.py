@@ -5,3 +5,12 @@ class RobotDiscoveryException(Exception):
 
 class RobotExecutionException(Exception):
     pass
+
+
+class RobotAdmissionException(RobotExecutionException):
+
+    def __init__(self, message, retry_after):
+        """A run was not admitted because the host is at capacity. It may be submitted again after ``retry_after``
+        seconds."""
+        super().__init__(message)
+        self.retry_after = retry_after
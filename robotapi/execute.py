@@ -1,14 +1,52 @@
+import datetime
 import logging
+import os
+import shutil
+import signal
+import socket
 import subprocess
+import tempfile
+import time
 
-from .exceptions import RobotExecutionException
+from django.conf import settings
+from django.utils import timezone
+
+from testrunner.models import RobotExecution, RobotTest, RobotTestRun
+from . import metrics
+from .admission import admit_execution
+from .artifacts import store_artifacts
+from .collector import ResultCollector
+from .estimates import duration_estimates, start_progress
+from .exceptions import RobotAdmissionException, RobotExecutionException
+from .flakiness import quarantined_tests, update_quarantine
+from .impact import select_changed_tests
+from .listener import COLLECTOR_ENVIRONMENT_VARIABLE
+from .locks import acquire_resources, release_resources, test_resources
+from .logindex import index_log
+from .processes import PROCESS_GROUPS, signal_process_group, stop_process
+from .results import failed_tests, merge_results, original_execution, record_results, tests_in_suites
+from .reuse import cacheable_tests, fingerprint_tests, reusable_results
+from .tags import select_tests
+from .workspace import artifact_dir, create_scratch_dir, promote_artifacts
 
 logger = logging.getLogger(__name__)
 
+RUN_TIMEOUT = getattr(settings, 'TESTRUNNER_RUN_TIMEOUT', None)
+LISTENER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'listener.py')
+
 
 class RobotExecutionEngine:
 
-    SUPPORTED_ROBOTWEB_OPTIONS = ['loglevel', 'dryrun', 'output', 'outputdir', 'include', 'exclude']
+    SUPPORTED_ROBOTWEB_OPTIONS = ['loglevel', 'dryrun', 'output', 'outputdir', 'include', 'exclude', 'commit_range',
+                                  'rerun_failed', 'environment', 'variables', 'reuse_results', 'timeout', 'listener',
+                                  'quarantine', 'niceness', 'lock_timeout', 'queue_timeout']
+    QUARANTINE_MODES = ('skip', 'run', 'only')
+    # Test selections longer than this are passed to robot in an argument file rather than on the command line.
+    ARGUMENT_FILE_THRESHOLD = 100
+    # Seconds to wait for robot to exit after each signal when stopping a run that timed out.
+    KILL_GRACE_PERIOD = 10
+    # Seconds between applying the progress reported by the listener while robot runs.
+    POLL_INTERVAL = 0.5
 
     def __init__(self, tests=None, suites=None, application=None, **options):
         """
@@ -27,6 +65,34 @@ class RobotExecutionEngine:
         ``outputdir`` - The location to save the output files created by Robot Framework
         ``include``   - Include tests with this tag pattern when running robot
         ``exclude``   - Exclude tests with this tag pattern when running robot
+        ``commit_range`` - Only run the tests of ``application`` affected by the changes in this git commit range
+                       (e.g. main..feature) of the repository holding its tests. See robotapi.impact.
+        ``rerun_failed`` - True, False (default). Only run the tests of ``suites`` (or ``application``) whose latest
+                       result failed in the most recent execution with failures, and merge the new results into the
+                       output of that execution. See ``select_failed_tests``.
+        ``environment`` - A testrunner.models.RobotTestEnvironment; its URL is passed to robot as ${HOST_URL}
+        ``variables`` - A dict of variables to set with robot's --variable option
+        ``reuse_results`` - True (default), False. Report tests tagged with TESTRUNNER_RESULT_CACHE_TAG as cached
+                       passes instead of running them when they recently passed with the same fingerprint (see
+                       robotapi.reuse).
+        ``timeout``   - The maximum number of seconds the run may take. Defaults to the application's run timeout.
+        ``listener``  - True (default), False. Attach robotapi.listener, so each test gets an ``in progress``
+                       RobotTestRun when it starts and its result as soon as it ends, while robot is still running.
+        ``quarantine`` - skip (default), run, only. Whether runs of suites or a whole application leave out the tests
+                       quarantined as flaky (see robotapi.flakiness), run them, or run nothing but them. Tests given
+                       explicitly always run, unless this is ``only``.
+        ``niceness``  - Run robot with its scheduling priority lowered by this much (POSIX only).
+        ``lock_timeout`` - The maximum number of seconds to wait for the resources the tests declare with lock:<name>
+                       tags while other runs hold them (see robotapi.locks), before the run is admitted. Defaults to
+                       TESTRUNNER_LOCK_TIMEOUT.
+        ``queue_timeout`` - The maximum number of seconds to wait in the queue while the host is at capacity (see
+                       robotapi.admission). Defaults to TESTRUNNER_ADMISSION_QUEUE_TIMEOUT. A run that is not admitted
+                       raises a RobotAdmissionException.
+
+        Every run is recorded as a testrunner.models.RobotExecution, with one RobotTestRun per test read from the
+        output.xml robot writes. Unless ``outputdir`` or ``output`` is given, each execution writes to a scratch
+        directory of its own and its artifacts are promoted to durable storage when it finishes (see
+        robotapi.workspace).
 
         Tags and patterns can be combined together with `AND`, `OR`, and `NOT` operators, and using pattern * and ?.
                 Examples: --include foo --include bar*
@@ -62,15 +128,150 @@ class RobotExecutionEngine:
             raise RobotExecutionException('Invalid usage of Robot Execution Engine: a list of tests, suites, or an '
                                           'application for testing must be provided at minimum.')
         self._command = list()
+        self._argument_file = None
         self.execution_result = None
         self.robot_output = None
+        self.changed_files = None
+        self.selected_count = self.total_count = self.failed_count = None
+        self.execution = None
+        self.rerun_of = None
+        self.test_runs = list()
         # Default optional kw args
         self.loglevel = self.output = self.outputdir = self.include = self.exclude = self.dryrun = None
+        self.commit_range = self.rerun_failed = self.environment = self.variables = None
+        self.reuse_results = True
+        self.timeout = None
+        self.timed_out = False
+        self.preparing_since = self.run_seconds = None     # For the execution metrics, see robotapi.metrics
+        self.listener = True
+        self.collector = None
+        self.quarantine = 'skip'
+        self.niceness = None
+        self.lock_timeout = None
+        self.queue_timeout = None
+        self.quarantined_count = 0
+        self.scratch_dir = self.artifact_dir = None
+        self.fingerprints = dict()
+        self.reused = dict()
         if not all([(option in self.SUPPORTED_ROBOTWEB_OPTIONS) for option in options]):
             raise RobotExecutionException('Unsupported options passed to RobotWeb test execution engine.')
         else:
             for option, value in options.items():
                 setattr(self, option, value)
+        if self.commit_range is not None and (application is None or tests is not None or suites is not None):
+            raise RobotExecutionException('Tests can only be selected from a commit range for a whole application.')
+        if self.rerun_failed and (tests is not None or self.commit_range is not None):
+            raise RobotExecutionException('Failed tests can only be rerun for test suites or a whole application.')
+        if self.quarantine not in self.QUARANTINE_MODES:
+            raise RobotExecutionException('Unsupported quarantine mode: {q}.'.format(q=self.quarantine))
+        self._explicit_tests = tests is not None
+
+    @property
+    def application_under_test(self):
+        if self.application is not None:
+            return self.application
+        if self.suites:
+            return self.suites[0].application
+        return self.tests[0].robot_suite.application
+
+    def select_failed_tests(self):
+        """
+        Replace the tests to run with those of ``suites`` (or of ``application``) whose latest result failed in the
+        most recent execution with such failures or in another rerun of the same run, and remember that original run
+        (``rerun_of``) so the rerun results can be merged into its output, which has all of its tests. The output of a
+        run only has room for its own tests, so failures whose latest result came from older runs are left out; they
+        are rerun once the newer failures pass, or by running their suites again. ``selected_count`` is the number of
+        failures rerun out of ``failed_count``.
+        """
+        application = self.application_under_test
+        if self.suites:
+            scope = tests_in_suites(self.suites)
+        else:
+            scope = RobotTest.objects.filter(robot_suite__application=application)
+        failed = list(failed_tests(scope).select_related('robot_suite').order_by('robot_suite__full_name', 'name'))
+        self.failed_count = len(failed)
+        executions = {t.latest_execution for t in failed if t.latest_execution is not None}
+        originals = {pk: original_execution(e) for pk, e in RobotExecution.objects.in_bulk(executions).items()}
+        self.rerun_of = originals[max(executions)] if executions else None
+        if self.rerun_of is not None:
+            failed = [t for t in failed if originals.get(t.latest_execution) == self.rerun_of]
+            if len(failed) < self.failed_count:
+                logger.info('Rerunning the {n} failures of {e}; {o} older failures are left out.'.format(
+                    n=len(failed), e=self.rerun_of, o=self.failed_count - len(failed)))
+        self.total_count = scope.filter(active=True).count()
+        self.selected_count = len(failed)
+        self.application, self.suites, self.tests = application, None, failed
+        return self.tests
+
+    def select_changed_tests(self):
+        """
+        Replace the tests to run with those affected by the changes in ``commit_range``, recording the changed files
+        and how many of the application's tests were selected (``selected_count``) out of ``total_count``.
+        """
+        self.changed_files, self.tests, self.total_count = select_changed_tests(self.application, self.commit_range)
+        self.selected_count = len(self.tests)
+        return self.tests
+
+    def select_quarantined_tests(self):
+        """
+        Leave the tests quarantined as flaky out of the run, or keep nothing but them, as the ``quarantine`` option
+        says. Returns the RobotTests to run, or None if the run is left as it was.
+        """
+        if self.quarantine == 'run' or (self.quarantine == 'skip' and self._explicit_tests):
+            return None
+        application = self.application_under_test
+        scope = self.selected_tests()
+        quarantined = quarantined_tests(scope)
+        self.quarantined_count = quarantined.count()
+        if self.quarantine == 'skip' and not self.quarantined_count:
+            return None
+        tests = quarantined if self.quarantine == 'only' else scope.exclude(pk__in=quarantined)
+        self.tests = list(tests.select_related('robot_suite').order_by('robot_suite__full_name', 'name'))
+        self.application, self.suites = application, None
+        logger.info('{n} selected tests are quarantined; running {r} tests.'.format(n=self.quarantined_count,
+                                                                                   r=len(self.tests)))
+        return self.tests
+
+    def selected_tests(self):
+        """A queryset of the RobotTests this run selects with its tests, suites and tag patterns."""
+        if self.tests:
+            return RobotTest.objects.filter(pk__in=[t.pk for t in self.tests])
+        elif self.suites:
+            return select_tests(self.application_under_test, self.include, self.exclude, tests_in_suites(self.suites))
+        return select_tests(self.application_under_test, self.include, self.exclude)
+
+    def reuse_cached_results(self):
+        """
+        Fingerprint the tests of this run that opted in to result reuse, and take those with a reusable passing result
+        out of the run (``reused`` maps them to that result). Returns the RobotTests that still need to run, or None if
+        no result can be reused and the run is left as it was.
+        """
+        application = self.application_under_test
+        scope = self.selected_tests()
+        cacheable = list(cacheable_tests(scope).select_related('robot_suite__application'))
+        self.fingerprints = fingerprint_tests(cacheable, self.environment, self.variables)
+        self.reused = reusable_results(self.fingerprints) if self.fingerprints else dict()
+        if not self.reused:
+            return None
+        self.tests = list(scope.exclude(pk__in=list(self.reused)).select_related('robot_suite')
+                          .order_by('robot_suite__full_name', 'name'))
+        self.application, self.suites = application, None
+        logger.info('Reusing the results of {n} unchanged tests.'.format(n=len(self.reused)))
+        return self.tests
+
+    def _record_reused_results(self):
+        now = timezone.now()
+        RobotTestRun.objects.bulk_create([RobotTestRun(robot_test_id=test_id,
+                                                       application=self.execution.application,
+                                                       execution=self.execution,
+                                                       result='pass',
+                                                       start_time=now,
+                                                       end_time=now,
+                                                       status='cached',
+                                                       reason='Reused the passing result of test run {pk}.'.format(
+                                                           pk=run.pk),
+                                                       fingerprint=run.fingerprint)
+                                          for test_id, run in self.reused.items()])
 
     def _add_to_command(self, *args):
         """Add specified arguments to the list of command line arguments. The executable location must be set first."""
@@ -104,21 +305,39 @@ class RobotExecutionEngine:
             self._add_to_command('--loglevel', self.loglevel)
         if self.dryrun is not None and self.dryrun:
             self._add_to_command('--dryrun')
+        if self.collector is not None:
+            self._add_to_command('--listener', LISTENER_PATH)
+        if self.environment is not None:
+            self._add_to_command('--variable', 'HOST_URL:' + self.environment.host_url)
+        for name, value in sorted((self.variables or dict()).items()):
+            self._add_to_command('--variable', '{name}:{value}'.format(name=name, value=value))
 
     def _handle_output(self):
         if self.output is not None:
             self._add_to_command('--output', self.output)
-        elif self.outputdir is not None and self.output is None:
-            self._add_to_command('--outputdir', self.outputdir)
-        elif self.outputdir is not None and self.output is not None:
-            self._add_to_command('--outputdir', self.outputdir)
         else:
-            self._add_to_command('--outputdir', 'output')
+            self._add_to_command('--outputdir', self._output_dir())
+
+    def _output_dir(self):
+        if self.outputdir is not None:
+            return self.outputdir
+        return self.scratch_dir if self.scratch_dir is not None else self.artifact_dir
+
+    def _output_file(self):
+        """The path of the output.xml robot writes with the configured options, or None if it writes none."""
+        if self.output is not None:
+            return None if self.output.upper() == 'NONE' else os.path.abspath(self.output)
+        return os.path.abspath(os.path.join(self._output_dir(), 'output.xml'))
 
     def _handle_tests(self):
-        if self.tests:
+        if self.tests and len(self.tests) > self.ARGUMENT_FILE_THRESHOLD:
+            with tempfile.NamedTemporaryFile('w', suffix='.args', delete=False, encoding='utf-8') as argument_file:
+                argument_file.writelines('--test {name}\n'.format(name=test.verbose_name) for test in self.tests)
+            self._argument_file = argument_file.name
+            self._add_to_command('--argumentfile', self._argument_file)
+        elif self.tests:
             for test in self.tests:
-                self._add_to_command('--test', test.name)
+                self._add_to_command('--test', test.verbose_name)
         if self.suites:
             for suite in self.suites:
                 self._add_to_command('--suite', suite.verbose_name)
@@ -131,18 +350,222 @@ class RobotExecutionEngine:
 
     def run_subprocess(self):
         self._validate_robot_executable()
+        if self.commit_range is not None and not self.select_changed_tests():
+            self.robot_output = 'No tests are affected by the changes in {r}.'.format(r=self.commit_range)
+            logger.info(self.robot_output)
+            return
+        if self.rerun_failed and not self.select_failed_tests():
+            self.robot_output = 'There are no failed tests to rerun.'
+            logger.info(self.robot_output)
+            return
+        if self.select_quarantined_tests() == []:
+            self.robot_output = ('There are no quarantined tests to run.' if self.quarantine == 'only' else
+                                 'All {n} selected tests are quarantined.'.format(n=self.quarantined_count))
+            logger.info(self.robot_output)
+            return
+        remaining_tests = self.reuse_cached_results() if self.reuse_results else None
+        resources = self.required_resources() if remaining_tests != [] else []
+        if resources:
+            self.execution = RobotExecution.objects.create(application=self.application_under_test, status='waiting',
+                                                           host=socket.gethostname(), worker_pid=os.getpid(),
+                                                           rerun_of=self.rerun_of)
+        try:
+            if resources and self.acquire_resources(resources):
+                return
+            self.execution = admit_execution(self.application_under_test, self.queue_timeout,
+                                             execution=self.execution, rerun_of=self.rerun_of)
+            self._run_admitted(remaining_tests)
+        except RobotAdmissionException:
+            raise   # The rejected run's execution and locks are gone.
+        except BaseException:
+            self._abort_execution()
+            raise
+        finally:
+            if self.execution is not None:
+                release_resources(self.execution)
+
+    def _run_admitted(self, remaining_tests):
+        if self.reused:
+            self._record_reused_results()
+        if remaining_tests == []:
+            self.robot_output = 'The results of all {n} tests were reused.'.format(n=len(self.reused))
+            logger.info(self.robot_output)
+            self.execution.status = 'complete'
+            self.execution.end_time = timezone.now()
+            self.execution.save()
+            return
+        self._run_and_record()
+
+    def _abort_execution(self):
+        """
+        Mark the execution as an error when running or recording it raised, so it does not hold a slot of the host's
+        capacity (see robotapi.admission) forever. A run whose results were already recorded keeps its status.
+        """
+        logger.exception('Running {e} failed.'.format(e=self.execution))
+        if self.collector is not None:
+            self.collector.close()
+            self.collector = None
+        if self.scratch_dir is not None:
+            shutil.rmtree(self.scratch_dir, ignore_errors=True)
+            self.scratch_dir = None
+        now = timezone.now()
+        if RobotExecution.objects.filter(pk=self.execution.pk, status__in=('waiting', 'in progress')).update(
+                status='error', end_time=now):
+            self.execution.status, self.execution.end_time = 'error', now
+        RobotTestRun.objects.filter(execution=self.execution, status='in progress').update(status='error')
+
+    def required_resources(self):
+        """The names of the resources the tests of this run declare with lock:<name> tags (see robotapi.locks)."""
+        return sorted({name for names in test_resources(self.selected_tests()).values() for name in names})
+
+    def acquire_resources(self, resources):
+        """
+        Wait for the locks of ``resources`` for at most ``lock_timeout`` seconds, while the execution is ``waiting``
+        and before it is admitted, so the wait takes no slot of the host's capacity. When other runs still hold some
+        of them, the execution ends as an error. Returns the names of the resources still held by other runs, if any.
+        """
+        busy = acquire_resources(self.execution, resources, self.lock_timeout)
+        if busy:
+            self.robot_output = 'Gave up waiting for resources held by other runs: {r}.'.format(r=', '.join(busy))
+            logger.error(self.robot_output)
+            self.execution.status = 'error'
+            self.execution.end_time = timezone.now()
+            self.execution.save()
+        return busy
+
+    def _run_and_record(self):
+        self.preparing_since = time.perf_counter()
+        estimates = duration_estimates(self.selected_tests())
+        start_progress(self.execution, estimates)
+        if self.listener:
+            self.collector = ResultCollector(self.execution, estimates)
+        if self.output is None and self.outputdir is None:
+            self.scratch_dir, self.artifact_dir = create_scratch_dir(self.execution), None
         self._handle_options()
         self._handle_output()
         self._handle_tests()
         logger.info('About to send the following command to subprocess: ' + str(self._command))
-        completed_process = subprocess.run(self._command,
-                                           stdout=subprocess.PIPE,
-                                           stderr=subprocess.PIPE)
-        if completed_process.stderr:
+        try:
+            stdout, stderr = self._run_robot()
+        finally:
+            if self._argument_file is not None:
+                os.remove(self._argument_file)
+                self._argument_file = None
+        metrics.OUTPUT_BYTES.inc(len(stdout), stream='stdout')
+        metrics.OUTPUT_BYTES.inc(len(stderr), stream='stderr')
+        if stderr:
             logger.error('There were some errors when executing the tests: ')
-            for l in completed_process.stderr.decode('utf-8').split('\n'):
+            for l in stderr.decode('utf-8').split('\n'):
                 logger.error(l)
-        self.robot_output = completed_process.stdout.decode('utf-8')
+        self.robot_output = stdout.decode('utf-8')
         for l in self.robot_output.split('\n'):
             logger.info(l)
         self._command = list()  # to allow for reruns if desired
+        self._record_execution()
+
+    def _run_robot(self):
+        """
+        Run the robot command in a process group of its own and wait for it, for at most ``timeout`` seconds (or the
+        application's run timeout, or TESTRUNNER_RUN_TIMEOUT). A run that takes longer is stopped together with every
+        process it started, see robotapi.processes. Whatever robot started and left behind is stopped as well. While
+        robot runs, the progress its listener reports is applied every POLL_INTERVAL seconds.
+        """
+        timeout = self.run_timeout
+        environment = dict(os.environ)
+        if self.collector is not None:
+            environment[COLLECTOR_ENVIRONMENT_VARIABLE] = self.collector.address
+        # Output goes to files rather than pipes, so robot never blocks on a full pipe between two polls.
+        with tempfile.TemporaryFile() as stdout_file, tempfile.TemporaryFile() as stderr_file:
+            process = subprocess.Popen(self._command,
+                                       stdout=stdout_file,
+                                       stderr=stderr_file,
+                                       env=environment,
+                                       start_new_session=PROCESS_GROUPS,
+                                       preexec_fn=self._lower_priority if self.niceness and PROCESS_GROUPS else None)
+            started = time.perf_counter()
+            if self.preparing_since is not None:
+                metrics.STARTUP_SECONDS.observe(started - self.preparing_since)
+            self.execution.host = socket.gethostname()
+            self.execution.pid = process.pid
+            if timeout is not None:
+                self.execution.deadline = self.execution.start_time + datetime.timedelta(seconds=timeout)
+            self.execution.save(update_fields=['host', 'pid', 'deadline'])
+            deadline = time.monotonic() + timeout if timeout is not None else None
+            try:
+                while process.poll() is None:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        logger.error('Robot did not finish within {t} seconds; stopping it.'.format(t=timeout))
+                        self.timed_out = True
+                        stop_process(process, self.KILL_GRACE_PERIOD)
+                        break
+                    try:
+                        process.wait(timeout=self.POLL_INTERVAL)
+                    except subprocess.TimeoutExpired:
+                        pass
+                    if self.collector is not None:
+                        self.collector.flush()
+            except BaseException:
+                stop_process(process, self.KILL_GRACE_PERIOD)
+                raise
+            finally:
+                if self.collector is not None:
+                    self.collector.close()
+                if PROCESS_GROUPS:
+                    signal_process_group(process.pid, signal.SIGKILL)  # Browsers, drivers etc. that robot left running
+            self.run_seconds = time.perf_counter() - started
+            metrics.EXIT_CODES.inc(code=process.returncode)
+            stdout_file.seek(0)
+            stderr_file.seek(0)
+            return stdout_file.read(), stderr_file.read()
+
+    def _lower_priority(self):
+        os.nice(self.niceness)     # Runs in the child process, before robot starts
+
+    @property
+    def run_timeout(self):
+        if self.timeout is not None:
+            return self.timeout
+        application_timeout = self.application_under_test.run_timeout
+        return application_timeout if application_timeout is not None else RUN_TIMEOUT
+
+    def _record_execution(self):
+        """Store the results of the finished run and, for reruns, merge them into the output of the original run."""
+        if self.scratch_dir is not None:
+            self.artifact_dir = promote_artifacts(self.scratch_dir, self.execution)
+            self.scratch_dir = None
+        output_file = self._output_file()
+        self.execution.end_time = timezone.now()
+        if output_file is not None and os.path.isfile(output_file):
+            self.execution.output_file = output_file
+            metrics.OUTPUT_BYTES.inc(os.path.getsize(output_file), stream='output.xml')
+            self.test_runs = record_results(self.execution, output_file, self.fingerprints)
+            update_quarantine(self.execution.application, {r.robot_test_id for r in self.test_runs})
+            index_log(output_file, self.execution.application)
+            self.execution.status = 'complete'
+        else:
+            self.execution.status = 'complete' if output_file is None else 'error'
+        # Tests the listener saw start but robot never finished, when there is no output to replace them with.
+        RobotTestRun.objects.filter(execution=self.execution, status='in progress').update(
+            status='timed out' if self.timed_out else 'error')
+        if self.timed_out:
+            self.execution.status = 'timed out'
+            RobotTestRun.objects.filter(execution=self.execution).exclude(result='pass').update(
+                status='timed out', reason='The run was stopped after {t} seconds.'.format(t=self.run_timeout))
+        self.execution.save()
+        if self.run_seconds is not None:
+            metrics.RUN_SECONDS.observe(self.run_seconds, status=self.execution.status)
+        if self.artifact_dir is not None:
+            store_artifacts(self.execution, self.artifact_dir)
+        original = original_execution(self.rerun_of) if self.rerun_of is not None else None
+        if original is not None and original.output_file and os.path.isfile(original.output_file) \
+                and self.execution.output_file:
+            try:
+                merge_results(self.executable, original.output_file, self.execution.output_file)
+            except RobotExecutionException as e:
+                # The rerun is recorded already; its own output, log and report still show its results.
+                logger.error('The results of {r} were not merged into {o}: {e}'.format(r=self.execution, o=original,
+                                                                                      e=e))
+            else:
+                index_log(original.output_file)
+                if original.output_file.startswith(artifact_dir(original) + os.path.sep):
+                    store_artifacts(original, artifact_dir(original))     # The merged log and report replace the old ones
@@ -0,0 +1,86 @@
+"""
+Flaky test detection and quarantine.
+
+The flakiness of a test is the share of its latest FLAKY_WINDOW results that flipped between pass and fail. A flip
+between two runs with different fingerprints (see robotapi.reuse) followed a change to the test's files, environment or
+variables, so it is not counted; runs without a fingerprint are assumed unchanged. Tests whose flakiness reaches
+FLAKY_THRESHOLD over at least FLAKY_MIN_RUNS results are tagged with TESTRUNNER_QUARANTINE_TAG, and lose the tag again
+once they are stable. Runs can leave quarantined tests out, or run only them (see RobotExecutionEngine's
+``quarantine`` option and the run_quarantined command).
+"""
+import logging
+
+from django.conf import settings
+
+from testrunner.cache import bump_catalog_version
+from testrunner.models import RobotTag, RobotTest, RobotTestRun
+
+logger = logging.getLogger(__name__)
+
+QUARANTINE_TAG = getattr(settings, 'TESTRUNNER_QUARANTINE_TAG', 'quarantined')
+FLAKY_WINDOW = getattr(settings, 'TESTRUNNER_FLAKY_WINDOW', 20)
+FLAKY_MIN_RUNS = getattr(settings, 'TESTRUNNER_FLAKY_MIN_RUNS', 5)
+FLAKY_THRESHOLD = getattr(settings, 'TESTRUNNER_FLAKY_THRESHOLD', 0.3)
+QUARANTINE_NICENESS = getattr(settings, 'TESTRUNNER_QUARANTINE_NICENESS', 10)
+
+
+def quarantined_tests(tests):
+    """Narrow a RobotTest queryset down to the tests tagged with the quarantine tag."""
+    tagged = RobotTest.robot_tags.through.objects.filter(
+        robottag__normalized_name=RobotTag.normalize(QUARANTINE_TAG)).values('robottest_id')
+    return tests.filter(pk__in=tagged)
+
+
+def flakiness_scores(test_ids):
+    """
+    Score the flakiness of tests from their latest completed results.
+    :param test_ids: RobotTest primary keys.
+    :return: a dict mapping each primary key to a tuple of its score (0 to 1) and the number of results it is based on.
+    """
+    results = dict()
+    for test_id, result, fingerprint in RobotTestRun.objects.filter(
+            robot_test__in=list(test_ids), status='complete', result__in=('pass', 'fail')).order_by(
+            'robot_test', '-start_time', '-pk').values_list('robot_test', 'result', 'fingerprint').iterator():
+        latest = results.setdefault(test_id, list())
+        if len(latest) < FLAKY_WINDOW:
+            latest.append((result, fingerprint))
+    scores = {pk: (0.0, 0) for pk in test_ids}
+    for test_id, latest in results.items():
+        flips = sum(1 for (result, fingerprint), (previous, previous_fingerprint) in zip(latest, latest[1:])
+                    if result != previous and not (fingerprint and previous_fingerprint
+                                                   and fingerprint != previous_fingerprint))
+        scores[test_id] = (flips / (len(latest) - 1) if len(latest) > 1 else 0.0, len(latest))
+    return scores
+
+
+def _quarantine_tag(application):
+    tag = RobotTag.objects.filter(application=application,
+                                  normalized_name=RobotTag.normalize(QUARANTINE_TAG)).order_by('pk').first()
+    return tag or RobotTag.objects.create(application=application, name=QUARANTINE_TAG,
+                                          description='Flaky tests, left out of runs that should not fail because '
+                                                      'of them.')
+
+
+def update_quarantine(application, test_ids):
+    """
+    Score the flakiness of tests of ``application`` that just ran, and quarantine or release them. The tags change
+    without any signals, so the catalog version of the application is bumped here when any test is (un)quarantined.
+    :return: a tuple of the primary keys of the newly quarantined tests and of the released tests.
+    """
+    scores = flakiness_scores(test_ids)
+    for test_id, (score, _) in scores.items():
+        RobotTest.objects.filter(pk=test_id).update(flakiness=score)
+    through = RobotTest.robot_tags.through
+    tag = _quarantine_tag(application)
+    tagged = set(through.objects.filter(robottag=tag, robottest_id__in=list(scores)).values_list('robottest_id',
+                                                                                                   flat=True))
+    flaky = {pk for pk, (score, runs) in scores.items() if runs >= FLAKY_MIN_RUNS and score >= FLAKY_THRESHOLD}
+    quarantined = sorted(flaky - tagged)
+    released = sorted(pk for pk in tagged - flaky if scores[pk][0] < FLAKY_THRESHOLD)
+    through.objects.bulk_create([through(robottest_id=pk, robottag=tag) for pk in quarantined])
+    through.objects.filter(robottag=tag, robottest_id__in=released).delete()
+    if quarantined or released:
+        bump_catalog_version(application.pk)
+        logger.info('Quarantined {q} and released {r} tests of {app}.'.format(q=len(quarantined), r=len(released),
+                                                                             app=application))
+    return quarantined, released
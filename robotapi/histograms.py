@@ -0,0 +1,60 @@
+"""
+Mergeable duration histograms.
+
+Durations are counted in logarithmic buckets, each BUCKET_RATIO times wider than the one before, from BUCKET_BASE
+seconds up to a day. A histogram is a sparse dict mapping bucket numbers to counts, stored as JSON, so the histograms
+of separate runs (or days) merge by adding counts, and percentiles are estimated from the merged counts with an error
+of at most half a bucket (about 12%) instead of from every recorded duration.
+"""
+import json
+import math
+
+BUCKET_BASE = 0.001
+BUCKET_RATIO = 1.25
+BUCKET_COUNT = 84   # The last bucket starts at about a day
+
+
+def bucket(seconds):
+    """The number of the bucket counting a duration of ``seconds``."""
+    if seconds <= BUCKET_BASE:
+        return 0
+    return min(int(math.log(seconds / BUCKET_BASE, BUCKET_RATIO)), BUCKET_COUNT - 1)
+
+
+def bucket_value(number):
+    """The representative duration of a bucket: the geometric middle of its bounds."""
+    return BUCKET_BASE * BUCKET_RATIO ** (number + 0.5)
+
+
+def add(histogram, seconds, count=1):
+    key = bucket(seconds)
+    histogram[key] = histogram.get(key, 0) + count
+    return histogram
+
+
+def merge(histogram, other):
+    for key, count in other.items():
+        histogram[key] = histogram.get(key, 0) + count
+    return histogram
+
+
+def percentile(histogram, fraction):
+    """Estimate the duration below which ``fraction`` (e.g. 0.95) of the counted durations fall. 0 when empty."""
+    total = sum(histogram.values())
+    if not total:
+        return 0
+    rank = max(1, math.ceil(fraction * total))
+    seen = 0
+    for key in sorted(histogram):
+        seen += histogram[key]
+        if seen >= rank:
+            return bucket_value(key)
+    return bucket_value(max(histogram))
+
+
+def loads(text):
+    return {int(key): count for key, count in json.loads(text or '{}').items()}
+
+
+def dumps(histogram):
+    return json.dumps({str(key): count for key, count in sorted(histogram.items())}, separators=(',', ':'))
@@ -0,0 +1,71 @@
+import logging
+import os
+import re
+import subprocess
+
+from django.db.models import Q
+
+from testrunner.models import RobotTest
+from .exceptions import RobotExecutionException
+from .keywords import suites_depending_on
+
+logger = logging.getLogger(__name__)
+
+COMMIT_RANGE = re.compile(r'^[\w./~^@{}-]+(\.\.\.?[\w./~^@{}-]+)?$')
+
+
+def _git(directory, *args):
+    try:
+        completed_process = subprocess.run(['git', '-C', directory] + list(args),
+                                           stdout=subprocess.PIPE,
+                                           stderr=subprocess.PIPE)
+    except OSError as e:
+        raise RobotExecutionException('Could not run git to find the changed files: ' + str(e))
+    if completed_process.returncode != 0:
+        raise RobotExecutionException('git {cmd} failed: {err}'.format(cmd=args[0],
+                                                                      err=completed_process.stderr.decode('utf-8')))
+    return completed_process.stdout.decode('utf-8')
+
+
+def changed_files(directory, commit_range):
+    """
+    Return the absolute paths of the files changed in ``commit_range`` (anything ``git diff`` accepts, e.g.
+    ``main..feature`` or ``HEAD~3``) of the local git repository that contains ``directory``.
+    """
+    if not COMMIT_RANGE.match(commit_range or '') or commit_range.startswith('-'):
+        raise RobotExecutionException('Invalid commit range: ' + str(commit_range))
+    top_level = _git(directory, 'rev-parse', '--show-toplevel').strip()
+    names = _git(directory, 'diff', '--name-only', '--no-renames', commit_range, '--').splitlines()
+    return [os.path.normpath(os.path.join(top_level, name)) for name in names if name]
+
+
+def impacted_tests(application, paths):
+    """
+    Return the queryset of active tests of ``application`` affected by changes to the files at ``paths``: the tests
+    of every suite defined by or depending on a changed file (see ``suites_depending_on``) and of all of their child
+    suites. Changed Python files also match library imports by module name.
+    """
+    paths = list(paths)
+    names = [os.path.splitext(os.path.basename(p))[0] for p in paths if p.endswith('.py')]
+    suites = list(suites_depending_on(application, paths + names).values_list('pk', 'full_name'))
+    if not suites:
+        return RobotTest.objects.none()
+    affected = Q(robot_suite_id__in=[pk for pk, _ in suites])
+    for _, full_name in suites:
+        affected |= Q(robot_suite__full_name__startswith=full_name + '.')
+    return RobotTest.objects.filter(affected, active=True, robot_suite__application=application)
+
+
+def select_changed_tests(application, commit_range):
+    """
+    Select the tests of ``application`` affected by the changes in ``commit_range`` of the git repository holding its
+    tests. Returns the changed files, the selected tests and the number of active tests of the application.
+    """
+    paths = changed_files(application.app_test_location, commit_range)
+    selected = list(impacted_tests(application, paths).select_related('robot_suite__application')
+                    .order_by('robot_suite__full_name', 'name'))
+    total = RobotTest.objects.filter(active=True, robot_suite__application=application).count()
+    logger.info('{n} files changed in {r}; selected {s} of {t} tests of {app}.'.format(n=len(paths), r=commit_range,
+                                                                                   s=len(selected), t=total,
+                                                                                   app=application))
+    return paths, selected, total
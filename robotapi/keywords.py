@@ -0,0 +1,221 @@
+import logging
+import os
+import re
+
+from django.db.models import Q
+from robot.errors import DataError
+from robot.parsing.model import ResourceFile
+
+from testrunner.models import RobotTest, RobotTestSuite
+
+logger = logging.getLogger(__name__)
+
+BDD_PREFIXES = ('given ', 'when ', 'then ', 'and ', 'but ')
+VARIABLE = re.compile(r'[$@&%]\{[^}]*\}')
+
+
+def normalize_keyword(name):
+    """Normalize a keyword name the way Robot Framework compares them: case, spaces and underscores are ignored."""
+    return re.sub(r'[\s_]', '', name).lower()
+
+
+def resolve_import_path(name, directory):
+    """
+    Resolve the path of a resource or variable file import relative to the importing file's ``directory``. Only
+    ``${CURDIR}`` can be resolved without running robot, so imports using any other variable return None, as do
+    imports of files that do not exist.
+    """
+    name = name.replace('${CURDIR}', directory)
+    if VARIABLE.search(name):
+        return None
+    path = os.path.normpath(os.path.join(directory, name.replace('/', os.sep)))
+    return path if os.path.isfile(path) else None
+
+
+def resolve_library(name, directory):
+    """
+    Resolve a library import to the path of its Python file when it is a file next to the importing file (or given
+    by path), otherwise return the library name unchanged: standard and installed libraries are identified by name.
+    """
+    if name.endswith('.py') or '/' in name or os.sep in name:
+        return resolve_import_path(name, directory) or name
+    for candidate in (name.replace('.', '/') + '.py', name.replace('.', '/') + '/__init__.py'):
+        path = resolve_import_path(candidate, directory)
+        if path is not None:
+            return path
+    return name
+
+
+def _is_set(name):
+    return bool(name) and name.upper() != 'NONE'
+
+
+def _step_calls(steps):
+    """The names of the keywords called by a list of parsed steps, looking inside for loops."""
+    for step in steps:
+        if step.is_for_loop():
+            for name in _step_calls(step.steps):
+                yield name
+        elif step.name:
+            yield step.name
+
+
+class KeywordLibrary:
+
+    def __init__(self, test_data):
+        """
+        The user keywords visible to the tests of one suite file: its own keyword table, followed by the keyword
+        tables of every resource file it imports (directly or through other resource files). Use this to find the
+        steps of a test and every keyword it reaches. While reading the imports, every resource file, variable file and
+        library the suite depends on is recorded in ``dependencies``.
+        :param test_data: the parsed robot test case file or directory (robot.parsing.model.TestCaseFile or
+        TestDataDirectory).
+        """
+        self.source = test_data.source
+        self.settings = test_data.setting_table
+        self.keywords = dict()      # normalized name -> UserKeyword
+        self.embedded = list()      # (compiled name pattern, UserKeyword) for keywords with embedded arguments
+        self.resource_files = list()
+        self.dependencies = dict()  # path (or library name) -> (import type, whether the suite imports it itself)
+        self._closures = dict()
+        self._add_keywords(test_data)
+        self._import_resources(test_data, direct=True)
+
+    def _add_keywords(self, data):
+        for keyword in data.keyword_table:
+            if VARIABLE.search(keyword.name):
+                pattern = ''.join('.*?' if VARIABLE.match(part) else re.escape(part)
+                                  for part in re.split(r'([$@&%]\{[^}]*\})', keyword.name))
+                self.embedded.append((re.compile(pattern + r'\Z', re.IGNORECASE), keyword))
+            else:
+                self.keywords.setdefault(normalize_keyword(keyword.name), keyword)    # Local keywords win.
+
+    def _import_resources(self, data, direct):
+        for setting in data.setting_table.imports:
+            if setting.type == 'Library':
+                self._add_dependency(resolve_library(setting.name, setting.directory), 'library', direct)
+                continue
+            path = resolve_import_path(setting.name, setting.directory)
+            if setting.type == 'Variables':
+                if path is not None:
+                    self._add_dependency(path, 'variables', direct)
+                continue
+            if path is None:
+                logger.info('(Skipped) Could not resolve resource import {r} in {s}'.format(r=setting.name,
+                                                                                          s=data.source))
+                continue
+            self._add_dependency(path, 'resource', direct)
+            if path in self.resource_files:
+                continue
+            self.resource_files.append(path)
+            try:
+                resource = ResourceFile(source=path).populate()
+            except DataError as e:
+                logger.warning('Could not parse the resource file {p}: {e}'.format(p=path, e=e))
+                continue
+            self._add_keywords(resource)
+            self._import_resources(resource, direct=False)
+
+    def _add_dependency(self, path, kind, direct):
+        if path not in self.dependencies or direct:
+            self.dependencies[path] = (kind, direct)
+
+    def find(self, name):
+        """Return the user keyword that a call to ``name`` runs, or None if it is a library keyword."""
+        keyword = self.keywords.get(normalize_keyword(name))
+        if keyword is not None:
+            return keyword
+        for pattern, keyword in self.embedded:
+            if pattern.match(name):
+                return keyword
+        for prefix in BDD_PREFIXES:
+            if name.lower().startswith(prefix):
+                return self.find(name[len(prefix):])
+        return None
+
+    def test_steps(self, test):
+        """
+        Return the body of a test as a list of (keyword, arguments) pairs, in execution order. For loops appear as a
+        ``FOR`` step followed by the steps they repeat. Rows of templated tests are calls to the template keyword.
+        """
+        template = test.template.value if test.template.is_set() else self.settings.test_template.value
+        steps = list()
+        for step in test.steps:
+            if step.is_for_loop():
+                steps.append(('FOR', step.vars + [step.flavor] + step.items))
+                steps.extend((s.name, s.assign + s.args) for s in step.steps if not s.is_comment() and s.name)
+            elif step.is_comment():
+                continue
+            elif _is_set(template):
+                steps.append((template, step.as_list(include_comment=False)))
+            elif step.name:
+                steps.append((step.name, step.assign + step.args))
+        return steps
+
+    def test_keywords(self, test):
+        """
+        Return every keyword a test runs as a dict mapping the normalized keyword name to a (name, depth) pair. The
+        depth is 0 for the keywords called by the test itself (including its setup, teardown and template) and one
+        more for each user keyword in between. User keywords are listed by the name they are defined with.
+        """
+        setup = test.setup.name if test.setup.is_set() else self.settings.test_setup.name
+        teardown = test.teardown.name if test.teardown.is_set() else self.settings.test_teardown.name
+        direct = [name for name in (setup, teardown) if _is_set(name)]
+        direct.extend(keyword for keyword, _ in self.test_steps(test) if keyword != 'FOR')
+        reached = dict()
+        for name in direct:
+            _merge(reached, self._closure(name), 0)
+        return reached
+
+    def _closure(self, name, _active=None):
+        """All keywords reached by calling ``name``, with their depth below the call (memoized per name)."""
+        key = normalize_keyword(name)
+        if key in self._closures:
+            return self._closures[key]
+        user_keyword = self.find(name)
+        if user_keyword is None:
+            return {key: (name, 0)}
+        reached = {normalize_keyword(user_keyword.name): (user_keyword.name, 0)}
+        active = _active or set()
+        if key in active:
+            return reached      # A recursive call; the calls of this keyword are already being collected.
+        active.add(key)
+        calls = list(_step_calls(user_keyword.steps))
+        if _is_set(user_keyword.teardown.name):
+            calls.append(user_keyword.teardown.name)
+        for call in calls:
+            _merge(reached, self._closure(call, active), 1)
+        active.discard(key)
+        if not active:
+            self._closures[key] = reached
+        return reached
+
+
+def _merge(reached, closure, offset):
+    for key, (name, depth) in closure.items():
+        if key not in reached or depth + offset < reached[key][1]:
+            reached[key] = (name, depth + offset)
+
+
+def tests_using_keyword(application, keyword):
+    """
+    Return the queryset of active tests of ``application`` that run ``keyword``, directly or through user keywords,
+    as recorded at discovery. A leading Given/When/Then/And/But is ignored, as it is when robot runs the keyword.
+    """
+    names = {normalize_keyword(keyword)}
+    names.update(normalize_keyword(keyword[len(p):]) for p in BDD_PREFIXES if keyword.lower().startswith(p))
+    return RobotTest.objects.filter(active=True,
+                                    keyword_usage__application=application,
+                                    keyword_usage__normalized_keyword__in=names).distinct()
+
+
+def suites_depending_on(application, paths):
+    """
+    Return the queryset of suites of ``application`` that must be read again after the files at ``paths`` changed:
+    the suites defined by those files (an ``__init__`` file defines its directory's suite) and every suite importing
+    them, directly or through resource files. Library paths may also be given as the library name.
+    """
+    paths = [os.path.normpath(os.path.abspath(p)) if os.sep in p or '/' in p else p for p in paths]
+    locations = paths + [os.path.dirname(p) for p in paths if os.path.basename(p).startswith('__init__.')]
+    return RobotTestSuite.objects.filter(Q(suite_location__in=locations) | Q(dependency__path__in=paths),
+                                         application=application).distinct()
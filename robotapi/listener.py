@@ -0,0 +1,70 @@
+"""
+Robot Framework listener (listener API version 3) that reports suite and test progress to RobotWeb while robot runs.
+
+RobotExecutionEngine attaches this module with ``--listener`` and sets the ROBOTWEB_COLLECTOR environment variable
+to the address of the collector waiting for the events: ``host:port`` for a loopback TCP socket or the path of a Unix
+socket. Every start and end of a suite or test is sent as one line of JSON. The listener only uses the standard
+library, so it runs with whichever Python the application's robot uses, and a collector that cannot be reached never
+fails the run.
+"""
+import json
+import os
+import socket
+
+ROBOT_LISTENER_API_VERSION = 3
+COLLECTOR_ENVIRONMENT_VARIABLE = 'ROBOTWEB_COLLECTOR'
+
+_connection = None
+_disabled = False
+
+
+def _connect():
+    address = os.environ.get(COLLECTOR_ENVIRONMENT_VARIABLE, '')
+    if address.startswith('/'):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(address)
+    else:
+        host, port = address.rsplit(':', 1)
+        connection = socket.create_connection((host, int(port)), timeout=5)
+    return connection
+
+
+def _send(event, result):
+    global _connection, _disabled
+    if _disabled:
+        return
+    message = {'event': event,
+               'name': result.longname,
+               'status': getattr(result, 'status', None),
+               'starttime': result.starttime,
+               'endtime': result.endtime,
+               'message': result.message}
+    try:
+        if _connection is None:
+            _connection = _connect()
+        _connection.sendall((json.dumps(message) + '\n').encode('utf-8'))
+    except (OSError, ValueError):
+        _disabled = True    # Progress is a convenience; the results are still read from output.xml afterwards.
+
+
+def start_suite(data, result):
+    _send('start_suite', result)
+
+
+def end_suite(data, result):
+    _send('end_suite', result)
+
+
+def start_test(data, result):
+    _send('start_test', result)
+
+
+def end_test(data, result):
+    _send('end_test', result)
+
+
+def close():
+    global _connection
+    if _connection is not None:
+        _connection.close()
+        _connection = None
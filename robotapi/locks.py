@@ -0,0 +1,120 @@
+"""
+Exclusive resources shared by tests.
+
+Tests declare the resources they need exclusively, such as a shared test account or a single external device, with
+``lock:<name>`` tags (suites with Force Tags, so their tests inherit them), which discovery records like any tag. A run
+acquires a RobotResourceLock row for every resource its tests declare before robot starts, all of them or none, and
+releases them when it finishes, so runs needing the same resource take turns while all other runs proceed
+concurrently. Runs wait for their resources as ``waiting`` executions, before they are admitted (see
+robotapi.admission), so the wait does not take a slot of the host's capacity. ``plan_shards`` splits the tests of one
+run over parallel shards the same way: tests sharing a resource always land in the same shard, where they run one
+after the other.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from testrunner.models import RobotResourceLock, RobotTest
+
+logger = logging.getLogger(__name__)
+
+LOCK_TAG_PREFIX = 'lock:'
+LOCK_TIMEOUT = getattr(settings, 'TESTRUNNER_LOCK_TIMEOUT', 60 * 60)
+LOCK_POLL_INTERVAL = 5
+# Executions in these states keep their locks; the locks of any other execution are stale.
+LOCK_HOLDING_STATUSES = ('waiting', 'queued', 'in progress')
+
+
+def test_resources(tests):
+    """
+    The resources declared by each of the given RobotTests (a queryset).
+    :return: a dict mapping test primary keys to the set of resource names of the tests that declare any.
+    """
+    resources = dict()
+    for test_id, tag in RobotTest.robot_tags.through.objects.filter(
+            robottest__in=tests, robottag__normalized_name__startswith=LOCK_TAG_PREFIX).values_list(
+            'robottest_id', 'robottag__normalized_name'):
+        resources.setdefault(test_id, set()).add(tag[len(LOCK_TAG_PREFIX):])
+    return resources
+
+
+def _try_acquire(execution, names):
+    """Lock all of ``names`` for ``execution`` in one transaction, or none. Returns the names held by other runs."""
+    try:
+        with transaction.atomic():
+            held = list(RobotResourceLock.objects.select_for_update().filter(
+                application=execution.application_id, name__in=names).exclude(execution=execution).select_related(
+                'execution'))
+            stale = [lock.pk for lock in held if lock.execution.status not in LOCK_HOLDING_STATUSES]
+            RobotResourceLock.objects.filter(pk__in=stale).delete()     # Left behind by runs that ended abnormally
+            busy = sorted(lock.name for lock in held if lock.pk not in stale)
+            if busy:
+                return busy
+            mine = set(RobotResourceLock.objects.filter(execution=execution).values_list('name', flat=True))
+            RobotResourceLock.objects.bulk_create([RobotResourceLock(application_id=execution.application_id,
+                                                                     name=name, execution=execution)
+                                                   for name in sorted(set(names) - mine)])
+            return []
+    except IntegrityError:  # Another run acquired one of them in the meantime
+        return sorted(names)
+
+
+def acquire_resources(execution, names, timeout=None, poll_interval=None):
+    """
+    Wait until ``execution`` holds the locks of all of the resources ``names``.
+    :param timeout: the number of seconds to wait at most, TESTRUNNER_LOCK_TIMEOUT by default.
+    :return: an empty list once acquired, or the names of the resources still held by other runs after ``timeout``.
+    """
+    timeout = LOCK_TIMEOUT if timeout is None else timeout
+    poll_interval = LOCK_POLL_INTERVAL if poll_interval is None else poll_interval
+    deadline = time.monotonic() + timeout
+    while True:
+        busy = _try_acquire(execution, names) if names else []
+        if not busy or time.monotonic() >= deadline:
+            return busy
+        logger.info('{e} is waiting for resources held by other runs: {r}'.format(e=execution, r=', '.join(busy)))
+        time.sleep(poll_interval)
+
+
+def release_resources(execution):
+    return RobotResourceLock.objects.filter(execution=execution).delete()[0]
+
+
+def plan_shards(estimates, resources, count):
+    """
+    Split tests over ``count`` shards to run in parallel, keeping the tests that share a resource in one shard and
+    balancing the expected durations: groups of tests are assigned longest first, each to the shard expected to finish
+    first.
+    :param estimates: a dict mapping test primary keys to their expected number of seconds (see robotapi.estimates).
+    :param resources: a dict mapping test primary keys to the resource names they declare (see ``test_resources``).
+    :param count: the number of shards.
+    :return: a list of ``count`` dicts with the ``tests`` (primary keys), ``resources`` and ``expected_duration`` of
+    each shard.
+    """
+    parents = {test_id: test_id for test_id in estimates}
+
+    def root(test_id):
+        while parents[test_id] != test_id:
+            parents[test_id] = parents[parents[test_id]]
+            test_id = parents[test_id]
+        return test_id
+
+    holders = dict()    # resource name -> a test declaring it
+    for test_id in sorted(estimates):
+        for name in resources.get(test_id, ()):
+            if name in holders:
+                parents[root(test_id)] = root(holders[name])
+            else:
+                holders[name] = test_id
+    groups = dict()
+    for test_id in sorted(estimates):
+        groups.setdefault(root(test_id), list()).append(test_id)
+    shards = [{'tests': [], 'resources': set(), 'expected_duration': 0} for _ in range(max(1, count))]
+    for group in sorted(groups.values(), key=lambda g: (-sum(estimates[t] for t in g), g[0])):
+        shard = min(shards, key=lambda s: s['expected_duration'])
+        shard['tests'].extend(group)
+        shard['resources'].update(name for t in group for name in resources.get(t, ()))
+        shard['expected_duration'] += sum(estimates[t] for t in group)
+    return shards
@@ -0,0 +1,258 @@
+"""
+Index of the suite, test and keyword elements of a robot output.xml.
+
+The output of a run is read once, with a streaming expat parser, when its results are recorded. Every suite, test and
+keyword becomes a fixed size record of an index file kept next to the output.xml, holding its status, times, number of
+children and the byte offsets of its element in the output.xml, so a log viewer can expand a giant log one node at a
+time: the children of a node are a slice of one array of the file, and the messages of a keyword are parsed from its
+own bytes only. The index goes away with the output it describes. The same pass collects the keyword timings of
+robotapi.profiler.
+
+An index file is a header, then the node records in the order their elements end (so a node's number is known by the
+time its parent ends), then the numbers of the children of every node, each node's children one after the other, then
+the UTF-8 names of the nodes.
+"""
+import logging
+import math
+import os
+import shutil
+import struct
+import tempfile
+from array import array
+from collections import namedtuple
+from datetime import datetime
+from xml.parsers import expat
+
+from django.utils import timezone
+
+from .profiler import PROFILED_KEYWORD_TYPES, KeywordTimings
+from .results import robot_time
+
+logger = logging.getLogger(__name__)
+
+INDEXED_ELEMENTS = {'suite': 'suite', 'test': 'test', 'kw': 'keyword'}
+KINDS = ('suite', 'test', 'keyword')
+LOG_INDEX_SUFFIX = '.index'
+READ_SIZE = 64 * 1024
+
+MAGIC = b'RWLI'
+# Magic, node count, position of the root nodes among the children numbers, number of root nodes, number of children
+# numbers.
+HEADER = struct.Struct('<4sQQIQ')
+# Kind, keyword type, status, start and end time (POSIX seconds, NaN when unknown), start and end byte offset, position
+# of the first child among the children numbers, child count, offset and length of the name in the names.
+RECORD = struct.Struct('<B12s8sddQQQIQI')
+CHILD = 'I'     # array type code of the children numbers, 4 bytes
+
+LogNode = namedtuple('LogNode', ['number', 'kind', 'keyword_type', 'name', 'status', 'start_time', 'end_time',
+                                 'start_offset', 'end_offset', 'first_child', 'child_count'])
+
+
+def index_path(output_file):
+    """The path of the log index of ``output_file``."""
+    return output_file + LOG_INDEX_SUFFIX
+
+
+def _timestamp(value):
+    return value.timestamp() if value is not None else math.nan
+
+
+def _datetime(value):
+    return None if math.isnan(value) else datetime.fromtimestamp(value, timezone.utc)
+
+
+class _OpenNode:
+
+    __slots__ = ('kind', 'keyword_type', 'name', 'status', 'start_time', 'end_time', 'start_offset', 'depth',
+                 'children')
+
+    def __init__(self, kind, keyword_type, name, start_offset, depth):
+        self.kind = kind
+        self.keyword_type = keyword_type
+        self.name = name
+        self.status = ''
+        self.start_time = None
+        self.end_time = None
+        self.start_offset = start_offset
+        self.depth = depth
+        self.children = array(CHILD)
+
+
+class _LogIndexer:
+
+    def __init__(self, index, children, names, timings=None):
+        self.index = index
+        self.children = children
+        self.names = names
+        self.timings = timings
+        self.parser = expat.ParserCreate()
+        self.parser.StartElementHandler = self.start_element
+        self.parser.EndElementHandler = self.end_element
+        self.open_nodes = list()    # the indexed elements enclosing the current one
+        self.roots = array(CHILD)
+        self.depth = 0
+        self.count = 0
+        self.child_count = 0
+        self.names_size = 0
+
+    def start_element(self, name, attributes):
+        self.depth += 1
+        # The root suite is a direct child of <robot>; the <suite> elements of <statistics> are not indexed.
+        if name in INDEXED_ELEMENTS and (self.open_nodes or self.depth == 2):
+            full_name = '.'.join(n for n in (attributes.get('library'), attributes.get('name', '')) if n)
+            self.open_nodes.append(_OpenNode(INDEXED_ELEMENTS[name], attributes.get('type', '')[:12], full_name,
+                                             self.parser.CurrentByteIndex, self.depth))
+        elif name == 'status' and self.open_nodes and self.open_nodes[-1].depth == self.depth - 1:
+            node = self.open_nodes[-1]
+            node.status = attributes.get('status', '')[:8]
+            node.start_time = robot_time(attributes.get('starttime'))
+            node.end_time = robot_time(attributes.get('endtime'))
+
+    def end_element(self, name):
+        if name in INDEXED_ELEMENTS and self.open_nodes and self.open_nodes[-1].depth == self.depth:
+            node = self.open_nodes.pop()
+            end_offset = self.parser.CurrentByteIndex + len('</{name}>'.format(name=name))
+            if self.timings is not None and node.kind == 'keyword' and node.keyword_type in PROFILED_KEYWORD_TYPES \
+                    and node.start_time is not None and node.end_time is not None:
+                self.timings.add(node.name, (node.end_time - node.start_time).total_seconds())
+            encoded_name = node.name.encode('utf-8')
+            self.index.write(RECORD.pack(KINDS.index(node.kind), node.keyword_type.encode('utf-8'),
+                                         node.status.encode('utf-8'), _timestamp(node.start_time),
+                                         _timestamp(node.end_time), node.start_offset, end_offset, self.child_count,
+                                         len(node.children), self.names_size, len(encoded_name)))
+            self.names.write(encoded_name)
+            self.names_size += len(encoded_name)
+            node.children.tofile(self.children)
+            self.child_count += len(node.children)
+            (self.open_nodes[-1].children if self.open_nodes else self.roots).append(self.count)
+            self.count += 1
+        self.depth -= 1
+
+    def finish(self):
+        """Append the root nodes, the children and the names to the index and fill in its header."""
+        roots_start = self.child_count
+        self.roots.tofile(self.children)
+        for section in (self.children, self.names):
+            section.seek(0)
+            shutil.copyfileobj(section, self.index)
+        self.index.seek(0)
+        self.index.write(HEADER.pack(MAGIC, self.count, roots_start, len(self.roots), roots_start + len(self.roots)))
+
+
+def index_log(output_file, application=None):
+    """
+    Replace the log index of ``output_file`` with its suites, tests and keywords.
+    :param application: the application whose keyword timings the keyword calls of the output are added to, if any.
+    Outputs that merge runs whose keywords were counted already (reruns) should not be profiled again.
+    :return: the number of indexed nodes.
+    """
+    path = index_path(output_file)
+    partial = path + '.partial'
+    try:
+        with open(output_file, 'rb') as output, open(partial, 'wb') as index, tempfile.TemporaryFile() as children, \
+                tempfile.TemporaryFile() as names:
+            index.write(bytes(HEADER.size))
+            indexer = _LogIndexer(index, children, names, KeywordTimings() if application is not None else None)
+            indexer.parser.ParseFile(output)
+            indexer.finish()
+        os.replace(partial, path)
+    except (OSError, expat.ExpatError) as e:
+        logger.error('Could not index the robot output file {f}: {e}'.format(f=output_file, e=e))
+        for stale in (partial, path):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+        return 0
+    if indexer.timings is not None:
+        indexer.timings.save(application)
+    logger.info('Indexed {n} log nodes of {f}'.format(n=indexer.count, f=output_file))
+    return indexer.count
+
+
+class LogIndex:
+
+    def __init__(self, output_file):
+        """
+        The log index of ``output_file``, read a few records at a time. Use it as a context manager to close the file.
+        :raises OSError: if the output has no index (yet).
+        """
+        self.file = open(index_path(output_file), 'rb')
+        magic, self.count, self.roots_start, self.root_count, children = HEADER.unpack(self.file.read(HEADER.size))
+        if magic != MAGIC:
+            self.file.close()
+            raise OSError('{f} is not a log index.'.format(f=index_path(output_file)))
+        self.children_offset = HEADER.size + self.count * RECORD.size
+        self.names_offset = self.children_offset + children * array(CHILD).itemsize
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.file.close()
+
+    def node(self, number):
+        """The node numbered ``number``, or None if the index has no such node."""
+        if not 0 <= number < self.count:
+            return None
+        self.file.seek(HEADER.size + number * RECORD.size)
+        kind, keyword_type, status, start_time, end_time, start_offset, end_offset, first_child, child_count, \
+            name_offset, name_length = RECORD.unpack(self.file.read(RECORD.size))
+        self.file.seek(self.names_offset + name_offset)
+        return LogNode(number, KINDS[kind], keyword_type.rstrip(b'\0').decode('utf-8'),
+                       self.file.read(name_length).decode('utf-8'), status.rstrip(b'\0').decode('utf-8'),
+                       _datetime(start_time), _datetime(end_time), start_offset, end_offset, first_child, child_count)
+
+    def children(self, node=None, offset=0, limit=None):
+        """
+        The nodes directly inside ``node`` (the root suite when it is None) in the order robot ran them, from the
+        ``offset``-th on and at most ``limit`` of them.
+        """
+        first, count = (self.roots_start, self.root_count) if node is None else (node.first_child, node.child_count)
+        offset = min(max(offset, 0), count)
+        count = count - offset if limit is None else min(limit, count - offset)
+        numbers = array(CHILD)
+        self.file.seek(self.children_offset + (first + offset) * numbers.itemsize)
+        numbers.fromfile(self.file, count)
+        return [self.node(number) for number in numbers]
+
+
+def node_messages(output_file, node, limit):
+    """
+    Read the messages a keyword logged directly (not those of the keywords it calls) from its own bytes of the
+    output.xml, stopping after ``limit`` messages.
+    :return: a list of dicts with the level, timestamp and text of each message.
+    """
+    messages = list()
+    state = {'depth': 0, 'message': None}
+
+    def start_element(name, attributes):
+        state['depth'] += 1
+        if name == 'msg' and state['depth'] == 2:
+            state['message'] = {'level': attributes.get('level', ''), 'timestamp': attributes.get('timestamp', ''),
+                                'text': ''}
+
+    def character_data(data):
+        if state['message'] is not None:
+            state['message']['text'] += data
+
+    def end_element(name):
+        if state['message'] is not None and state['depth'] == 2:
+            messages.append(state['message'])
+            state['message'] = None
+        state['depth'] -= 1
+
+    parser = expat.ParserCreate()
+    parser.StartElementHandler = start_element
+    parser.CharacterDataHandler = character_data
+    parser.EndElementHandler = end_element
+    with open(output_file, 'rb') as output:
+        output.seek(node.start_offset)
+        remaining = node.end_offset - node.start_offset
+        while remaining > 0 and len(messages) < limit:
+            data = output.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            parser.Parse(data, remaining <= 0)
+    return messages[:limit]
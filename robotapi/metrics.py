@@ -0,0 +1,180 @@
+"""
+In-process metrics, exposed in the Prometheus text format at /metrics.
+
+Counters and histograms are kept in the memory of each process and updated under one lock, so an observation costs a
+dict lookup and an addition, and nothing is written anywhere until the metrics are scraped. Every web worker reports
+only what it saw itself and its counts start over when it restarts; Prometheus adds up the workers (scrape each one,
+or label them by instance) and computes rates from the restarted counters.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Seconds. Web requests and discovery phases take milliseconds to seconds, robot runs seconds to hours.
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+PHASE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+RUN_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200, 14400)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join('{n}="{v}"'.format(n=n, v=_escape(v)) for n, v in zip(names, values)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+
+    def __init__(self):
+        """The metrics of a process, rendered together. Metrics register themselves when they are created."""
+        self.lock = threading.Lock()
+        self.metrics = dict()   # name -> metric, in the order they were created
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError('A metric named {n} already exists.'.format(n=metric.name))
+        self.metrics[metric.name] = metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = list()
+        with self.lock:
+            for metric in self.metrics.values():
+                lines.append('# HELP {n} {d}'.format(n=metric.name, d=metric.documentation))
+                lines.append('# TYPE {n} {t}'.format(n=metric.name, t=metric.kind))
+                lines.extend(metric.lines())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+
+    kind = None
+
+    def __init__(self, name, documentation, labels=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.registry = registry
+        self.values = dict()    # tuple of label values -> value
+        registry.register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError('{n} takes the labels {l}.'.format(n=self.name, l=', '.join(self.labels) or 'none'))
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def lines(self):
+        for key, value in sorted(self.values.items()):
+            yield '{n}{l} {v}'.format(n=self.name, l=_format_labels(self.labels, key), v=_format_value(value))
+
+
+class Counter(_Metric):
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.values[key] = value
+
+
+class Histogram(_Metric):
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=REQUEST_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labels, registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.registry.lock:
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = [0] * (len(self.buckets) + 1) + [0]     # Bucket counts, +Inf, then sum
+            counts[index] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the number of seconds the body of a ``with`` block takes, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def lines(self):
+        names = self.labels + ('le',)
+        for key, counts in sorted(self.values.items()):
+            total = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                total += count
+                yield '{n}_bucket{l} {c}'.format(n=self.name, l=_format_labels(names, key + (_format_value(bound),)),
+                                                 c=total)
+            labels = _format_labels(self.labels, key)
+            yield '{n}_sum{l} {s}'.format(n=self.name, l=labels, s=_format_value(counts[-1]))
+            yield '{n}_count{l} {c}'.format(n=self.name, l=labels, c=total)
+
+
+# Discovery
+DISCOVERY_PHASE_SECONDS = Histogram('robotweb_discovery_phase_seconds',
+                                    'Seconds spent in each phase of discovering the tests of an application.',
+                                    ['phase'], PHASE_BUCKETS)
+DISCOVERY_ROWS_WRITTEN = Counter('robotweb_discovery_rows_written_total',
+                                 'Rows written to each table by discovery.', ['table'])
+
+# Execution
+ADMISSIONS = Counter('robotweb_admissions_total',
+                     'Robot runs admitted at once (admitted), after waiting in the queue (queued) or rejected.',
+                     ['outcome'])
+QUEUE_WAIT_SECONDS = Histogram('robotweb_execution_queue_wait_seconds',
+                               'Seconds admitted robot runs waited in the queue.', buckets=RUN_BUCKETS)
+STARTUP_SECONDS = Histogram('robotweb_execution_startup_seconds',
+                            'Seconds from admitting a robot run (and acquiring its resources) to starting robot.',
+                            buckets=PHASE_BUCKETS)
+RUN_SECONDS = Histogram('robotweb_execution_run_seconds', 'Seconds robot processes ran, by final run status.',
+                        ['status'], RUN_BUCKETS)
+EXIT_CODES = Counter('robotweb_execution_exit_codes_total',
+                     'Exit codes of robot processes; robot exits with the number of failed tests, up to 250.',
+                     ['code'])
+OUTPUT_BYTES = Counter('robotweb_execution_output_bytes_total',
+                       'Bytes of console output and output.xml written by robot processes.', ['stream'])
+ADMISSION_RUNNING = Gauge('robotweb_admission_running_runs', 'Robot runs in progress on this host.')
+ADMISSION_QUEUED = Gauge('robotweb_admission_queued_runs', 'Robot runs queued for admission on this host.')
+ADMISSION_REJECTED = Gauge('robotweb_admission_rejected_runs',
+                           'Robot runs rejected on this host since the cache was last cleared, across processes.')
+
+# Web
+REQUESTS = Counter('robotweb_http_requests_total', 'Web requests, by URL name and response status.',
+                   ['view', 'status'])
+REQUEST_SECONDS = Histogram('robotweb_http_request_seconds', 'Seconds taken to respond to web requests, by URL name.',
+                            ['view'], REQUEST_BUCKETS)
+REQUEST_QUERIES = Histogram('robotweb_http_request_queries', 'Database queries run per web request, by URL name.',
+                            ['view'], QUERY_BUCKETS)
@@ -0,0 +1,111 @@
+"""
+Process group handling for robot runs.
+
+Robot is started in a session (and so a process group) of its own, so the browsers, drivers and other processes it
+starts can be stopped together with it. Stopping escalates from SIGINT, which makes robot stop gracefully and still
+write its output, to SIGTERM and finally SIGKILL for the whole group.
+"""
+import logging
+import os
+import signal
+import socket
+import subprocess
+
+from django.utils import timezone
+
+from testrunner.models import RobotExecution, RobotResourceLock, RobotTestRun
+
+logger = logging.getLogger(__name__)
+
+PROCESS_GROUPS = os.name == 'posix'
+STOP_SIGNALS = (signal.SIGINT, signal.SIGTERM, signal.SIGKILL) if PROCESS_GROUPS else ()
+
+
+def signal_process_group(pgid, sig):
+    """Send ``sig`` to every process of a process group. Returns False if the group no longer exists."""
+    try:
+        os.killpg(pgid, sig)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        logger.warning('Not allowed to signal process group {g}.'.format(g=pgid))
+        return False
+    return True
+
+
+def process_group_alive(pgid):
+    return PROCESS_GROUPS and signal_process_group(pgid, 0)
+
+
+def stop_process(process, grace_period):
+    """
+    Stop a process started in its own process group together with everything it started: SIGINT first, then SIGTERM
+    and SIGKILL, waiting ``grace_period`` seconds for the process to exit after each. The process is always waited
+    for, so it does not linger as a zombie.
+    :return: the (stdout, stderr) the process wrote.
+    """
+    for sig in STOP_SIGNALS:
+        logger.warning('Sending {s} to the process group of {pid}.'.format(s=signal.Signals(sig).name, pid=process.pid))
+        signal_process_group(process.pid, sig)
+        try:
+            return process.communicate(timeout=grace_period)
+        except subprocess.TimeoutExpired:
+            continue
+    process.kill()
+    return process.communicate()
+
+
+def reap_executions(now=None):
+    """
+    Clean up after robot runs on this host that can no longer finish normally: runs past their deadline (for example
+    because the worker that started them died) and runs whose robot process is gone. The process group of each one is
+    killed, so no browser or driver it started keeps running, and the run is marked as timed out or as an error. Runs
+    whose robot has not started yet (waiting for resources, queued, or in progress before robot starts) are marked as
+    an error when the worker running them is gone, and their resource locks are released.
+    :return: the list of RobotExecution objects that were reaped.
+    """
+    now = now or timezone.now()
+    reaped = list()
+    for execution in RobotExecution.objects.filter(status='in progress', host=socket.gethostname(),
+                                                   pid__isnull=False):
+        overdue = execution.deadline is not None and execution.deadline < now
+        if not overdue and _process_running(execution.pid):
+            continue
+        if process_group_alive(execution.pid):
+            signal_process_group(execution.pid, signal.SIGKILL)
+        execution.status = 'timed out' if overdue else 'error'
+        execution.end_time = now
+        execution.save(update_fields=['status', 'end_time'])
+        RobotTestRun.objects.filter(execution=execution, status='in progress').update(status=execution.status)
+        logger.warning('Reaped {e}: process group {pid} was {state}.'.format(e=execution, pid=execution.pid,
+                                                                            state='overdue' if overdue else 'orphaned'))
+        reaped.append(execution)
+    # Runs whose worker died before robot started would hold up the capacity and queue of this host forever.
+    for execution in RobotExecution.objects.filter(status__in=('waiting', 'queued', 'in progress'),
+                                                   host=socket.gethostname(), pid__isnull=True,
+                                                   worker_pid__isnull=False):
+        if _process_running(execution.worker_pid):
+            continue
+        execution.status, execution.end_time = 'error', now
+        execution.save(update_fields=['status', 'end_time'])
+        RobotTestRun.objects.filter(execution=execution, status='in progress').update(status='error')
+        RobotResourceLock.objects.filter(execution=execution).delete()
+        logger.warning('Reaped {e}: worker {pid} is gone.'.format(e=execution, pid=execution.worker_pid))
+        reaped.append(execution)
+    return reaped
+
+
+def _process_running(pid):
+    """True if ``pid`` is a live process (not a zombie waiting to be reaped by its parent)."""
+    try:
+        with open('/proc/{pid}/stat'.format(pid=pid)) as stat:
+            return stat.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except OSError:
+        pass
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,61 @@
+"""
+Keyword hot spots across runs.
+
+While the output.xml of a run is indexed (see robotapi.logindex), the duration of every keyword call is added to a
+KeywordTimings accumulator, which then folds the run into one RobotKeywordTiming row per keyword and application: the
+call count, total and longest duration, and a histogram (see robotapi.histograms) that the median and 95th percentile
+are estimated from. Durations include the keywords a keyword calls, so a slow user keyword and the library keyword
+that makes it slow both stand out.
+"""
+from django.db import transaction
+
+from testrunner.models import RobotKeywordTiming
+from . import histograms
+
+# Loop constructs are logged like keywords but are not keywords.
+PROFILED_KEYWORD_TYPES = ('', 'kw', 'setup', 'teardown')
+
+
+class KeywordTimings:
+
+    def __init__(self):
+        self.keywords = dict()  # keyword name -> [call count, total seconds, longest seconds, histogram]
+
+    def add(self, keyword, seconds):
+        timing = self.keywords.setdefault(keyword[:500], [0, 0.0, 0.0, dict()])
+        timing[0] += 1
+        timing[1] += seconds
+        timing[2] = max(timing[2], seconds)
+        histograms.add(timing[3], seconds)
+
+    def save(self, application):
+        """Fold the accumulated calls into the RobotKeywordTiming rows of ``application``."""
+        with transaction.atomic():
+            existing = {t.keyword: t for t in RobotKeywordTiming.objects.select_for_update().filter(
+                application=application, keyword__in=list(self.keywords))}
+            created = list()
+            for keyword, (count, total, longest, histogram) in self.keywords.items():
+                timing = existing.get(keyword) or RobotKeywordTiming(application=application, keyword=keyword)
+                histogram = histograms.merge(histograms.loads(timing.histogram), histogram)
+                timing.call_count += count
+                timing.total_duration += total
+                timing.max_duration = max(timing.max_duration, longest)
+                timing.p50_duration = histograms.percentile(histogram, 0.5)
+                timing.p95_duration = histograms.percentile(histogram, 0.95)
+                timing.histogram = histograms.dumps(histogram)
+                if timing.pk is None:
+                    created.append(timing)
+                else:
+                    timing.save()
+            RobotKeywordTiming.objects.bulk_create(created)
+        return len(self.keywords)
+
+
+def slowest_keywords(application, order='total', limit=50):
+    """
+    The keywords of an application that took the most time.
+    :param order: ``total`` (time spent in all calls), ``p95``, ``p50``, ``max`` or ``calls``.
+    """
+    field = {'total': 'total_duration', 'p95': 'p95_duration', 'p50': 'p50_duration', 'max': 'max_duration',
+             'calls': 'call_count'}.get(order, 'total_duration')
+    return RobotKeywordTiming.objects.filter(application=application).order_by('-' + field, 'keyword')[:limit]
@@ -0,0 +1,128 @@
+import logging
+import os
+import subprocess
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+from robot.api import ExecutionResult
+from robot.errors import DataError
+
+from testrunner.cache import bump_catalog_version
+from testrunner.models import RobotTest, RobotTestRun, milliseconds_between
+from .estimates import update_duration_estimates
+from .exceptions import RobotExecutionException
+from .rollups import rollup_results
+
+logger = logging.getLogger(__name__)
+
+FAILED_RESULTS = ('fail', 'error')
+
+
+def robot_time(timestamp):
+    """Convert a robot output timestamp (e.g. 20190304 03:13:00.123) to an aware datetime, or None if it is N/A."""
+    if not timestamp or timestamp.upper() == 'N/A':
+        return None
+    return timezone.make_aware(datetime.strptime(timestamp, '%Y%m%d %H:%M:%S.%f'), timezone.utc)
+
+
+def _all_tests(suite):
+    for test in suite.tests:
+        yield test
+    for child in suite.suites:
+        for test in _all_tests(child):
+            yield test
+
+
+def record_results(execution, output_file, fingerprints=None):
+    """
+    Read a robot output.xml and store one RobotTestRun per executed test, linked to ``execution``. Tests are matched to
+    the application's RobotTests by their full name; tests that were never discovered are skipped.
+    :param fingerprints: optionally, a dict mapping RobotTest primary keys to the fingerprint to store with their result
+    (see robotapi.reuse).
+    :return: the list of created RobotTestRun objects.
+    """
+    fingerprints = fingerprints or dict()
+    try:
+        result = ExecutionResult(output_file)
+    except DataError as e:
+        raise RobotExecutionException('Could not read the robot output file {f}: {e}'.format(f=output_file, e=e))
+    robot_tests = {t.verbose_name: t for t in RobotTest.objects.select_related('robot_suite').filter(
+        robot_suite__application=execution.application)}
+    test_runs = list()
+    for test in _all_tests(result.suite):
+        robot_test = robot_tests.get(test.longname)
+        if robot_test is None:
+            logger.info('(Skipped) Result for a test that was not discovered: ' + test.longname)
+            continue
+        start_time = robot_time(test.starttime) or execution.start_time
+        end_time = robot_time(test.endtime) or start_time
+        test_runs.append(RobotTestRun(robot_test=robot_test,
+                                      application=execution.application,
+                                      execution=execution,
+                                      result='pass' if test.passed else 'fail',
+                                      start_time=start_time,
+                                      end_time=end_time,
+                                      duration_ms=milliseconds_between(start_time, end_time),
+                                      status='complete',
+                                      reason=test.message[:400],
+                                      fingerprint=fingerprints.get(robot_test.pk, ''),
+                                      rolled_up=True))
+    with transaction.atomic():
+        # The output is the complete record, so it replaces the progress reported while robot was running.
+        RobotTestRun.objects.filter(execution=execution).exclude(status='cached').delete()
+        RobotTestRun.objects.bulk_create(test_runs)
+        rollup_results(execution.application, test_runs)
+    update_duration_estimates({r.robot_test.pk: (r.end_time - r.start_time).total_seconds() for r in test_runs})
+    bump_catalog_version(execution.application_id)
+    logger.info('Recorded {n} test results from {f}'.format(n=len(test_runs), f=output_file))
+    return test_runs
+
+
+def failed_tests(tests):
+    """
+    Narrow a RobotTest queryset down to the active tests whose latest RobotTestRun failed (or errored). Each test is
+    annotated with ``latest_execution``, the RobotExecution that produced that result.
+    """
+    latest_runs = RobotTestRun.objects.filter(robot_test=OuterRef('pk')).order_by('-start_time', '-pk')
+    return tests.filter(active=True).annotate(latest_result=Subquery(latest_runs.values('result')[:1]),
+                                              latest_execution=Subquery(latest_runs.values('execution')[:1])).filter(
+        latest_result__in=FAILED_RESULTS)
+
+
+def tests_in_suites(suites):
+    """All RobotTests of the given suites and of their child suites."""
+    in_suites = Q(robot_suite__in=suites)
+    for suite in suites:
+        in_suites |= Q(robot_suite__application=suite.application_id,
+                       robot_suite__full_name__startswith=suite.full_name + '.')
+    return RobotTest.objects.filter(in_suites)
+
+
+def original_execution(execution):
+    """The run that ``execution`` reruns failures of, following ``rerun_of`` through reruns of reruns."""
+    while execution.rerun_of_id is not None:
+        execution = execution.rerun_of
+    return execution
+
+
+def merge_results(executable, original_output, rerun_output):
+    """
+    Merge the results of a rerun into the original run with ``rebot --merge``, rewriting the original output.xml, log
+    and report in place, so the final picture shows the rerun results of the failed tests next to the results of the
+    tests that already passed. ``rebot`` is taken from next to the ``robot`` executable.
+    :raises RobotExecutionException: if rebot cannot be started or fails.
+    """
+    rebot = os.path.join(os.path.dirname(executable), 'rebot' + ('.exe' if executable.endswith('.exe') else ''))
+    output_dir = os.path.dirname(original_output)
+    command = [rebot, '--merge', '--outputdir', output_dir, '--output', os.path.basename(original_output),
+               '--log', 'log.html', '--report', 'report.html', original_output, rerun_output]
+    logger.info('Merging rerun results with: ' + str(command))
+    try:
+        completed_process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as e:
+        raise RobotExecutionException('Could not merge the rerun results: {e}'.format(e=e))
+    if completed_process.returncode >= 250:    # rebot returns the number of failed tests below 250
+        raise RobotExecutionException('Could not merge the rerun results: ' + completed_process.stderr.decode('utf-8'))
+
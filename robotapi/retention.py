@@ -0,0 +1,65 @@
+"""
+Retention of individual test results.
+
+Every recorded RobotTestRun is counted into the daily rollups of robotapi.rollups, which is all the trend and
+flakiness queries need once a result is old. ``compact_test_runs`` first rolls up any result that is not counted yet,
+then deletes the results older than the retention of their application in small batches, each its own short
+transaction, so runs recording results meanwhile are never blocked for long. The latest result of each test stays,
+because rerunning failed tests and reusing cached results look it up.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import OuterRef, Q, Subquery
+from django.utils import timezone
+
+from testrunner.models import RobotApplicationUnderTest, RobotTestRun
+from .rollups import ROLLED_UP_STATUSES, backfill_rollups
+
+logger = logging.getLogger(__name__)
+
+RUN_RETENTION_DAYS = getattr(settings, 'TESTRUNNER_RUN_RETENTION_DAYS', None)
+RUN_RETENTION_BATCH_SIZE = getattr(settings, 'TESTRUNNER_RUN_RETENTION_BATCH_SIZE', 1000)
+
+
+def expired_test_runs(application, days, now=None):
+    """
+    The RobotTestRuns of ``application`` that started more than ``days`` days ago and may be deleted: those counted in
+    the rollups, or that never will be (cached results and runs that did not finish), except the latest run of each
+    test and the runs of executions still in progress.
+    """
+    now = now or timezone.now()
+    latest_run = RobotTestRun.objects.filter(robot_test=OuterRef('robot_test')).order_by('-start_time', '-pk')
+    return (RobotTestRun.objects.filter(application=application, start_time__lt=now - timedelta(days=days))
+            .filter(Q(rolled_up=True) | ~Q(status__in=ROLLED_UP_STATUSES))
+            .exclude(execution__status='in progress')
+            .exclude(pk=Subquery(latest_run.values('pk')[:1])))
+
+
+def compact_test_runs(days=None, now=None, batch_size=None):
+    """
+    Roll up and delete the test results older than the retention of each application: its run_retention_days, else
+    ``days``, else TESTRUNNER_RUN_RETENTION_DAYS. Applications without a retention keep all of their results.
+    :return: a list of (application, number of results rolled up, number of results deleted) tuples.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or RUN_RETENTION_BATCH_SIZE
+    compacted = list()
+    for application in RobotApplicationUnderTest.objects.all():
+        retention = application.run_retention_days
+        retention = (days if days is not None else RUN_RETENTION_DAYS) if retention is None else retention
+        if retention is None:
+            continue
+        rolled_up = backfill_rollups(application)
+        expired = expired_test_runs(application, retention, now)
+        deleted = 0
+        while True:
+            batch = list(expired.values_list('pk', flat=True)[:batch_size])
+            if not batch:
+                break
+            deleted += RobotTestRun.objects.filter(pk__in=batch).delete()[0]
+        logger.info('Compacted the test results of {app}: {r} rolled up, {d} deleted.'.format(
+            app=application, r=rolled_up, d=deleted))
+        compacted.append((application, rolled_up, deleted))
+    return compacted
@@ -0,0 +1,98 @@
+"""
+Reuse of passing results for deterministic tests.
+
+Tests opt in with the TESTRUNNER_RESULT_CACHE_TAG tag. Each one is fingerprinted with the content of its suite file,
+the ``__init__`` files of its parent directory suites and every resource and variable file the suite imports (as
+recorded at discovery), together with the environment and variables of the run. A test whose fingerprint matches a
+pass from within the last TESTRUNNER_RESULT_CACHE_TTL seconds does not need to run again.
+"""
+import hashlib
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from testrunner.models import RobotSuiteDependency, RobotTest, RobotTestRun, RobotTag
+
+RESULT_CACHE_TAG = getattr(settings, 'TESTRUNNER_RESULT_CACHE_TAG', 'cacheable')
+RESULT_CACHE_TTL = getattr(settings, 'TESTRUNNER_RESULT_CACHE_TTL', 24 * 60 * 60)
+
+
+def cacheable_tests(tests):
+    """Narrow a RobotTest queryset down to the tests that opted in to result reuse with the result cache tag."""
+    tagged = RobotTest.robot_tags.through.objects.filter(
+        robottag__normalized_name=RobotTag.normalize(RESULT_CACHE_TAG)).values('robottest_id')
+    return tests.filter(pk__in=tagged)
+
+
+def _file_digest(path, digests):
+    if path not in digests:
+        digest = hashlib.sha256()
+        try:
+            with open(path, 'rb') as source:
+                for block in iter(lambda: source.read(65536), b''):
+                    digest.update(block)
+        except OSError:
+            digest.update(b'missing')
+        digests[path] = digest.hexdigest()
+    return digests[path]
+
+
+def _init_files(suite_location, root):
+    """The ``__init__`` files of the directory suites between ``root`` and the suite at ``suite_location``."""
+    directory = os.path.dirname(suite_location) if os.path.isfile(suite_location) else suite_location
+    init_files = list()
+    while directory.startswith(root):
+        init_files.extend(os.path.join(directory, f) for f in os.listdir(directory) if f.startswith('__init__.'))
+        if directory == root:
+            break
+        directory = os.path.dirname(directory)
+    return init_files
+
+
+def fingerprint_tests(tests, environment=None, variables=None):
+    """
+    Fingerprint each of the given RobotTests (with their suites selected) for the given run settings.
+    :param tests: RobotTest objects of one application.
+    :param environment: the RobotTestEnvironment of the run, if any.
+    :param variables: a dict of the variables the run sets.
+    :return: a dict mapping the primary key of each test to its fingerprint.
+    """
+    tests = list(tests)
+    if not tests:
+        return dict()
+    suite_ids = {t.robot_suite_id for t in tests}
+    dependencies = dict()
+    for suite_id, path in RobotSuiteDependency.objects.filter(robot_suite_id__in=suite_ids,
+                                                               kind__in=['resource', 'variables']).values_list(
+            'robot_suite_id', 'path'):
+        dependencies.setdefault(suite_id, list()).append(path)
+    root = tests[0].robot_suite.application.app_test_location
+    run_settings = repr((environment.host_url if environment is not None else None,
+                         sorted((variables or dict()).items())))
+    digests = dict()
+    suite_digests = dict()
+    fingerprints = dict()
+    for test in tests:
+        if test.robot_suite_id not in suite_digests:
+            location = test.robot_suite.suite_location
+            paths = [location] + sorted(_init_files(location, root)) + sorted(dependencies.get(test.robot_suite_id, []))
+            suite_digests[test.robot_suite_id] = [(path, _file_digest(path, digests)) for path in paths]
+        fingerprint = hashlib.sha256(repr((test.verbose_name, suite_digests[test.robot_suite_id],
+                                           run_settings)).encode('utf-8'))
+        fingerprints[test.pk] = fingerprint.hexdigest()
+    return fingerprints
+
+
+def reusable_results(fingerprints, ttl=None):
+    """
+    Find a passing RobotTestRun from within ``ttl`` seconds (TESTRUNNER_RESULT_CACHE_TTL by default) for each test whose
+    fingerprint it shares.
+    :param fingerprints: a dict mapping RobotTest primary keys to their current fingerprint.
+    :return: a dict mapping the primary key of each test that does not need to run again to the reusable run.
+    """
+    cutoff = timezone.now() - timedelta(seconds=RESULT_CACHE_TTL if ttl is None else ttl)
+    runs = RobotTestRun.objects.filter(robot_test_id__in=list(fingerprints), fingerprint__in=set(fingerprints.values()),
+                                       result='pass', status='complete', end_time__gte=cutoff).order_by('end_time')
+    return {run.robot_test_id: run for run in runs if fingerprints[run.robot_test_id] == run.fingerprint}
@@ -0,0 +1,204 @@
+"""
+Daily rollups of test results.
+
+Each recorded RobotTestRun is counted, once, into a row per day for its test, for its suite and every parent suite,
+and for its application: the number of runs, passes and fails, the total duration, a duration histogram (see
+robotapi.histograms) and the number of flips, runs whose result differs from the test's previous run. Rollups are
+updated as results are recorded, and the backfill_rollups command counts the runs recorded before. Trend and
+flakiness queries read only the rollups, so their cost depends on the number of days, not on the number of runs.
+"""
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from testrunner.models import RobotApplicationDailyRollup, RobotSuiteDailyRollup, RobotTest, RobotTestDailyRollup, \
+    RobotTestRun, RobotTestSuite
+from . import histograms
+
+ROLLED_UP_RESULTS = ('pass', 'fail', 'error')
+# Cached results repeat an earlier run, and runs in progress have no result yet.
+ROLLED_UP_STATUSES = ('complete', 'timed out', 'error')
+BACKFILL_BATCH_SIZE = 5000
+
+
+class _Counts:
+
+    def __init__(self):
+        self.runs = self.passes = self.fails = self.flips = 0
+        self.total_duration = 0.0
+        self.histogram = dict()
+        self.last_result = ''
+
+    def add(self, result, seconds, flipped):
+        self.runs += 1
+        self.passes += result == 'pass'
+        self.fails += result != 'pass'
+        self.flips += flipped
+        self.total_duration += seconds
+        histograms.add(self.histogram, seconds)
+        self.last_result = result
+
+
+class RollupBuilder:
+
+    def __init__(self, application):
+        """
+        Count test runs of one application into its daily rollups. Add runs in the order they ran, then save.
+        :param application: the testrunner.models.RobotApplicationUnderTest the runs belong to.
+        """
+        self.application = application
+        self.last_results = dict()      # RobotTest primary key -> result of its latest counted run
+        self.suite_ids = None           # suite full name -> primary key, for finding the parent suites of a test
+        self._reset()
+
+    def _reset(self):
+        self.tests = dict()             # (test primary key, day) -> _Counts
+        self.suites = dict()            # (suite primary key, day) -> _Counts
+        self.days = dict()              # day -> _Counts
+        self.runs = list()
+
+    def _suite_chain(self, suite):
+        if self.suite_ids is None:
+            self.suite_ids = dict(RobotTestSuite.objects.filter(application=self.application).values_list(
+                'full_name', 'pk'))
+        parts = suite.full_name.split('.')
+        chain = [self.suite_ids.get('.'.join(parts[:i])) for i in range(1, len(parts) + 1)]
+        return [pk for pk in chain if pk is not None] or [suite.pk]
+
+    def _load_last_results(self, test_ids):
+        missing = [pk for pk in test_ids if pk not in self.last_results]
+        if not missing:
+            return
+        latest = RobotTestDailyRollup.objects.filter(robot_test=OuterRef('pk')).order_by('-day')
+        for pk, result in RobotTest.objects.filter(pk__in=missing).annotate(
+                last_result=Subquery(latest.values('last_result')[:1])).values_list('pk', 'last_result'):
+            self.last_results[pk] = result or ''
+
+    def add(self, test_runs):
+        """Count RobotTestRuns (with their robot_test and its robot_suite selected), oldest first."""
+        test_runs = [r for r in test_runs if r.result in ROLLED_UP_RESULTS and r.status in ROLLED_UP_STATUSES]
+        self._load_last_results({r.robot_test_id for r in test_runs})
+        chains = dict()
+        for run in test_runs:
+            test = run.robot_test
+            day = timezone.localtime(run.start_time).date()
+            seconds = run.duration_ms / 1000
+            previous = self.last_results.get(test.pk, '')
+            flipped = bool(previous) and (previous == 'pass') != (run.result == 'pass')
+            self.last_results[test.pk] = run.result
+            if test.robot_suite_id not in chains:
+                chains[test.robot_suite_id] = self._suite_chain(test.robot_suite)
+            counts = [self.tests.setdefault((test.pk, day), _Counts()), self.days.setdefault(day, _Counts())]
+            counts.extend(self.suites.setdefault((pk, day), _Counts()) for pk in chains[test.robot_suite_id])
+            for count in counts:
+                count.add(run.result, seconds, flipped)
+            self.runs.append(run)
+
+    def save(self):
+        """Add the counted runs to the rollups and mark them as rolled up."""
+        with transaction.atomic():
+            self._save(RobotTestDailyRollup, 'robot_test_id', self.tests)
+            self._save(RobotSuiteDailyRollup, 'robot_suite_id', self.suites)
+            self._save(RobotApplicationDailyRollup, 'application_id',
+                       {(self.application.pk, day): counts for day, counts in self.days.items()})
+            saved = [r.pk for r in self.runs if r.pk is not None]
+            for start in range(0, len(saved), BACKFILL_BATCH_SIZE):
+                RobotTestRun.objects.filter(pk__in=saved[start:start + BACKFILL_BATCH_SIZE]).update(rolled_up=True)
+        count = len(self.runs)
+        self._reset()
+        return count
+
+    @staticmethod
+    def _save(model, key_field, deltas):
+        if not deltas:
+            return
+        keys = {key for key, _ in deltas}
+        days = {day for _, day in deltas}
+        existing = {(getattr(r, key_field), r.day): r for r in model.objects.select_for_update().filter(
+            **{key_field + '__in': keys, 'day__in': days})}
+        created = list()
+        for (key, day), counts in deltas.items():
+            rollup = existing.get((key, day)) or model(day=day, **{key_field: key})
+            rollup.runs += counts.runs
+            rollup.passes += counts.passes
+            rollup.fails += counts.fails
+            rollup.flips += counts.flips
+            rollup.total_duration += counts.total_duration
+            rollup.histogram = histograms.dumps(histograms.merge(histograms.loads(rollup.histogram), counts.histogram))
+            if hasattr(rollup, 'last_result'):
+                rollup.last_result = counts.last_result
+            if rollup.pk is None:
+                created.append(rollup)
+            else:
+                rollup.save()
+        model.objects.bulk_create(created)
+
+
+def rollup_results(application, test_runs):
+    """Count newly recorded RobotTestRuns of ``application`` into its daily rollups."""
+    builder = RollupBuilder(application)
+    builder.add(sorted(test_runs, key=lambda r: r.start_time))
+    return builder.save()
+
+
+def backfill_rollups(application, rebuild=False):
+    """
+    Count the runs of ``application`` that are not in its rollups yet, oldest first, in batches.
+    :param rebuild: delete the rollups of the application first and count all of its runs again.
+    :return: the number of runs counted.
+    """
+    runs = RobotTestRun.objects.filter(application=application)
+    if rebuild:
+        RobotTestDailyRollup.objects.filter(robot_test__robot_suite__application=application).delete()
+        RobotSuiteDailyRollup.objects.filter(robot_suite__application=application).delete()
+        RobotApplicationDailyRollup.objects.filter(application=application).delete()
+        runs.filter(rolled_up=True).update(rolled_up=False)
+    pending = runs.filter(rolled_up=False, result__in=ROLLED_UP_RESULTS, status__in=ROLLED_UP_STATUSES)
+    builder = RollupBuilder(application)
+    counted = 0
+    while True:
+        batch = list(pending.select_related('robot_test__robot_suite').order_by('start_time', 'pk')[
+                     :BACKFILL_BATCH_SIZE])
+        if not batch:
+            return counted
+        builder.add(batch)
+        counted += builder.save()
+
+
+def _rollup_summary(rollup):
+    histogram = histograms.loads(rollup.histogram)
+    return {'day': rollup.day,
+            'runs': rollup.runs,
+            'passes': rollup.passes,
+            'fails': rollup.fails,
+            'pass_rate': rollup.pass_rate,
+            'mean_duration': rollup.mean_duration,
+            'p50_duration': histograms.percentile(histogram, 0.5),
+            'p95_duration': histograms.percentile(histogram, 0.95),
+            'flips': rollup.flips}
+
+
+def trends(application, days=30, suite=None, test=None, today=None):
+    """
+    The daily pass rate, durations and flips of an application, or of one of its suites or tests, over the last
+    ``days`` days, read from the rollups only.
+    :return: a list of dicts, one per day with runs, oldest first.
+    """
+    since = (today or date.today()) - timedelta(days=days - 1)
+    if test is not None:
+        rollups = RobotTestDailyRollup.objects.filter(robot_test=test)
+    elif suite is not None:
+        rollups = RobotSuiteDailyRollup.objects.filter(robot_suite=suite)
+    else:
+        rollups = RobotApplicationDailyRollup.objects.filter(application=application)
+    return [_rollup_summary(r) for r in rollups.filter(day__gte=since).order_by('day')]
+
+
+def flakiest_tests(application, days=30, limit=10, today=None):
+    """The tests of an application whose results flipped most often over the last ``days`` days."""
+    since = (today or date.today()) - timedelta(days=days - 1)
+    return (RobotTestDailyRollup.objects.filter(robot_test__robot_suite__application=application, day__gte=since)
+            .values('robot_test', 'robot_test__name', 'robot_test__robot_suite__full_name')
+            .annotate(flips=Sum('flips'), runs=Sum('runs')).filter(flips__gt=0).order_by('-flips', '-runs')[:limit])
@@ -0,0 +1,137 @@
+import fnmatch
+import re
+
+from django.db.models import Q
+
+from testrunner.models import RobotTag, RobotTest
+
+
+def normalize_tag(tag):
+    """Normalize a tag the way Robot Framework compares them: case, spaces and underscores are ignored."""
+    return RobotTag.normalize(tag)
+
+
+def merge_tags(*tag_lists):
+    """Concatenate lists of tags, dropping empty tags and duplicates (after normalization) but keeping the first
+    spelling of each."""
+    tags = list()
+    seen = set()
+    for tag in [t for tag_list in tag_lists for t in tag_list]:
+        if tag and normalize_tag(tag) not in seen:
+            seen.add(normalize_tag(tag))
+            tags.append(tag)
+    return tags
+
+
+def effective_test_tags(force_tags, default_tags, test_tags):
+    """
+    Return the tags Robot Framework gives a test: the Force Tags of its suite and every parent suite, plus either the
+    test's own [Tags] or, if it has none, the Default Tags of its suite file. ``[Tags]    NONE`` clears the defaults.
+    """
+    own_tags = default_tags if test_tags is None else [t for t in test_tags if t != 'NONE']
+    return merge_tags(force_tags, own_tags)
+
+
+class TagExpression:
+
+    def __init__(self, pattern):
+        """
+        A parsed Robot Framework tag pattern, as accepted by robot's ``--include`` and ``--exclude`` options. The
+        grammar matches robot.model.tags.TagPattern: ``NOT`` binds loosest, then ``OR``, then ``AND`` (or ``&``), and
+        single patterns may use the ``*`` and ``?`` wildcards. Spaces are ignored, so ``foo AND bar*`` is the same as
+        ``fooANDbar*``.
+        :param pattern: the tag pattern text.
+        """
+        self.pattern = pattern
+        pattern = pattern.replace(' ', '')
+        if 'NOT' in pattern:
+            must_match, *must_not_match = pattern.split('NOT')
+            self.operator = 'NOT'
+            self.operands = [TagExpression(must_match)] + [TagExpression(p) for p in must_not_match]
+        elif 'OR' in pattern:
+            self.operator = 'OR'
+            self.operands = [TagExpression(p) for p in pattern.split('OR')]
+        elif 'AND' in pattern or '&' in pattern:
+            self.operator = 'AND'
+            self.operands = [TagExpression(p) for p in pattern.replace('&', 'AND').split('AND')]
+        else:
+            self.operator = None
+            self.operands = list()
+            self.single_pattern = normalize_tag(pattern)
+
+    def __bool__(self):
+        return self.operator is not None or bool(self.single_pattern)
+
+    def to_q(self, vocabulary):
+        """
+        Build a filter on RobotTest that selects the tests this expression matches. ``vocabulary`` maps normalized
+        tag names to RobotTag primary keys; wildcard patterns are expanded against it so that the database only ever
+        compares indexed tag ids.
+        """
+        if self.operator is None:
+            if any(c in self.single_pattern for c in '*?['):
+                regex = re.compile(fnmatch.translate(self.single_pattern), re.DOTALL)
+                tag_ids = [pk for name, pks in vocabulary.items() if regex.match(name) for pk in pks]
+            else:
+                tag_ids = vocabulary.get(self.single_pattern, [])
+            tagged = RobotTest.robot_tags.through.objects.filter(robottag_id__in=tag_ids).values('robottest_id')
+            return Q(pk__in=tagged)
+        if self.operator == 'AND':
+            return _combine([operand.to_q(vocabulary) for operand in self.operands], and_=True)
+        if self.operator == 'OR':
+            return _combine([operand.to_q(vocabulary) for operand in self.operands], and_=False)
+        first, rest = self.operands[0], self.operands[1:]
+        excluded = ~_combine([operand.to_q(vocabulary) for operand in rest], and_=False)
+        return first.to_q(vocabulary) & excluded if first else excluded
+
+    def __str__(self):
+        return self.pattern
+
+
+def _combine(filters, and_):
+    combined = filters[0]
+    for f in filters[1:]:
+        combined = combined & f if and_ else combined | f
+    return combined
+
+
+def tag_vocabulary(application):
+    """Map each normalized tag name of ``application`` to the primary keys of the RobotTag rows that carry it."""
+    vocabulary = dict()
+    for normalized_name, pk in RobotTag.objects.filter(application=application).values_list('normalized_name', 'pk'):
+        vocabulary.setdefault(normalized_name, list()).append(pk)
+    return vocabulary
+
+
+def _as_list(patterns):
+    if not patterns:
+        return list()
+    if isinstance(patterns, str):
+        return [patterns]
+    return list(patterns)
+
+
+def select_tests(application, include=None, exclude=None, tests=None):
+    """
+    Evaluate robot's ``--include``/``--exclude`` tag patterns against the tags recorded at discovery and return the
+    queryset of active RobotTests that a run with those options would execute, without launching robot. As in robot,
+    a test is selected if it matches any include pattern (or there are none) and no exclude pattern.
+    :param application: the RobotApplicationUnderTest to select tests from.
+    :param include: a tag pattern or a list of them.
+    :param exclude: a tag pattern or a list of them.
+    :param tests: optionally, a RobotTest queryset (e.g. the tests of one suite) to narrow down further.
+    """
+    if tests is None:
+        tests = RobotTest.objects.filter(robot_suite__application=application)
+    tests = tests.filter(active=True)
+    include = [TagExpression(p) for p in _as_list(include)]
+    exclude = [TagExpression(p) for p in _as_list(exclude)]
+    if not any(include) and not any(exclude):
+        return tests
+    vocabulary = tag_vocabulary(application)
+    if any(include):
+        tests = tests.filter(_combine([p.to_q(vocabulary) for p in include if p], and_=False))
+    if any(exclude):
+        tests = tests.exclude(_combine([p.to_q(vocabulary) for p in exclude if p], and_=False))
+    return tests
+
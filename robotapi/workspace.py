@@ -0,0 +1,88 @@
+"""
+Per-run working directories.
+
+Robot writes each run into a scratch directory of its own under TESTRUNNER_SCRATCH_ROOT, which may be a RAM-backed
+file system such as /dev/shm for fast output, so concurrent runs never share or overwrite files. When the run
+finishes, the artifacts matching TESTRUNNER_ARTIFACTS are promoted to TESTRUNNER_ARTIFACT_ROOT/execution-<pk> and the
+scratch directory is removed. Scratch directories left behind by runs that never finished are removed by
+``clean_scratch`` (the clean_scratch management command), which should run on a schedule.
+"""
+import fnmatch
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+
+from testrunner.models import RobotExecution
+
+logger = logging.getLogger(__name__)
+
+SCRATCH_ROOT = getattr(settings, 'TESTRUNNER_SCRATCH_ROOT', None) or os.path.join(tempfile.gettempdir(), 'robotweb')
+ARTIFACT_ROOT = getattr(settings, 'TESTRUNNER_ARTIFACT_ROOT', os.path.join(settings.BASE_DIR, 'output'))
+ARTIFACTS = getattr(settings, 'TESTRUNNER_ARTIFACTS', ['output.xml', 'log.html', 'report.html', '*.png'])
+SCRATCH_MAX_AGE = getattr(settings, 'TESTRUNNER_SCRATCH_MAX_AGE', 24 * 60 * 60)
+
+SCRATCH_DIR_NAME = re.compile(r'^execution-(\d+)-')
+
+
+def create_scratch_dir(execution):
+    """Create a new, empty scratch directory for a robot execution and return its path."""
+    os.makedirs(SCRATCH_ROOT, exist_ok=True)
+    return tempfile.mkdtemp(prefix='execution-{pk}-'.format(pk=execution.pk), dir=SCRATCH_ROOT)
+
+
+def artifact_dir(execution):
+    """The durable directory the artifacts of a robot execution are promoted to."""
+    return os.path.abspath(os.path.join(ARTIFACT_ROOT, 'execution-{pk}'.format(pk=execution.pk)))
+
+
+def promote_artifacts(scratch_dir, execution):
+    """
+    Move the files of a finished run that match TESTRUNNER_ARTIFACTS (anywhere below ``scratch_dir``, keeping their
+    relative paths) to the execution's artifact directory, then remove the scratch directory.
+    :return: the artifact directory.
+    """
+    destination = artifact_dir(execution)
+    promoted = 0
+    for directory, _, files in os.walk(scratch_dir):
+        for name in files:
+            if not any(fnmatch.fnmatch(name, pattern) for pattern in ARTIFACTS):
+                continue
+            target = os.path.join(destination, os.path.relpath(os.path.join(directory, name), scratch_dir))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(os.path.join(directory, name), target)
+            promoted += 1
+    shutil.rmtree(scratch_dir, ignore_errors=True)
+    logger.info('Promoted {n} artifacts of {e} to {d}'.format(n=promoted, e=execution, d=destination))
+    return destination
+
+
+def clean_scratch(max_age=None, now=None):
+    """
+    Remove the scratch directories older than ``max_age`` seconds (TESTRUNNER_SCRATCH_MAX_AGE by default) that do not
+    belong to a run still in progress.
+    :return: the list of removed directories.
+    """
+    if not os.path.isdir(SCRATCH_ROOT):
+        return list()
+    cutoff = (now or time.time()) - (SCRATCH_MAX_AGE if max_age is None else max_age)
+    candidates = dict()
+    for name in os.listdir(SCRATCH_ROOT):
+        match = SCRATCH_DIR_NAME.match(name)
+        path = os.path.join(SCRATCH_ROOT, name)
+        if match and os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+            candidates[path] = int(match.group(1))
+    running = set(RobotExecution.objects.filter(pk__in=set(candidates.values()), status='in progress').values_list(
+        'pk', flat=True))
+    removed = list()
+    for path, pk in sorted(candidates.items()):
+        if pk in running:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        logger.info('Removed the scratch directory ' + path)
+        removed.append(path)
+    return removed
@@ -41,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so the latency it counts for /metrics (see robotapi.metrics) includes every other middleware.
+    'testrunner.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,6 +65,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'testrunner.context_processors.search',
             ],
         },
     },
@@ -82,6 +85,105 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+# The testrunner catalog pages are cached per application and invalidated by version bumps stored in this cache. The
+# local-memory backend is private to each process, so switch to django.core.cache.backends.filebased.FileBasedCache (or
+# another shared backend) when serving the site from more than one process.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'robotweb',
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    }
+}
+
+TESTRUNNER_CATALOG_CACHE_TIMEOUT = 60 * 60
+
+# Test results
+# Tests tagged with TESTRUNNER_RESULT_CACHE_TAG opt in to result reuse: when one of them passed within the last
+# TESTRUNNER_RESULT_CACHE_TTL seconds with the same source files, environment and variables, it is reported as a cached
+# pass instead of being run again.
+
+TESTRUNNER_RESULT_CACHE_TAG = 'cacheable'
+TESTRUNNER_RESULT_CACHE_TTL = 24 * 60 * 60
+
+# Robot runs taking longer than this many seconds are stopped, unless the application sets its own run timeout. None
+# lets runs take as long as they need. The reap_executions command cleans up after runs whose worker died.
+
+TESTRUNNER_RUN_TIMEOUT = None
+
+# Run progress is estimated from a moving average of each test's recorded run times. Tests that never ran are expected
+# to take as long as the average test of their application, or this many seconds when none ran yet.
+
+TESTRUNNER_DEFAULT_TEST_DURATION = 10
+
+# Each robot run writes to a directory of its own under TESTRUNNER_SCRATCH_ROOT (a directory named robotweb in the
+# system's temporary directory when None); a RAM-backed file system such as /dev/shm/robotweb makes robot's output
+# faster. When the run finishes, the files matching the TESTRUNNER_ARTIFACTS patterns are moved to
+# TESTRUNNER_ARTIFACT_ROOT/execution-<id>. The clean_scratch command removes scratch directories older than
+# TESTRUNNER_SCRATCH_MAX_AGE seconds that runs left behind.
+
+TESTRUNNER_SCRATCH_ROOT = None
+TESTRUNNER_ARTIFACT_ROOT = os.path.join(BASE_DIR, 'output')
+TESTRUNNER_ARTIFACTS = ['output.xml', 'log.html', 'report.html', '*.png']
+TESTRUNNER_SCRATCH_MAX_AGE = 24 * 60 * 60
+
+# Promoted artifacts are stored gzip compressed under TESTRUNNER_BLOB_ROOT, once per distinct content. The
+# prune_artifacts command deletes the artifacts of runs older than the retention of their application, or than
+# TESTRUNNER_ARTIFACT_RETENTION_DAYS days when the application sets none (None keeps them).
+
+TESTRUNNER_BLOB_ROOT = os.path.join(BASE_DIR, 'blobs')
+TESTRUNNER_ARTIFACT_RETENTION_DAYS = None
+
+# The compact_test_runs command deletes the individual test results (RobotTestRun rows) older than the retention of
+# their application, or than TESTRUNNER_RUN_RETENTION_DAYS days when the application sets none (None keeps them), once
+# they are counted in the daily rollups. The latest result of each test is always kept. Rows are deleted
+# TESTRUNNER_RUN_RETENTION_BATCH_SIZE at a time, so the database is never write locked for long.
+
+TESTRUNNER_RUN_RETENTION_DAYS = None
+TESTRUNNER_RUN_RETENTION_BATCH_SIZE = 1000
+
+# Tests whose results flipped between pass and fail in at least TESTRUNNER_FLAKY_THRESHOLD of their latest
+# TESTRUNNER_FLAKY_WINDOW results (and at least TESTRUNNER_FLAKY_MIN_RUNS of them) are tagged with
+# TESTRUNNER_QUARANTINE_TAG. Suite and application runs leave quarantined tests out; the run_quarantined command runs
+# them at TESTRUNNER_QUARANTINE_NICENESS, so they keep getting results without competing with other runs.
+
+TESTRUNNER_QUARANTINE_TAG = 'quarantined'
+TESTRUNNER_FLAKY_WINDOW = 20
+TESTRUNNER_FLAKY_MIN_RUNS = 5
+TESTRUNNER_FLAKY_THRESHOLD = 0.3
+TESTRUNNER_QUARANTINE_NICENESS = 10
+
+# Comparing two runs, a test counts as slower (or faster) when it took at least TESTRUNNER_SLOWER_RATIO times as long
+# as in the other run, and at least TESTRUNNER_SLOWER_MIN_MS milliseconds more.
+
+TESTRUNNER_SLOWER_RATIO = 1.5
+TESTRUNNER_SLOWER_MIN_MS = 1000
+
+# Tests and suites declare the resources they need exclusively with lock:<name> tags. A run waits at most
+# TESTRUNNER_LOCK_TIMEOUT seconds for resources other runs hold before it gives up.
+
+TESTRUNNER_LOCK_TIMEOUT = 60 * 60
+
+# Admission control. A host runs at most TESTRUNNER_MAX_CONCURRENT_RUNS robot processes at once (None: one per CPU),
+# and at most TESTRUNNER_MAX_RUNS_PER_APPLICATION (None: no limit) of one application unless the application sets its
+# own limit, and starts none while less than TESTRUNNER_MIN_AVAILABLE_MEMORY_MB of memory is available. Runs submitted
+# over capacity wait in a queue for up to TESTRUNNER_ADMISSION_QUEUE_TIMEOUT seconds, with at most
+# TESTRUNNER_MAX_QUEUED_RUNS waiting; the others are rejected with HTTP 429 and a Retry-After of at least
+# TESTRUNNER_ADMISSION_RETRY_AFTER seconds.
+
+TESTRUNNER_MAX_CONCURRENT_RUNS = None
+TESTRUNNER_MAX_RUNS_PER_APPLICATION = None
+TESTRUNNER_MIN_AVAILABLE_MEMORY_MB = 512
+TESTRUNNER_ADMISSION_QUEUE_TIMEOUT = 0
+TESTRUNNER_MAX_QUEUED_RUNS = 20
+TESTRUNNER_ADMISSION_RETRY_AFTER = 30
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -16,7 +16,11 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
+from testrunner.views import prometheus_metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('testrunner/', include('testrunner.urls')),
+    # Metrics of discovery, robot runs and web requests in the Prometheus text format, for scraping.
+    path('metrics', prometheus_metrics, name='metrics'),
 ]
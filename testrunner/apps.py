@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TestrunnerConfig(AppConfig):
     name = 'testrunner'
     verbose_name = 'Test Runner'
+
+    def ready(self):
+        from . import signals  # noqa: F401 (connects the catalog cache invalidation receivers)
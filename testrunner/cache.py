@@ -0,0 +1,80 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+CATALOG_CACHE_TIMEOUT = getattr(settings, 'TESTRUNNER_CATALOG_CACHE_TIMEOUT', 60 * 60)
+
+
+def _version_key(app_id):
+    return 'testrunner:catalog-version:{app}'.format(app=app_id if app_id is not None else 'all')
+
+
+def catalog_version(app_id=None):
+    """
+    Return the current catalog version for an application (or for the list of applications when ``app_id`` is None).
+    Versions are the timestamp of the last change, so they double as the Last-Modified time of every cached page for
+    the application. If the version has been evicted from the cache it is restarted at the current time, which can
+    only make cached pages look newer than they are, never older.
+    """
+    key = _version_key(app_id)
+    version = cache.get(key)
+    if version is None:
+        version = time.time()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_catalog_version(app_id=None):
+    """Invalidate every cached page for an application by moving its catalog version forward."""
+    key = _version_key(app_id)
+    cache.set(key, max(time.time(), cache.get(key, 0) + 0.001), timeout=None)
+
+
+def cache_catalog_view(app_kwarg=None):
+    """
+    Cache the rendered output of a read-only catalog view, keyed by the owning application's catalog version, and
+    answer conditional GETs (If-None-Match / If-Modified-Since) without rendering. ``app_kwarg`` names the URL keyword
+    argument holding the application primary key; when omitted the application list version is used.
+
+    Pages that embed a CSRF token are only cached per CSRF cookie, so one visitor's token is never served to another.
+    """
+    def decorator(view):
+        @wraps(view)
+        def cached_view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            version = catalog_version(kwargs.get(app_kwarg) if app_kwarg else None)
+            csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+            fingerprint = hashlib.md5('|'.join([str(kwargs.get(app_kwarg)), repr(version), request.get_full_path(),
+                                                csrf_cookie]).encode('utf-8')).hexdigest()
+            etag = quote_etag(fingerprint)
+            last_modified = int(version)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                return response
+            cache_key = 'testrunner:view:' + fingerprint
+            cached = cache.get(cache_key)
+            if cached is not None:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+            else:
+                response = view(request, *args, **kwargs)
+                if callable(getattr(response, 'render', None)):
+                    response = response.render()
+                token_leaks = request.META.get('CSRF_COOKIE_USED') and not csrf_cookie
+                if response.status_code == 200 and not response.streaming and not token_leaks:
+                    cache.set(cache_key, (response.content, response['Content-Type']), CATALOG_CACHE_TIMEOUT)
+            if response.status_code == 200:
+                response['ETag'] = etag
+                response['Last-Modified'] = http_date(last_modified)
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return cached_view
+    return decorator
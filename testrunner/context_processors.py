@@ -0,0 +1,3 @@
+def search(request):
+    """Keep the words of the last search in the search box that every testrunner page shows."""
+    return {'search_query': request.GET.get('q', '')}
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from robotapi.rollups import backfill_rollups
+from testrunner.models import RobotApplicationUnderTest
+
+
+class Command(BaseCommand):
+    help = ('Count the test results recorded before daily rollups existed (or not counted for another reason) into the '
+            'daily rollups, oldest first, in batches. Run this once after upgrading; it is safe to run again.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--application', type=int, help='Only backfill the application with this primary key.')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Delete the existing rollups and count every result again.')
+
+    def handle(self, *args, **options):
+        applications = RobotApplicationUnderTest.objects.all()
+        if options['application'] is not None:
+            applications = applications.filter(pk=options['application'])
+            if not applications.exists():
+                raise CommandError('There is no application with primary key {pk}.'.format(pk=options['application']))
+        for application in applications:
+            counted = backfill_rollups(application, rebuild=options['rebuild'])
+            self.stdout.write('{app}: {n} test results were rolled up.'.format(app=application.name, n=counted))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from robotapi.workspace import clean_scratch
+
+
+class Command(BaseCommand):
+    help = ('Remove the scratch directories that robot runs left behind once they are older than '
+            'TESTRUNNER_SCRATCH_MAX_AGE seconds, unless their run is still in progress. Run this periodically (e.g. '
+            'from cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, help='Remove scratch directories older than this many seconds.')
+
+    def handle(self, *args, **options):
+        removed = clean_scratch(options['max_age'])
+        for path in removed:
+            self.stdout.write('Removed: ' + path)
+        self.stdout.write('{n} scratch directories were removed.'.format(n=len(removed)))
@@ -0,0 +1,34 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from robotapi.retention import compact_test_runs
+
+
+class Command(BaseCommand):
+    help = ('Roll up the test results older than the retention of their application (or TESTRUNNER_RUN_RETENTION_DAYS) '
+            'into the daily rollups and delete them, in small batches. The latest result of each test is kept. Run '
+            'this periodically (e.g. from cron).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Keep this many days of results for applications that set no retention of their own.')
+        parser.add_argument('--batch-size', type=int, help='Delete this many results per transaction.')
+        parser.add_argument('--vacuum', action='store_true',
+                            help='Afterwards, give the space of the deleted rows back to the file system (SQLite '
+                                 'only). This locks the database while it runs.')
+
+    def handle(self, *args, **options):
+        total = 0
+        for application, rolled_up, deleted in compact_test_runs(options['days'], batch_size=options['batch_size']):
+            self.stdout.write('{app}: {r} test results were rolled up and {d} were deleted.'.format(
+                app=application.name, r=rolled_up, d=deleted))
+            total += deleted
+        self.stdout.write('{n} test results were deleted.'.format(n=total))
+        if options['vacuum'] and connection.vendor == 'sqlite':
+            database = connection.settings_dict['NAME']
+            size = os.path.getsize(database)
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM')
+            self.stdout.write('The database shrank by {n} bytes.'.format(n=size - os.path.getsize(database)))
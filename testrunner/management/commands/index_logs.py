@@ -0,0 +1,29 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from testrunner.models import RobotExecution
+from robotapi.logindex import index_log, index_path
+
+
+class Command(BaseCommand):
+    help = ('Build the log index of the robot outputs that have none, e.g. of runs recorded before the log viewer '
+            'existed. Keyword timings are not counted again.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('execution_ids', nargs='*', type=int,
+                            help='Primary keys of the executions to reindex, even if they have an index. Defaults to '
+                                 'every execution without one.')
+
+    def handle(self, *args, **options):
+        executions = RobotExecution.objects.exclude(output_file='')
+        if options['execution_ids']:
+            executions = executions.filter(pk__in=options['execution_ids'])
+        indexed = 0
+        for execution in executions.iterator():
+            if not os.path.isfile(execution.output_file):
+                continue
+            if options['execution_ids'] or not os.path.isfile(index_path(execution.output_file)):
+                index_log(execution.output_file)
+                indexed += 1
+        self.stdout.write('Indexed the logs of {n} executions.'.format(n=indexed))
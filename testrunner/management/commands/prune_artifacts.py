@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from robotapi.artifacts import prune_artifacts
+
+
+class Command(BaseCommand):
+    help = ('Delete the artifacts of robot runs older than the retention of their application, and the stored blobs '
+            'no run refers to any more. Run this periodically (e.g. from cron).')
+
+    def handle(self, *args, **options):
+        artifacts, blobs = prune_artifacts()
+        self.stdout.write('{a} artifacts and {b} blobs were deleted.'.format(a=artifacts, b=blobs))
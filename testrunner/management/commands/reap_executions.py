@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from robotapi.processes import reap_executions
+
+
+class Command(BaseCommand):
+    help = ('Stop the process groups of robot runs on this host that are past their deadline or whose robot process is '
+            'gone, and mark those runs as timed out or failed. Run this periodically (e.g. from cron).')
+
+    def handle(self, *args, **options):
+        reaped = reap_executions()
+        for execution in reaped:
+            self.stdout.write('Reaped: {e}'.format(e=execution))
+        self.stdout.write('{n} robot runs were reaped.'.format(n=len(reaped)))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from testrunner.models import RobotApplicationUnderTest
+from testrunner.search import rebuild_search_index, search_available
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for all (or the given) applications under test.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('application_ids', nargs='*', type=int,
+                            help='Primary keys of the applications to reindex. Defaults to all applications.')
+
+    def handle(self, *args, **options):
+        if not search_available():
+            self.stdout.write('Full-text indexing is only used with SQLite; nothing to rebuild.')
+            return
+        applications = RobotApplicationUnderTest.objects.all()
+        if options['application_ids']:
+            applications = applications.filter(pk__in=options['application_ids'])
+        for application in applications:
+            rebuild_search_index(application)
+            self.stdout.write('Rebuilt the search index for: ' + application.name)
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from robotapi.discover import DiscoveredRobotApplication
+from robotapi.exceptions import RobotDiscoveryException
+from testrunner.models import RobotApplicationUnderTest
+
+
+class Command(BaseCommand):
+    help = 'Read again only the suites of an application that depend on the given changed files.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('application_id', type=int,
+                            help='Primary key of the application whose files changed.')
+        parser.add_argument('paths', nargs='+',
+                            help='The changed suite, resource, variable or library files (or library names).')
+
+    def handle(self, *args, **options):
+        try:
+            application = RobotApplicationUnderTest.objects.get(pk=options['application_id'])
+            suites = DiscoveredRobotApplication(application).rediscover_dependents(options['paths'])
+        except (RobotApplicationUnderTest.DoesNotExist, RobotDiscoveryException) as e:
+            raise CommandError(str(e))
+        for suite in suites:
+            self.stdout.write('Rediscovered: ' + suite.verbose_name)
+        self.stdout.write('{n} suites of {app} were affected.'.format(n=len(suites), app=application.name))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from robotapi.exceptions import RobotExecutionException
+from robotapi.execute import RobotExecutionEngine
+from robotapi.flakiness import QUARANTINE_NICENESS
+from testrunner.models import RobotApplicationUnderTest
+
+
+class Command(BaseCommand):
+    help = ('Run the tests quarantined as flaky, at a low scheduling priority, so they keep getting results and are '
+            'released from quarantine once they are stable. Run this periodically (e.g. from cron) on a spare worker.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--application', type=int, help='Only run the quarantined tests of this application.')
+        parser.add_argument('--niceness', type=int, default=QUARANTINE_NICENESS,
+                            help='Lower the scheduling priority of robot by this much.')
+
+    def handle(self, *args, **options):
+        applications = RobotApplicationUnderTest.objects.filter(active=True)
+        if options['application'] is not None:
+            applications = applications.filter(pk=options['application'])
+            if not applications.exists():
+                raise CommandError('There is no application with primary key {pk}.'.format(pk=options['application']))
+        for application in applications:
+            engine = RobotExecutionEngine(application=application, quarantine='only', niceness=options['niceness'])
+            try:
+                engine.run_subprocess()
+            except RobotExecutionException as e:
+                self.stderr.write('{app}: {e}'.format(app=application.name, e=e))
+                continue
+            if engine.execution is None:
+                self.stdout.write('{app}: {o}'.format(app=application.name, o=engine.robot_output))
+            else:
+                self.stdout.write('{app}: ran {n} quarantined tests in execution {pk}.'.format(
+                    app=application.name, n=len(engine.tests), pk=engine.execution.pk))
@@ -0,0 +1,34 @@
+import time
+
+from django.db import connection
+
+from robotapi import metrics
+
+
+class MetricsMiddleware:
+
+    def __init__(self, get_response):
+        """
+        Count every web request, its latency and the number of database queries it runs, by URL name, in the
+        metrics of robotapi.metrics. Requests that match no URL are counted as ``unresolved``.
+        """
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with connection.execute_wrapper(count_query):
+            response = self.get_response(request)
+        seconds = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else 'unresolved'
+        metrics.REQUESTS.inc(view=view, status=response.status_code)
+        metrics.REQUEST_SECONDS.observe(seconds, view=view)
+        metrics.REQUEST_QUERIES.observe(queries, view=view)
+        return response
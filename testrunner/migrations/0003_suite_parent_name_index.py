@@ -0,0 +1,17 @@
+# Generated by Django 2.1.7 on 2026-10-19 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testrunner', '0002_auto_20190304_0313'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='robottestsuite',
+            index=models.Index(fields=['parent', 'name'], name='testrunner_suite_parent_name'),
+        ),
+    ]
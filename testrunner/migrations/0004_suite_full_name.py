@@ -0,0 +1,43 @@
+# Generated by Django 2.1.7 on 2026-10-19 10:58
+
+from django.db import migrations, models
+
+
+def populate_full_names(apps, schema_editor):
+    RobotTestSuite = apps.get_model('testrunner', 'RobotTestSuite')
+    full_names = dict()
+    pending = list(RobotTestSuite.objects.only('pk', 'name', 'parent_id'))
+    while pending:
+        remaining = list()
+        for suite in pending:
+            if suite.parent_id is None:
+                full_names[suite.pk] = suite.name
+            elif suite.parent_id in full_names:
+                full_names[suite.pk] = full_names[suite.parent_id] + '.' + suite.name
+            else:
+                remaining.append(suite)
+                continue
+            RobotTestSuite.objects.filter(pk=suite.pk).update(full_name=full_names[suite.pk])
+        if len(remaining) == len(pending):
+            break   # Orphaned suites; leave them to be renamed when they are next saved.
+        pending = remaining
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testrunner', '0003_suite_parent_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='robottestsuite',
+            name='full_name',
+            field=models.CharField(blank=True, default='', editable=False, help_text='The dotted name of this suite including all of its parent suites. This is kept in sync when the suite, or one of its parents, is saved so it can be looked up by index.', max_length=1000),
+        ),
+        migrations.RunPython(populate_full_names, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='robottestsuite',
+            index=models.Index(fields=['application', 'full_name'], name='testrunner_suite_full_name'),
+        ),
+    ]
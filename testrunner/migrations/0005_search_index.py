@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return  # Other backends search through the ORM, see testrunner.search.
+    schema_editor.execute('CREATE VIRTUAL TABLE IF NOT EXISTS testrunner_search_index USING fts5('
+                          'application_id UNINDEXED, name, documentation, suite_name, tags, '
+                          "tokenize = 'unicode61 remove_diacritics 1')")
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS testrunner_search_index')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testrunner', '0004_suite_full_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
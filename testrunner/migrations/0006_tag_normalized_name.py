@@ -0,0 +1,31 @@
+# Generated by Django 2.1.7 on 2026-10-19 11:03
+
+import re
+
+from django.db import migrations, models
+
+
+def populate_normalized_names(apps, schema_editor):
+    RobotTag = apps.get_model('testrunner', 'RobotTag')
+    for tag in RobotTag.objects.only('pk', 'name'):
+        RobotTag.objects.filter(pk=tag.pk).update(normalized_name=re.sub(r'[\s_]', '', tag.name).lower())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testrunner', '0005_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='robottag',
+            name='normalized_name',
+            field=models.CharField(blank=True, default='', editable=False, help_text='The tag name as Robot Framework compares it: lower case, without spaces or underscores.', max_length=200),
+        ),
+        migrations.RunPython(populate_normalized_names, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='robottag',
+            index=models.Index(fields=['application', 'normalized_name'], name='testrunner_tag_normalized'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.1.7 on 2026-10-19 11:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testrunner', '0006_tag_normalized_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RobotKeywordUsage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyword', models.CharField(help_text='The keyword as it is called, or as it is defined for user keywords.', max_length=200)),
+                ('normalized_keyword', models.CharField(help_text='The keyword name as Robot Framework compares it: lower case, without spaces or underscores.', max_length=200)),
+                ('depth', models.PositiveIntegerField(default=0, help_text='0 if the test calls the keyword itself, otherwise the number of user keywords between the test and the keyword.')),
+                ('application', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='app_keyword_usage', to='testrunner.RobotApplicationUnderTest')),
+                ('robot_test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='keyword_usage', to='testrunner.RobotTest')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='robotkeywordusage',
+            index=models.Index(fields=['application', 'normalized_keyword'], name='testrunner_keyword_usage'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='robotkeywordusage',
+            unique_together={('robot_test', 'normalized_keyword')},
+        ),
+    ]
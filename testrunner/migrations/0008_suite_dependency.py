@@ -0,0 +1,33 @@
+# Generated by Django 2.1.7 on 2026-10-19 11:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testrunner', '0007_keyword_usage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RobotSuiteDependency',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('resource', 'Resource'), ('variables', 'Variables'), ('library', 'Library')], help_text='How the suite imports the file.', max_length=10)),
+                ('path', models.CharField(help_text='The absolute path of the imported file, or the library name for libraries that are not imported from a file next to the suite.', max_length=1000)),
+                ('direct', models.BooleanField(default=True, help_text='Designates whether the suite imports this itself, rather than through one of its resource files.')),
+                ('application', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='app_suite_dependency', to='testrunner.RobotApplicationUnderTest')),
+                ('robot_suite', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dependency', to='testrunner.RobotTestSuite')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='robotsuitedependency',
+            index=models.Index(fields=['application', 'path'], name='testrunner_suite_dependency'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='robotsuitedependency',
+            unique_together={('robot_suite', 'path')},
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.1.7 on 2026-10-19 11:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testrunner', '0008_suite_dependency'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RobotExecution',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.DateTimeField(default=django.utils.timezone.now, help_text='When robot was started.')),
+                ('end_time', models.DateTimeField(blank=True, help_text='When robot finished.', null=True)),
+                ('status', models.CharField(choices=[('not started', 'Not Started'), ('in progress', 'In Progress'), ('complete', 'Complete'), ('error', 'Error')], default='not started', help_text='The current status of this robot execution.', max_length=20)),
+                ('output_file', models.CharField(blank=True, help_text='The output.xml written by robot, if any.', max_length=1000)),
+                ('application', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='app_execution', to='testrunner.RobotApplicationUnderTest')),
+                ('rerun_of', models.ForeignKey(blank=True, help_text='The execution whose failed tests this execution ran again.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rerun', to='testrunner.RobotExecution')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='robottestrun',
+            name='execution',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='test_run', to='testrunner.RobotExecution'),
+        ),
+    ]
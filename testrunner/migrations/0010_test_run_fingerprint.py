@@ -0,0 +1,23 @@
+# Generated by Django 2.1.7 on 2026-10-19 11:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testrunner', '0009_robot_execution'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='robottestrun',
+            name='fingerprint',
+            field=models.CharField(blank=True, db_index=True, help_text='A hash of everything the result depends on (source files, environment and variables), for tests whose results may be reused.', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='robottestrun',
+            name='status',
+            field=models.CharField(choices=[('not started', 'Not Started'), ('in progress', 'In Progress'), ('complete', 'Complete'), ('cached', 'Cached'), ('error', 'Error')], help_text='The current status of this test run.', max_length=20),
+        ),
+    ]
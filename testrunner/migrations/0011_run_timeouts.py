@@ -0,0 +1,43 @@
+# Generated by Django 2.1.7 on 2026-10-19 11:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testrunner', '0010_test_run_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='robotapplicationundertest',
+            name='run_timeout',
+            field=models.PositiveIntegerField(blank=True, help_text='The maximum number of seconds a robot run for this application may take before it is stopped. Leave empty to use the TESTRUNNER_RUN_TIMEOUT setting.', null=True),
+        ),
+        migrations.AddField(
+            model_name='robotexecution',
+            name='deadline',
+            field=models.DateTimeField(blank=True, help_text='When robot will be stopped if it has not finished.', null=True),
+        ),
+        migrations.AddField(
+            model_name='robotexecution',
+            name='host',
+            field=models.CharField(blank=True, help_text='The host robot runs on.', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='robotexecution',
+            name='pid',
+            field=models.PositiveIntegerField(blank=True, help_text='The process id of robot, which is also the id of the process group of everything it starts.', null=True),
+        ),
+        migrations.AlterField(
+            model_name='robotexecution',
+            name='status',
+            field=models.CharField(choices=[('not started', 'Not Started'), ('in progress', 'In Progress'), ('complete', 'Complete'), ('timed out', 'Timed Out'), ('error', 'Error')], default='not started', help_text='The current status of this robot execution.', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='robottestrun',
+            name='status',
+            field=models.CharField(choices=[('not started', 'Not Started'), ('in progress', 'In Progress'), ('complete', 'Complete'), ('cached', 'Cached'), ('timed out', 'Timed Out'), ('error', 'Error')], help_text='The current status of this test run.', max_length=20),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 2.1.7 on 2026-10-19 11:24
+
+from django.db import migrations, models
+
+
+def seed_duration_estimates(apps, schema_editor):
+    """Start the moving average of each test's duration from the runs recorded so far (see robotapi.estimates)."""
+    RobotTest = apps.get_model('testrunner', 'RobotTest')
+    RobotTestRun = apps.get_model('testrunner', 'RobotTestRun')
+    estimates = dict()
+    for test_id, start_time, end_time in RobotTestRun.objects.filter(status='complete').order_by(
+            'start_time').values_list('robot_test_id', 'start_time', 'end_time'):
+        seconds = (end_time - start_time).total_seconds()
+        previous = estimates.get(test_id)
+        estimates[test_id] = seconds if previous is None else 0.3 * seconds + 0.7 * previous
+    for test_id, estimate in estimates.items():
+        RobotTest.objects.filter(pk=test_id).update(duration_estimate=estimate)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testrunner', '0011_run_timeouts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='robotexecution',
+            name='completed_duration',
+            field=models.FloatField(default=0, help_text='The estimated number of seconds of the finished tests.'),
+        ),
+        migrations.AddField(
+            model_name='robotexecution',
+            name='completed_tests',
+            field=models.PositiveIntegerField(default=0, help_text='The number of tests robot has finished so far.'),
+        ),
+        migrations.AddField(
+            model_name='robotexecution',
+            name='estimated_end',
+            field=models.DateTimeField(blank=True, help_text='When robot is expected to finish.', null=True),
+        ),
+        migrations.AddField(
+            model_name='robotexecution',
+            name='expected_duration',
+            field=models.FloatField(default=0, help_text='The estimated number of seconds the tests take together.'),
+        ),
+        migrations.AddField(
+            model_name='robotexecution',
+            name='expected_tests',
+            field=models.PositiveIntegerField(default=0, help_text='The number of tests robot was expected to run.'),
+        ),
+        migrations.AddField(
+            model_name='robottest',
+            name='duration_estimate',
+            field=models.FloatField(blank=True, help_text='The expected number of seconds the test takes, a moving average of its recorded run times.', null=True),
+        ),
+        migrations.RunPython(seed_duration_estimates, migrations.RunPython.noop),
+    ]
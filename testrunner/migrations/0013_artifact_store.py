@@ -0,0 +1,51 @@
+# Generated by Django 2.1.7 on 2026-10-19 11:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testrunner', '0012_run_estimates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RobotArtifact',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='The path of the file relative to the output directory of the run.', max_length=500)),
+                ('content_type', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RobotArtifactBlob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(help_text='The SHA-256 of the uncompressed content, which is also its storage key.', max_length=64, unique=True)),
+                ('size', models.PositiveIntegerField(help_text='The size of the uncompressed content in bytes.')),
+                ('stored_size', models.PositiveIntegerField(help_text='The size of the gzip compressed content in bytes.')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='robotapplicationundertest',
+            name='artifact_retention_days',
+            field=models.PositiveIntegerField(blank=True, help_text='The number of days the logs, reports and other artifacts of robot runs for this application are kept. Leave empty to use the TESTRUNNER_ARTIFACT_RETENTION_DAYS setting.', null=True),
+        ),
+        migrations.AddField(
+            model_name='robotartifact',
+            name='blob',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='artifact', to='testrunner.RobotArtifactBlob'),
+        ),
+        migrations.AddField(
+            model_name='robotartifact',
+            name='execution',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='artifact', to='testrunner.RobotExecution'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='robotartifact',
+            unique_together={('execution', 'name')},
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 2.1.7 on 2026-10-19 11:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testrunner', '0013_artifact_store'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RobotKeywordTiming',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyword', models.CharField(help_text='The full name of the keyword as robot logs it, e.g. SeleniumLibrary.Click Element.', max_length=500)),
+                ('call_count', models.PositiveIntegerField(default=0)),
+                ('total_duration', models.FloatField(default=0, help_text='The number of seconds of all calls together, including the keywords they call.')),
+                ('max_duration', models.FloatField(default=0)),
+                ('p50_duration', models.FloatField(default=0)),
+                ('p95_duration', models.FloatField(default=0)),
+                ('histogram', models.TextField(default='{}', help_text='The number of calls per logarithmic duration bucket, as JSON (see robotapi.profiler).')),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('application', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='app_keyword_timing', to='testrunner.RobotApplicationUnderTest')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='robotkeywordtiming',
+            unique_together={('application', 'keyword')},
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 2.1.7 on 2026-10-19 11:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testrunner', '0014_keyword_timing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RobotApplicationDailyRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('runs', models.PositiveIntegerField(default=0)),
+                ('passes', models.PositiveIntegerField(default=0)),
+                ('fails', models.PositiveIntegerField(default=0)),
+                ('total_duration', models.FloatField(default=0, help_text='The number of seconds of all runs together.')),
+                ('histogram', models.TextField(default='{}', help_text='The number of runs per logarithmic duration bucket, as JSON (see robotapi.histograms).')),
+                ('flips', models.PositiveIntegerField(default=0, help_text='The number of runs whose result differs from the previous run of the same test.')),
+                ('application', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollup', to='testrunner.RobotApplicationUnderTest')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RobotSuiteDailyRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('runs', models.PositiveIntegerField(default=0)),
+                ('passes', models.PositiveIntegerField(default=0)),
+                ('fails', models.PositiveIntegerField(default=0)),
+                ('total_duration', models.FloatField(default=0, help_text='The number of seconds of all runs together.')),
+                ('histogram', models.TextField(default='{}', help_text='The number of runs per logarithmic duration bucket, as JSON (see robotapi.histograms).')),
+                ('flips', models.PositiveIntegerField(default=0, help_text='The number of runs whose result differs from the previous run of the same test.')),
+                ('robot_suite', models.ForeignKey(help_text='The suite whose tests, including those of its child suites, ran.', on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollup', to='testrunner.RobotTestSuite')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RobotTestDailyRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('runs', models.PositiveIntegerField(default=0)),
+                ('passes', models.PositiveIntegerField(default=0)),
+                ('fails', models.PositiveIntegerField(default=0)),
+                ('total_duration', models.FloatField(default=0, help_text='The number of seconds of all runs together.')),
+                ('histogram', models.TextField(default='{}', help_text='The number of runs per logarithmic duration bucket, as JSON (see robotapi.histograms).')),
+                ('flips', models.PositiveIntegerField(default=0, help_text='The number of runs whose result differs from the previous run of the same test.')),
+                ('last_result', models.CharField(blank=True, help_text='The result of the last run of the day, to count flips the next day.', max_length=5)),
+                ('robot_test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollup', to='testrunner.RobotTest')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='robottestrun',
+            name='rolled_up',
+            field=models.BooleanField(default=False, help_text='Whether the result is counted in the daily rollups.'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='robottestdailyrollup',
+            unique_together={('robot_test', 'day')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='robotsuitedailyrollup',
+            unique_together={('robot_suite', 'day')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='robotapplicationdailyrollup',
+            unique_together={('application', 'day')},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.1.7 on 2026-10-19 11:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testrunner', '0015_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='robotapplicationundertest',
+            name='run_retention_days',
+            field=models.PositiveIntegerField(blank=True, help_text='The number of days the individual test results of this application are kept before only their daily rollups remain. Leave empty to use the TESTRUNNER_RUN_RETENTION_DAYS setting.', null=True),
+        ),
+    ]
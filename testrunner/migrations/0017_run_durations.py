@@ -0,0 +1,56 @@
+# Generated by Django 2.1.7 on 2026-10-19 11:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+
+def convert_durations(apps, schema_editor):
+    """Fill in the application and the duration in milliseconds of the test runs recorded so far."""
+    RobotApplicationUnderTest = apps.get_model('testrunner', 'RobotApplicationUnderTest')
+    RobotTestRun = apps.get_model('testrunner', 'RobotTestRun')
+    for application in RobotApplicationUnderTest.objects.all():
+        RobotTestRun.objects.filter(robot_test__robot_suite__application=application).update(application=application)
+    runs = RobotTestRun.objects.order_by('pk').values_list('pk', 'start_time', 'end_time')
+    last_pk = 0
+    while True:
+        batch = list(runs.filter(pk__gt=last_pk)[:BATCH_SIZE])
+        if not batch:
+            break
+        by_duration = dict()
+        for pk, start_time, end_time in batch:
+            duration = max(0, round((end_time - start_time).total_seconds() * 1000))
+            by_duration.setdefault(duration, list()).append(pk)
+        for duration, pks in by_duration.items():
+            RobotTestRun.objects.filter(pk__in=pks).update(duration_ms=duration)
+        last_pk = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testrunner', '0016_run_retention'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='robottestrun',
+            name='application',
+            field=models.ForeignKey(help_text='The application of the test, so its runs are found without joins.', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='test_run', to='testrunner.RobotApplicationUnderTest'),
+        ),
+        migrations.AddField(
+            model_name='robottestrun',
+            name='duration_ms',
+            field=models.PositiveIntegerField(default=0, help_text='The number of milliseconds the test took.'),
+        ),
+        migrations.RunPython(convert_durations, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='robottestrun',
+            name='execution_time',
+        ),
+        migrations.AddIndex(
+            model_name='robottestrun',
+            index=models.Index(fields=['application', 'robot_test', 'start_time'], name='testrunner_run_test_start'),
+        ),
+    ]
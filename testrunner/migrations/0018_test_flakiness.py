@@ -0,0 +1,18 @@
+# Generated by Django 2.1.7 on 2026-10-19 11:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testrunner', '0017_run_durations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='robottest',
+            name='flakiness',
+            field=models.FloatField(default=0, help_text='The share of its latest results that flipped between pass and fail without a change to the test (see robotapi.flakiness).'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.1.7 on 2026-10-19 11:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testrunner', '0018_test_flakiness'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='robottestrun',
+            index=models.Index(fields=['execution', 'robot_test'], name='testrunner_run_execution_test'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.1.7 on 2026-10-19 11:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testrunner', '0019_run_comparison_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RobotResourceLock',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='The resource a test or suite declares with a lock:<name> tag, e.g. a shared test account or device.', max_length=200)),
+                ('acquired', models.DateTimeField(auto_now_add=True)),
+                ('application', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resource_lock', to='testrunner.RobotApplicationUnderTest')),
+                ('execution', models.ForeignKey(help_text='The run holding the resource.', on_delete=django.db.models.deletion.CASCADE, related_name='resource_lock', to='testrunner.RobotExecution')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='robotresourcelock',
+            unique_together={('application', 'name')},
+        ),
+    ]
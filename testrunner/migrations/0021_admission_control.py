@@ -0,0 +1,36 @@
+# Generated by Django 2.1.7 on 2026-10-19 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testrunner', '0020_resource_locks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RobotHost',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='The host robot runs on.', max_length=200, unique=True)),
+                ('last_admission', models.DateTimeField(blank=True, help_text='When a run was last checked for admission on this host. Writing it locks the row, which serializes admissions per host.', null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='robotapplicationundertest',
+            name='max_concurrent_runs',
+            field=models.PositiveIntegerField(blank=True, help_text='The maximum number of robot runs for this application at the same time on one host. Leave empty to use the TESTRUNNER_MAX_RUNS_PER_APPLICATION setting.', null=True),
+        ),
+        migrations.AddField(
+            model_name='robotexecution',
+            name='worker_pid',
+            field=models.PositiveIntegerField(blank=True, help_text='The process id of the web worker or command running the execution, which waits for resources, admission and robot.', null=True),
+        ),
+        migrations.AlterField(
+            model_name='robotexecution',
+            name='status',
+            field=models.CharField(choices=[('not started', 'Not Started'), ('queued', 'Queued'), ('in progress', 'In Progress'), ('complete', 'Complete'), ('timed out', 'Timed Out'), ('error', 'Error')], default='not started', help_text='The current status of this robot execution.', max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.1.7 on 2026-10-19 12:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testrunner', '0021_admission_control'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='robotexecution',
+            name='status',
+            field=models.CharField(choices=[('not started', 'Not Started'), ('waiting', 'Waiting for Resources'), ('queued', 'Queued'), ('in progress', 'In Progress'), ('complete', 'Complete'), ('timed out', 'Timed Out'), ('error', 'Error')], default='not started', help_text='The current status of this robot execution.', max_length=20),
+        ),
+    ]
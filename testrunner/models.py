@@ -1,7 +1,10 @@
 import os
+import re
+from datetime import timedelta
 
 from django.db import models
 from django.core.validators import MinValueValidator
+from django.db.models.functions import Coalesce, Concat, Substr
 from django.utils import timezone
 # from django.contrib.auth.models import User
 
@@ -11,6 +14,11 @@ if ROBOT_PROJECT_LOCATION is None:
     raise AssertionError('The ROBOT_PROJECT_PATH environment variable must be set to continue.')
 
 
+def milliseconds_between(start_time, end_time):
+    """The whole number of milliseconds from ``start_time`` to ``end_time``, for RobotTestRun.duration_ms."""
+    return max(0, round((end_time - start_time).total_seconds() * 1000))
+
+
 class BaseObject(models.Model):
     active = models.BooleanField(default=True)
     name = models.CharField(max_length=200)
@@ -54,6 +62,28 @@ class RobotApplicationUnderTest(BaseObject):
     robot_location = models.CharField(max_length=200,
                                       help_text='Provide the path to the local robot executable to use when running '
                                                 ' the tests for this application.')
+    run_timeout = models.PositiveIntegerField(null=True,
+                                              blank=True,
+                                              help_text='The maximum number of seconds a robot run for this '
+                                                        'application may take before it is stopped. Leave empty to '
+                                                        'use the TESTRUNNER_RUN_TIMEOUT setting.')
+    artifact_retention_days = models.PositiveIntegerField(null=True,
+                                                          blank=True,
+                                                          help_text='The number of days the logs, reports and other '
+                                                                    'artifacts of robot runs for this application are '
+                                                                    'kept. Leave empty to use the '
+                                                                    'TESTRUNNER_ARTIFACT_RETENTION_DAYS setting.')
+    max_concurrent_runs = models.PositiveIntegerField(null=True,
+                                                      blank=True,
+                                                      help_text='The maximum number of robot runs for this application '
+                                                                'at the same time on one host. Leave empty to use the '
+                                                                'TESTRUNNER_MAX_RUNS_PER_APPLICATION setting.')
+    run_retention_days = models.PositiveIntegerField(null=True,
+                                                     blank=True,
+                                                     help_text='The number of days the individual test results of this '
+                                                               'application are kept before only their daily rollups '
+                                                               'remain. Leave empty to use the '
+                                                               'TESTRUNNER_RUN_RETENTION_DAYS setting.')
 
     class Meta:
         verbose_name = 'Robot application under test'
@@ -86,6 +116,23 @@ class RobotTag(BaseObject):
                                     related_query_name='parent_application',
                                     null=True)
     description = models.TextField(max_length=4000, blank=True, null=True)
+    normalized_name = models.CharField(max_length=200,
+                                       blank=True,
+                                       default='',
+                                       editable=False,
+                                       help_text='The tag name as Robot Framework compares it: lower case, without '
+                                                 'spaces or underscores.')
+
+    class Meta:
+        indexes = [models.Index(fields=['application', 'normalized_name'], name='testrunner_tag_normalized')]
+
+    def save(self, *args, **kwargs):
+        self.normalized_name = self.normalize(self.name)
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def normalize(name):
+        return re.sub(r'[\s_]', '', name).lower()
 
 
 class RobotVariable(BaseObject):
@@ -101,6 +148,20 @@ class RobotVariable(BaseObject):
         return '<{name}:{value}>'.format(name=self.name, value=self.value)
 
 
+class RobotTestSuiteQuerySet(models.QuerySet):
+
+    def with_child_counts(self):
+        """Annotate each suite with the number of its active direct child suites and tests, using correlated
+        subqueries so the counts cost no extra queries and never multiply rows the way joined counts would."""
+        child_suites = (RobotTestSuite.objects.filter(parent=models.OuterRef('pk'), active=True)
+                        .order_by().values('parent').annotate(count=models.Count('pk')).values('count'))
+        tests = (RobotTest.objects.filter(robot_suite=models.OuterRef('pk'), active=True)
+                 .order_by().values('robot_suite').annotate(count=models.Count('pk')).values('count'))
+        return self.annotate(child_suite_count=Coalesce(models.Subquery(child_suites,
+                                                                        output_field=models.IntegerField()), 0),
+                             test_count=Coalesce(models.Subquery(tests, output_field=models.IntegerField()), 0))
+
+
 class RobotTestSuite(BaseObject):
     documentation = models.TextField(max_length=4000, null=True)
     application = models.ForeignKey(RobotApplicationUnderTest,
@@ -116,6 +177,13 @@ class RobotTestSuite(BaseObject):
                                related_query_name='parent_suite')
     robot_tags = models.ManyToManyField(RobotTag,
                                         blank=True)
+    full_name = models.CharField(max_length=1000,
+                                 blank=True,
+                                 default='',
+                                 editable=False,
+                                 help_text='The dotted name of this suite including all of its parent suites. This is '
+                                           'kept in sync when the suite, or one of its parents, is saved so it can be '
+                                           'looked up by index.')
 
     suite_location = models.FilePathField(path=ROBOT_PROJECT_LOCATION,
                                           default=ROBOT_PROJECT_LOCATION,
@@ -128,20 +196,42 @@ class RobotTestSuite(BaseObject):
                                                     'this suite. Options to select this will populate after an '
                                                     'application is selected and saved.')
 
+    objects = RobotTestSuiteQuerySet.as_manager()
+
     class Meta:
         unique_together = ('application', 'parent', 'name')
+        indexes = [models.Index(fields=['parent', 'name'], name='testrunner_suite_parent_name'),
+                   models.Index(fields=['application', 'full_name'], name='testrunner_suite_full_name')]
 
     def __str__(self):
         return '{app}: {name}'.format(app=self.application.name, name=self.verbose_name)
 
+    def save(self, *args, **kwargs):
+        previous = None
+        if self.pk is not None:
+            previous = RobotTestSuite.objects.filter(pk=self.pk).values_list('full_name', flat=True).first()
+        self.full_name = self._build_full_name()
+        self.renamed_from = previous if previous and previous != self.full_name else None
+        super().save(*args, **kwargs)
+        if self.renamed_from is not None:
+            suffix = Substr('full_name', len(self.renamed_from) + 1)    # From the dot after the old prefix on
+            self.descendants(self.renamed_from).update(full_name=Concat(models.Value(self.full_name), suffix))
+
+    def descendants(self, full_name=None):
+        """The suites below this one, found by the prefix of their full name (``full_name`` if given)."""
+        return RobotTestSuite.objects.filter(application=self.application_id,
+                                             full_name__startswith=(full_name or self.full_name) + '.')
+
+    def _build_full_name(self):
+        if self.parent is None:
+            return str(self.name)
+        return self.parent.verbose_name + '.' + str(self.name)
+
     @property
     def verbose_name(self):
-        this_suite = self
-        names = [str(self.name)]
-        while this_suite.parent:
-            names.append(str(this_suite.parent.name))
-            this_suite = this_suite.parent
-        return '.'.join(list(reversed(names)))
+        if self.full_name:
+            return self.full_name
+        return self._build_full_name()
 
 
 class RobotTest(BaseObject):
@@ -152,6 +242,13 @@ class RobotTest(BaseObject):
                                     related_query_name='suite')
     robot_tags = models.ManyToManyField(RobotTag,
                                         blank=True)
+    duration_estimate = models.FloatField(null=True,
+                                          blank=True,
+                                          help_text='The expected number of seconds the test takes, a moving average '
+                                                    'of its recorded run times.')
+    flakiness = models.FloatField(default=0,
+                                  help_text='The share of its latest results that flipped between pass and fail '
+                                            'without a change to the test (see robotapi.flakiness).')
 
     class Meta:
         unique_together = ('robot_suite', 'name')
@@ -177,8 +274,201 @@ class RobotTestStep(BaseObject):
                                  blank=True)
 
 
+class RobotKeywordUsage(models.Model):
+    application = models.ForeignKey(RobotApplicationUnderTest,
+                                    on_delete=models.CASCADE,
+                                    related_name='app_keyword_usage')
+    robot_test = models.ForeignKey(RobotTest,
+                                   on_delete=models.CASCADE,
+                                   related_name='keyword_usage')
+    keyword = models.CharField(max_length=200,
+                               help_text='The keyword as it is called, or as it is defined for user keywords.')
+    normalized_keyword = models.CharField(max_length=200,
+                                          help_text='The keyword name as Robot Framework compares it: lower case, '
+                                                    'without spaces or underscores.')
+    depth = models.PositiveIntegerField(default=0,
+                                        help_text='0 if the test calls the keyword itself, otherwise the number of '
+                                                  'user keywords between the test and the keyword.')
+
+    class Meta:
+        unique_together = ('robot_test', 'normalized_keyword')
+        indexes = [models.Index(fields=['application', 'normalized_keyword'], name='testrunner_keyword_usage')]
+
+    def __str__(self):
+        return '{test}: {keyword}'.format(test=self.robot_test.name, keyword=self.keyword)
+
+
+class RobotKeywordTiming(models.Model):
+    application = models.ForeignKey(RobotApplicationUnderTest,
+                                    on_delete=models.CASCADE,
+                                    related_name='app_keyword_timing')
+    keyword = models.CharField(max_length=500,
+                               help_text='The full name of the keyword as robot logs it, e.g. SeleniumLibrary.Click '
+                                         'Element.')
+    call_count = models.PositiveIntegerField(default=0)
+    total_duration = models.FloatField(default=0,
+                                       help_text='The number of seconds of all calls together, including the keywords '
+                                                 'they call.')
+    max_duration = models.FloatField(default=0)
+    p50_duration = models.FloatField(default=0)
+    p95_duration = models.FloatField(default=0)
+    histogram = models.TextField(default='{}',
+                                 help_text='The number of calls per logarithmic duration bucket, as JSON (see '
+                                           'robotapi.profiler).')
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('application', 'keyword')
+
+    @property
+    def mean_duration(self):
+        return self.total_duration / self.call_count if self.call_count else 0
+
+    def __str__(self):
+        return '{app}: {keyword}'.format(app=self.application.name, keyword=self.keyword)
+
+
+class RobotSuiteDependency(models.Model):
+    application = models.ForeignKey(RobotApplicationUnderTest,
+                                    on_delete=models.CASCADE,
+                                    related_name='app_suite_dependency')
+    robot_suite = models.ForeignKey(RobotTestSuite,
+                                    on_delete=models.CASCADE,
+                                    related_name='dependency')
+    KINDS = (
+        ('resource', 'Resource'),
+        ('variables', 'Variables'),
+        ('library', 'Library'),
+    )
+    kind = models.CharField(max_length=10,
+                            choices=KINDS,
+                            help_text='How the suite imports the file.')
+    path = models.CharField(max_length=1000,
+                            help_text='The absolute path of the imported file, or the library name for libraries that '
+                                      'are not imported from a file next to the suite.')
+    direct = models.BooleanField(default=True,
+                                 help_text='Designates whether the suite imports this itself, rather than through one '
+                                           'of its resource files.')
+
+    class Meta:
+        unique_together = ('robot_suite', 'path')
+        indexes = [models.Index(fields=['application', 'path'], name='testrunner_suite_dependency')]
+
+    def __str__(self):
+        return '{suite} -> {path}'.format(suite=self.robot_suite.verbose_name, path=self.path)
+
+
+class RobotExecution(models.Model):
+    application = models.ForeignKey(RobotApplicationUnderTest,
+                                    on_delete=models.CASCADE,
+                                    related_name='app_execution')
+    start_time = models.DateTimeField(default=timezone.now,
+                                      help_text='When robot was started.')
+    end_time = models.DateTimeField(null=True,
+                                    blank=True,
+                                    help_text='When robot finished.')
+    STATUS_CHOICES = (
+        ('not started', 'Not Started'),
+        ('waiting', 'Waiting for Resources'),
+        ('queued', 'Queued'),
+        ('in progress', 'In Progress'),
+        ('complete', 'Complete'),
+        ('timed out', 'Timed Out'),
+        ('error', 'Error'),
+    )
+    status = models.CharField(max_length=20,
+                              choices=STATUS_CHOICES,
+                              default='not started',
+                              help_text='The current status of this robot execution.')
+    host = models.CharField(max_length=200,
+                            blank=True,
+                            help_text='The host robot runs on.')
+    pid = models.PositiveIntegerField(null=True,
+                                      blank=True,
+                                      help_text='The process id of robot, which is also the id of the process group of '
+                                                'everything it starts.')
+    worker_pid = models.PositiveIntegerField(null=True,
+                                             blank=True,
+                                             help_text='The process id of the web worker or command running the '
+                                                       'execution, which waits for resources, admission and robot.')
+    deadline = models.DateTimeField(null=True,
+                                    blank=True,
+                                    help_text='When robot will be stopped if it has not finished.')
+    output_file = models.CharField(max_length=1000,
+                                   blank=True,
+                                   help_text='The output.xml written by robot, if any.')
+    rerun_of = models.ForeignKey('self',
+                                 on_delete=models.SET_NULL,
+                                 null=True,
+                                 blank=True,
+                                 related_name='rerun',
+                                 help_text='The execution whose failed tests this execution ran again.')
+    expected_tests = models.PositiveIntegerField(default=0,
+                                                 help_text='The number of tests robot was expected to run.')
+    expected_duration = models.FloatField(default=0,
+                                          help_text='The estimated number of seconds the tests take together.')
+    completed_tests = models.PositiveIntegerField(default=0,
+                                                  help_text='The number of tests robot has finished so far.')
+    completed_duration = models.FloatField(default=0,
+                                           help_text='The estimated number of seconds of the finished tests.')
+    estimated_end = models.DateTimeField(null=True,
+                                         blank=True,
+                                         help_text='When robot is expected to finish.')
+
+    @property
+    def percent_complete(self):
+        if self.status not in ('not started', 'waiting', 'queued', 'in progress'):
+            return 100
+        if not self.expected_duration:
+            return 0
+        return min(99, int(100 * self.completed_duration / self.expected_duration))
+
+    def __str__(self):
+        return '{app}: execution {pk} ({status})'.format(app=self.application.name, pk=self.pk, status=self.status)
+
+
+class RobotArtifactBlob(models.Model):
+    digest = models.CharField(max_length=64,
+                              unique=True,
+                              help_text='The SHA-256 of the uncompressed content, which is also its storage key.')
+    size = models.PositiveIntegerField(help_text='The size of the uncompressed content in bytes.')
+    stored_size = models.PositiveIntegerField(help_text='The size of the gzip compressed content in bytes.')
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.digest
+
+
+class RobotArtifact(models.Model):
+    execution = models.ForeignKey(RobotExecution,
+                                  on_delete=models.CASCADE,
+                                  related_name='artifact')
+    name = models.CharField(max_length=500,
+                            help_text='The path of the file relative to the output directory of the run.')
+    blob = models.ForeignKey(RobotArtifactBlob,
+                             on_delete=models.PROTECT,
+                             related_name='artifact')
+    content_type = models.CharField(max_length=100)
+
+    class Meta:
+        unique_together = ('execution', 'name')
+
+    def __str__(self):
+        return '{execution}: {name}'.format(execution=self.execution, name=self.name)
+
+
 class RobotTestRun(models.Model):
     robot_test = models.ForeignKey(RobotTest, on_delete=models.PROTECT)
+    application = models.ForeignKey(RobotApplicationUnderTest,
+                                    on_delete=models.CASCADE,
+                                    null=True,
+                                    related_name='test_run',
+                                    help_text='The application of the test, so its runs are found without joins.')
+    execution = models.ForeignKey(RobotExecution,
+                                  on_delete=models.SET_NULL,
+                                  null=True,
+                                  blank=True,
+                                  related_name='test_run')
     RESULTS = (
         ('pass', 'PASS'),
         ('fail', 'FAIL'),
@@ -190,11 +480,14 @@ class RobotTestRun(models.Model):
     start_time = models.DateTimeField(default=timezone.now,
                                       help_text='When test execution started.')
     end_time = models.DateTimeField(help_text='When test execution ended.')
-    execution_time = models.TimeField()
+    duration_ms = models.PositiveIntegerField(default=0,
+                                              help_text='The number of milliseconds the test took.')
     STATUS_CHOICES = (
         ('not started', 'Not Started'),
         ('in progress', 'In Progress'),
         ('complete', 'Complete'),
+        ('cached', 'Cached'),
+        ('timed out', 'Timed Out'),
         ('error', 'Error'),
     )
     status = models.CharField(max_length=20,
@@ -203,11 +496,124 @@ class RobotTestRun(models.Model):
     reason = models.TextField(max_length=400,
                               blank=True,
                               help_text='Why the test run has the current status.')
+    fingerprint = models.CharField(max_length=64,
+                                   blank=True,
+                                   db_index=True,
+                                   help_text='A hash of everything the result depends on (source files, environment '
+                                             'and variables), for tests whose results may be reused.')
+    rolled_up = models.BooleanField(default=False,
+                                    help_text='Whether the result is counted in the daily rollups.')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['application', 'robot_test', 'start_time'], name='testrunner_run_test_start'),
+            models.Index(fields=['execution', 'robot_test'], name='testrunner_run_execution_test'),
+        ]
 
     def __str__(self):
         return '{name}: {result} - completed at {end}'.format(name=self.robot_test.name,
                                                               result=self.result,
                                                               end=self.end_time)
 
+    def save(self, *args, **kwargs):
+        if self.application_id is None:
+            self.application_id = self.robot_test.robot_suite.application_id
+        super().save(*args, **kwargs)
+
+    @property
+    def execution_time(self):
+        return timedelta(milliseconds=self.duration_ms)
+
     def set_execution_time(self):
-        self.execution_time = self.end_time - self.start_time
+        self.duration_ms = milliseconds_between(self.start_time, self.end_time)
+
+
+class DailyRollup(models.Model):
+    day = models.DateField()
+    runs = models.PositiveIntegerField(default=0)
+    passes = models.PositiveIntegerField(default=0)
+    fails = models.PositiveIntegerField(default=0)
+    total_duration = models.FloatField(default=0,
+                                       help_text='The number of seconds of all runs together.')
+    histogram = models.TextField(default='{}',
+                                 help_text='The number of runs per logarithmic duration bucket, as JSON (see '
+                                           'robotapi.histograms).')
+    flips = models.PositiveIntegerField(default=0,
+                                        help_text='The number of runs whose result differs from the previous run '
+                                                  'of the same test.')
+
+    class Meta:
+        abstract = True
+
+    @property
+    def pass_rate(self):
+        return self.passes / self.runs if self.runs else None
+
+    @property
+    def mean_duration(self):
+        return self.total_duration / self.runs if self.runs else None
+
+
+class RobotTestDailyRollup(DailyRollup):
+    robot_test = models.ForeignKey(RobotTest,
+                                   on_delete=models.CASCADE,
+                                   related_name='daily_rollup')
+    last_result = models.CharField(max_length=5,
+                                   blank=True,
+                                   help_text='The result of the last run of the day, to count flips the next day.')
+
+    class Meta:
+        unique_together = ('robot_test', 'day')
+
+
+class RobotSuiteDailyRollup(DailyRollup):
+    robot_suite = models.ForeignKey(RobotTestSuite,
+                                    on_delete=models.CASCADE,
+                                    related_name='daily_rollup',
+                                    help_text='The suite whose tests, including those of its child suites, ran.')
+
+    class Meta:
+        unique_together = ('robot_suite', 'day')
+
+
+class RobotApplicationDailyRollup(DailyRollup):
+    application = models.ForeignKey(RobotApplicationUnderTest,
+                                    on_delete=models.CASCADE,
+                                    related_name='daily_rollup')
+
+    class Meta:
+        unique_together = ('application', 'day')
+
+
+class RobotResourceLock(models.Model):
+    application = models.ForeignKey(RobotApplicationUnderTest,
+                                    on_delete=models.CASCADE,
+                                    related_name='resource_lock')
+    name = models.CharField(max_length=200,
+                            help_text='The resource a test or suite declares with a lock:<name> tag, e.g. a shared '
+                                      'test account or device.')
+    execution = models.ForeignKey(RobotExecution,
+                                  on_delete=models.CASCADE,
+                                  related_name='resource_lock',
+                                  help_text='The run holding the resource.')
+    acquired = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('application', 'name')
+
+    def __str__(self):
+        return '{app}: {name} (held by {execution})'.format(app=self.application.name, name=self.name,
+                                                            execution=self.execution_id)
+
+
+class RobotHost(models.Model):
+    name = models.CharField(max_length=200,
+                            unique=True,
+                            help_text='The host robot runs on.')
+    last_admission = models.DateTimeField(null=True,
+                                          blank=True,
+                                          help_text='When a run was last checked for admission on this host. Writing '
+                                                    'it locks the row, which serializes admissions per host.')
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,106 @@
+"""
+Full-text search over the test catalog.
+
+On SQLite the catalog is mirrored into an FTS5 virtual table (created by migration 0005) with one row per active
+RobotTest, keyed by the test's primary key and holding its name, documentation, the full name of its suite and the
+names of its tags. Discovery rebuilds an application's rows after configuring it, and queries are ranked with bm25 so
+matches in a test name outrank matches in its documentation. Other database backends fall back to unranked
+case-insensitive matching through the ORM.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import RobotTest, RobotTestSuite, RobotTag
+
+SEARCH_TABLE = 'testrunner_search_index'
+# bm25 column weights, in table column order: application_id (unindexed), name, documentation, suite_name, tags
+RANK_WEIGHTS = (0.0, 10.0, 2.0, 5.0, 4.0)
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def search_available():
+    return connection.vendor == 'sqlite'
+
+
+def _match_expression(text):
+    """Turn free text into an FTS5 query that requires every word, each matched as a prefix."""
+    return ' '.join('"{token}"*'.format(token=token) for token in TOKEN.findall(text or ''))
+
+
+def _source_sql(where):
+    test_tags = RobotTest.robot_tags.through._meta.db_table
+    suite_tags = RobotTestSuite.robot_tags.through._meta.db_table
+    return """
+        SELECT t.id, s.application_id, t.name, COALESCE(t.documentation, ''), s.full_name,
+               COALESCE((SELECT group_concat(g.name, ' ') FROM {tag} g
+                         WHERE g.id IN (SELECT robottag_id FROM {test_tags} WHERE robottest_id = t.id)
+                            OR g.id IN (SELECT robottag_id FROM {suite_tags} WHERE robottestsuite_id = s.id)), '')
+        FROM {test} t INNER JOIN {suite} s ON s.id = t.robot_suite_id
+        WHERE t.active AND {where}""".format(tag=RobotTag._meta.db_table, test_tags=test_tags,
+                                             suite_tags=suite_tags, test=RobotTest._meta.db_table,
+                                             suite=RobotTestSuite._meta.db_table, where=where)
+
+
+def rebuild_search_index(application):
+    """Replace the indexed rows of every test that belongs to ``application``."""
+    if not search_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM {index} WHERE application_id = %s'.format(index=SEARCH_TABLE), [application.pk])
+        cursor.execute('INSERT INTO {index} (rowid, application_id, name, documentation, suite_name, tags) '
+                       '{source}'.format(index=SEARCH_TABLE, source=_source_sql('s.application_id = %s')),
+                       [application.pk])
+
+
+def update_search_index(test_ids, batch_size=500):
+    """Refresh the indexed rows of the tests with the given primary keys, e.g. after they were rediscovered."""
+    test_ids = list(test_ids)
+    if not search_available():
+        return
+    with connection.cursor() as cursor:
+        for start in range(0, len(test_ids), batch_size):
+            batch = test_ids[start:start + batch_size]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute('DELETE FROM {index} WHERE rowid IN ({ids})'.format(index=SEARCH_TABLE, ids=placeholders),
+                           batch)
+            cursor.execute('INSERT INTO {index} (rowid, application_id, name, documentation, suite_name, tags) '
+                           '{source}'.format(index=SEARCH_TABLE,
+                                             source=_source_sql('t.id IN ({ids})'.format(ids=placeholders))),
+                           batch)
+
+
+def search_tests(text, application=None, limit=50):
+    """
+    Return up to ``limit`` active RobotTest objects matching ``text``, best match first. Every word of ``text`` must
+    appear (as a word prefix) in the test name, documentation, suite full name or tags.
+    """
+    expression = _match_expression(text)
+    if not expression:
+        return list()
+    if not search_available():
+        return _search_tests_orm(text, application, limit)
+    sql = 'SELECT rowid FROM {index} WHERE {index} MATCH %s'.format(index=SEARCH_TABLE)
+    params = [expression]
+    if application is not None:
+        sql += ' AND application_id = %s'
+        params.append(application.pk)
+    sql += ' ORDER BY bm25({index}, {weights}) LIMIT %s'.format(index=SEARCH_TABLE,
+                                                                 weights=', '.join(map(str, RANK_WEIGHTS)))
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        ranked_ids = [row[0] for row in cursor.fetchall()]
+    tests = RobotTest.objects.select_related('robot_suite').in_bulk(ranked_ids)
+    return [tests[pk] for pk in ranked_ids if pk in tests]   # Rows deleted since indexing are skipped.
+
+
+def _search_tests_orm(text, application, limit):
+    tests = RobotTest.objects.select_related('robot_suite').filter(active=True)
+    if application is not None:
+        tests = tests.filter(robot_suite__application=application)
+    for token in TOKEN.findall(text):
+        tests = tests.filter(Q(name__icontains=token) | Q(documentation__icontains=token) |
+                             Q(robot_suite__full_name__icontains=token) | Q(robot_tags__name__icontains=token))
+    return list(tests.distinct()[:limit])
@@ -0,0 +1,39 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_catalog_version
+from .models import RobotApplicationUnderTest, RobotTestSuite, RobotTest, RobotTestRun
+from .search import update_search_index
+
+
+@receiver([post_save, post_delete], sender=RobotApplicationUnderTest)
+def application_changed(sender, instance, **kwargs):
+    bump_catalog_version()
+    bump_catalog_version(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=RobotTestSuite)
+def suite_changed(sender, instance, **kwargs):
+    if getattr(instance, 'renamed_from', None) is not None:
+        # The search index holds the full names of the suites of the tests below the renamed or moved suite.
+        renamed = list(instance.descendants().values_list('pk', flat=True)) + [instance.pk]
+        update_search_index(RobotTest.objects.filter(robot_suite__in=renamed).values_list('pk', flat=True))
+    bump_catalog_version(instance.application_id)
+
+
+def _test_application_id(test):
+    if RobotTest.robot_suite.is_cached(test):
+        return test.robot_suite.application_id
+    return RobotTestSuite.objects.filter(pk=test.robot_suite_id).values_list('application_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=RobotTest)
+def test_changed(sender, instance, **kwargs):
+    bump_catalog_version(_test_application_id(instance))
+
+
+@receiver(post_save, sender=RobotTestRun)
+def test_run_saved(sender, instance, created, **kwargs):
+    # Runs are bulk created while robot runs and when results are recorded, which bump the version once for all rows.
+    if created:
+        bump_catalog_version(instance.application_id)
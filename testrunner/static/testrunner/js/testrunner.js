@@ -0,0 +1,264 @@
+/*
+ * Lazy-loading, virtualized suite tree for the testrunner pages.
+ *
+ * Any element with the ``suite-tree`` class and a ``data-children-url`` attribute is turned into a tree whose nodes
+ * are fetched one page at a time from the suite children endpoint when a suite is expanded. The expanded tree is kept
+ * as a flat list of rows, and only the rows inside the scrolled viewport are rendered, so a level with thousands of
+ * suites costs no more DOM (or queries) than the handful that are actually on screen.
+ */
+(function () {
+    'use strict';
+
+    var ROW_HEIGHT = 24;    // px, must match .suite-tree-row in style.css
+    var OVERSCAN = 10;      // extra rows rendered above and below the viewport
+    var PAGE_SIZE = 50;     // children requested per fetch
+
+    function SuiteTree(container) {
+        this.container = container;
+        this.rows = [];
+        this.viewport = document.createElement('div');
+        this.viewport.className = 'suite-tree-viewport';
+        this.spacer = document.createElement('div');
+        this.spacer.className = 'suite-tree-spacer';
+        this.viewport.appendChild(this.spacer);
+        container.appendChild(this.viewport);
+        this.viewport.addEventListener('scroll', this.render.bind(this));
+        window.addEventListener('resize', this.render.bind(this));
+        var root = {children_url: container.getAttribute('data-children-url'), loaded: 0, depth: -1};
+        this.expand(root, -1);
+    }
+
+    SuiteTree.prototype.expand = function (node, index) {
+        node.expanded = true;
+        node.pending = {type: 'more', parent: node, depth: node.depth + 1};
+        this.rows.splice(index + 1, 0, node.pending);
+        this.fetchPage(node);
+    };
+
+    SuiteTree.prototype.collapse = function (node, index) {
+        var end = index + 1;
+        while (end < this.rows.length && this.rows[end].depth > node.depth) {
+            end++;
+        }
+        this.rows.splice(index + 1, end - index - 1);
+        node.expanded = false;
+        node.loaded = 0;
+        node.pending = null;
+        this.render();
+    };
+
+    SuiteTree.prototype.fetchPage = function (node) {
+        var self = this;
+        var more = node.pending;
+        if (!more || more.loading) {
+            return;
+        }
+        more.loading = true;
+        var url = node.children_url + (node.children_url.indexOf('?') < 0 ? '?' : '&') + 'offset=' + node.loaded +
+            '&limit=' + PAGE_SIZE;
+        fetch(url, {credentials: 'same-origin', headers: {'Accept': 'application/json'}})
+            .then(function (response) {
+                if (!response.ok) {
+                    throw new Error(response.status + ' ' + response.statusText);
+                }
+                return response.json();
+            })
+            .then(function (page) {
+                var index = self.rows.indexOf(more);
+                if (index < 0) {
+                    return;     // collapsed while the request was in flight
+                }
+                var children = self.childrenOf(page, node);
+                node.loaded = page.next_offset === null ? node.loaded : page.next_offset;
+                more.loading = false;
+                if (page.next_offset === null) {
+                    node.pending = null;
+                    self.rows.splice.apply(self.rows, [index, 1].concat(children));
+                } else {
+                    self.rows.splice.apply(self.rows, [index, 0].concat(children));
+                }
+                self.render();
+            })
+            .catch(function (error) {
+                more.loading = false;
+                more.error = error.message;
+                self.render();
+            });
+        this.render();
+    };
+
+    SuiteTree.prototype.childrenOf = function (page, node) {
+        var children = [];
+        page.suites.forEach(function (suite) {
+            suite.type = 'suite';
+            suite.depth = node.depth + 1;
+            suite.loaded = 0;
+            children.push(suite);
+        });
+        page.tests.forEach(function (test) {
+            test.type = 'test';
+            test.depth = node.depth + 1;
+            children.push(test);
+        });
+        return children;
+    };
+
+    SuiteTree.prototype.expandable = function (row) {
+        return row.type === 'suite' && row.child_suite_count + row.test_count > 0;
+    };
+
+    SuiteTree.prototype.render = function () {
+        var height = this.viewport.clientHeight || ROW_HEIGHT * 20;
+        var first = Math.max(0, Math.floor(this.viewport.scrollTop / ROW_HEIGHT) - OVERSCAN);
+        var last = Math.min(this.rows.length, Math.ceil((this.viewport.scrollTop + height) / ROW_HEIGHT) + OVERSCAN);
+        this.spacer.style.height = (this.rows.length * ROW_HEIGHT) + 'px';
+        while (this.spacer.firstChild) {
+            this.spacer.removeChild(this.spacer.firstChild);
+        }
+        for (var i = first; i < last; i++) {
+            var row = this.rows[i];
+            this.spacer.appendChild(this.renderRow(row, i));
+            if (row.type === 'more' && !row.loading && !row.error) {
+                this.fetchPage(row.parent);     // a "load more" row scrolled into view
+            }
+        }
+    };
+
+    SuiteTree.prototype.renderRow = function (row, index) {
+        var self = this;
+        var element = document.createElement('div');
+        element.className = 'suite-tree-row suite-tree-' + row.type;
+        element.style.top = (index * ROW_HEIGHT) + 'px';
+        element.style.paddingLeft = (row.depth * 16) + 'px';
+        if (row.type === 'more') {
+            element.textContent = row.error ? 'Could not load children: ' + row.error : 'Loading…';
+            return element;
+        }
+        var toggle = document.createElement('span');
+        toggle.className = 'suite-tree-toggle';
+        if (this.expandable(row)) {
+            toggle.textContent = row.expanded ? '▾' : '▸';
+            toggle.addEventListener('click', function () {
+                var at = self.rows.indexOf(row);
+                if (row.expanded) {
+                    self.collapse(row, at);
+                } else {
+                    self.expand(row, at);
+                }
+            });
+        }
+        element.appendChild(toggle);
+        this.renderLabel(row, element);
+        return element;
+    };
+
+    SuiteTree.prototype.renderLabel = function (row, element) {
+        var link = document.createElement('a');
+        link.href = row.url;
+        link.textContent = row.name;
+        element.appendChild(link);
+        if (row.type === 'suite') {
+            var counts = document.createElement('span');
+            counts.className = 'suite-tree-counts';
+            counts.textContent = ' (' + row.child_suite_count + ' suites, ' + row.test_count + ' tests)';
+            element.appendChild(counts);
+        }
+    };
+
+    /*
+     * Lazy viewer for the log of a robot run, built on the suite tree: each suite, test and keyword of the run's
+     * output.xml is fetched from the log children endpoint only when its parent is expanded, so only the expanded parts
+     * of a giant log are ever transferred or rendered. Expanding a keyword also shows the messages it logged.
+     */
+    function LogTree(container) {
+        SuiteTree.call(this, container);
+    }
+
+    LogTree.prototype = Object.create(SuiteTree.prototype);
+    LogTree.prototype.constructor = LogTree;
+
+    LogTree.prototype.childrenOf = function (page, node) {
+        var children = [];
+        page.messages.forEach(function (message) {
+            message.type = 'message';
+            message.depth = node.depth + 1;
+            children.push(message);
+        });
+        page.nodes.forEach(function (child) {
+            child.type = 'node';
+            child.depth = node.depth + 1;
+            child.loaded = 0;
+            children.push(child);
+        });
+        return children;
+    };
+
+    LogTree.prototype.expandable = function (row) {
+        return row.type === 'node' && (row.child_count > 0 || row.kind === 'keyword');
+    };
+
+    LogTree.prototype.renderLabel = function (row, element) {
+        var label = document.createElement('span');
+        if (row.type === 'message') {
+            label.className = 'log-level-' + row.level;
+            label.textContent = row.timestamp + ' ' + row.level + ' ' + row.text;
+            element.appendChild(label);
+            return;
+        }
+        var status = document.createElement('span');
+        status.className = 'log-status log-status-' + row.status;
+        status.textContent = row.status;
+        element.appendChild(status);
+        var kind = row.kind === 'keyword' ? row.keyword_type || 'kw' : row.kind;
+        label.textContent = ' ' + kind.toUpperCase() + ' ' + row.name;
+        element.appendChild(label);
+    };
+
+    /*
+     * Show how many tests the include/exclude tag patterns of a run form select, using the tag preview endpoint, so
+     * the selection can be checked before the run is submitted.
+     */
+    function TagPreview(form) {
+        var self = this;
+        var timer = null;
+        this.form = form;
+        this.output = form.querySelector('.tag-preview-count');
+        form.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(self.update.bind(self), 300);
+        });
+    }
+
+    TagPreview.prototype.update = function () {
+        var self = this;
+        var url = this.form.getAttribute('data-preview-url');
+        ['include', 'exclude'].forEach(function (option) {
+            var value = self.form.elements[option].value.trim();
+            if (value) {
+                url += (url.indexOf('?') < 0 ? '?' : '&') + option + '=' + encodeURIComponent(value);
+            }
+        });
+        fetch(url, {credentials: 'same-origin', headers: {'Accept': 'application/json'}})
+            .then(function (response) {
+                return response.json();
+            })
+            .then(function (preview) {
+                self.output.textContent = preview.count + ' tests selected';
+            });
+    };
+
+    document.addEventListener('DOMContentLoaded', function () {
+        var trees = document.querySelectorAll('.suite-tree[data-children-url]');
+        for (var i = 0; i < trees.length; i++) {
+            new SuiteTree(trees[i]);
+        }
+        var logs = document.querySelectorAll('.log-tree[data-children-url]');
+        for (var k = 0; k < logs.length; k++) {
+            new LogTree(logs[k]);
+        }
+        var previews = document.querySelectorAll('form.tag-preview[data-preview-url]');
+        for (var j = 0; j < previews.length; j++) {
+            new TagPreview(previews[j]);
+        }
+    });
+})();
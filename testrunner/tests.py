@@ -1,3 +1,627 @@
+import gzip
+import os
+import shutil
+import socket
+import tempfile
+from datetime import timedelta
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .cache import catalog_version
+from .models import RobotApplicationUnderTest, RobotTestSuite, RobotTest, RobotTestRun, RobotTag, RobotTestStep, \
+    RobotKeywordUsage, RobotExecution, RobotArtifact, RobotKeywordTiming, RobotApplicationDailyRollup, \
+    RobotTestDailyRollup
+from .search import rebuild_search_index, search_tests
+
+from robotapi.artifacts import blob_path, store_blob
+from robotapi.logindex import LogIndex, index_log
+
+ROBOT_PROJECT_LOCATION = os.getenv('ROBOT_PROJECT_PATH')
+
+
+class ApplicationTestCase(TestCase):
+    """A test case with an application under test, ``app``, and helpers to add suites, tests and runs to it."""
+    app_name = 'Test App'
+    app_options = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.app = cls.create_app(cls.app_name, **cls.app_options)
+
+    @staticmethod
+    def create_app(name, **options):
+        return RobotApplicationUnderTest.objects.create(name=name, robot_location='robot',
+                                                        app_test_location=ROBOT_PROJECT_LOCATION, **options)
+
+    @classmethod
+    def create_suite(cls, name, parent=None, application=None):
+        return RobotTestSuite.objects.create(name=name, application=application or cls.app, parent=parent)
+
+    @staticmethod
+    def create_test(name, suite, **fields):
+        return RobotTest.objects.create(name=name, robot_suite=suite, **fields)
+
+    @classmethod
+    def create_execution(cls, **fields):
+        return RobotExecution.objects.create(application=cls.app, **fields)
+
+
+class TestSuiteChildrenView(ApplicationTestCase):
+    app_name = 'Tree App'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.root = cls.create_suite('Root')
+        cls.children = [cls.create_suite('Child %02d' % i, parent=cls.root) for i in range(3)]
+        cls.create_suite('Grandchild', parent=cls.children[0])
+        cls.create_test('Grandchild Test', cls.children[0])
+        cls.tests = [cls.create_test('Test %02d' % i, cls.root) for i in range(2)]
+
+    def setUp(self):
+        cache.clear()
+
+    def children_url(self, suite):
+        return reverse('testrunner:suite-children', args=(self.app.pk, suite.pk))
+
+    def test_children_include_counts(self):
+        response = self.client.get(self.children_url(self.root))
+        self.assertEqual(response.status_code, 200)
+        page = response.json()
+        self.assertEqual(page['child_suite_count'], 3)
+        self.assertEqual(page['test_count'], 2)
+        self.assertEqual([s['name'] for s in page['suites']], ['Child 00', 'Child 01', 'Child 02'])
+        self.assertEqual([t['name'] for t in page['tests']], ['Test 00', 'Test 01'])
+        self.assertEqual(page['suites'][0]['child_suite_count'], 1)
+        self.assertEqual(page['suites'][0]['test_count'], 1)
+        self.assertIsNone(page['next_offset'])
+
+    def test_children_are_paged_across_suites_and_tests(self):
+        first = self.client.get(self.children_url(self.root), {'limit': 2}).json()
+        self.assertEqual(len(first['suites']), 2)
+        self.assertEqual(first['tests'], [])
+        self.assertEqual(first['next_offset'], 2)
+        second = self.client.get(self.children_url(self.root), {'offset': 2, 'limit': 2}).json()
+        self.assertEqual([s['name'] for s in second['suites']], ['Child 02'])
+        self.assertEqual([t['name'] for t in second['tests']], ['Test 00'])
+        self.assertEqual(second['next_offset'], 4)
+
+    def test_children_query_count_is_constant(self):
+        with self.assertNumQueries(3):
+            self.client.get(self.children_url(self.root))
+
+    def test_children_of_suite_in_other_application_is_404(self):
+        other_app = self.create_app('Other App')
+        response = self.client.get(reverse('testrunner:suite-children', args=(other_app.pk, self.root.pk)))
+        self.assertEqual(response.status_code, 404)
+
+
+class TestPaginatedListViews(ApplicationTestCase):
+    app_name = 'Large App'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.root = cls.create_suite('Root')
+        cls.branch = cls.create_suite('Branch', parent=cls.root)
+        RobotTestSuite.objects.bulk_create([RobotTestSuite(name='Suite %03d' % i,
+                                                           full_name='Root.Branch.Suite %03d' % i,
+                                                           application=cls.app,
+                                                           parent=cls.branch) for i in range(300)])
+        RobotTest.objects.bulk_create([RobotTest(name='Test %03d' % i, robot_suite=cls.branch) for i in range(300)])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_suite_full_name_is_stored(self):
+        leaf = self.create_suite('Leaf', parent=self.branch)
+        self.assertEqual(leaf.full_name, 'Root.Branch.Leaf')
+        self.assertEqual(RobotTestSuite.objects.get(pk=leaf.pk).verbose_name, 'Root.Branch.Leaf')
+
+    def test_renaming_a_suite_renames_its_descendants(self):
+        leaf = self.create_suite('Leaf', parent=self.branch)
+        other = self.create_suite('Branches', parent=self.root)
+        branch = RobotTestSuite.objects.get(pk=self.branch.pk)
+        branch.name = 'Trunk'
+        branch.save()
+        self.assertEqual(RobotTestSuite.objects.get(pk=leaf.pk).full_name, 'Root.Trunk.Leaf')
+        self.assertEqual(RobotTestSuite.objects.get(name='Suite 007').full_name, 'Root.Trunk.Suite 007')
+        self.assertEqual(RobotTestSuite.objects.get(pk=other.pk).full_name, 'Root.Branches')
+        leaf.parent = other
+        leaf.save()
+        self.assertEqual(RobotTestSuite.objects.get(pk=leaf.pk).full_name, 'Root.Branches.Leaf')
+        self.assertEqual([t.name for t in search_tests('Trunk Test 005', application=self.app)], ['Test 005'])
+
+    def test_suite_list_resolves_parent_by_full_name(self):
+        response = self.client.get(reverse('testrunner:suite-list', args=(self.app.pk,)), {'parent': 'root.branch'})
+        self.assertEqual(response.context['parent'], self.branch)
+        self.assertEqual(len(response.context['suites']), 50)
+        self.assertTrue(response.context['is_paginated'])
+
+    def test_suite_list_defaults_to_root_children(self):
+        response = self.client.get(reverse('testrunner:suite-list', args=(self.app.pk,)))
+        self.assertEqual(response.context['parent'], self.root)
+        self.assertEqual(list(response.context['suites']), [self.branch])
+
+    def test_suite_list_page_query_count(self):
+        url = reverse('testrunner:suite-list', args=(self.app.pk,))
+        for page in (1, 6):
+            with self.assertNumQueries(4):
+                response = self.client.get(url, {'parent': 'Root.Branch', 'page': page})
+            self.assertEqual(response.status_code, 200)
+
+    def test_test_list_page_query_count(self):
+        url = reverse('testrunner:test-list', args=(self.app.pk, self.branch.pk))
+        for page in (1, 6):
+            with self.assertNumQueries(3):
+                response = self.client.get(url, {'page': page})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.context['tests']), 50)
+
+
+class TestCatalogCache(ApplicationTestCase):
+    app_name = 'Cached App'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.root = cls.create_suite('Root')
+        cls.test = cls.create_test('Cached Test', cls.root)
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('testrunner:suite-children', args=(self.app.pk, self.root.pk))
+
+    def test_repeat_request_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_conditional_get_returns_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_test_invalidates_application_pages(self):
+        etag = self.client.get(self.url)['ETag']
+        self.create_test('Another Test', self.root)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['test_count'], 2)
+
+    def test_new_test_run_bumps_application_version(self):
+        version = catalog_version(self.app.pk)
+        now = timezone.now()
+        with self.assertNumQueries(1):     # Only the insert; the application is not looked up through the test
+            RobotTestRun.objects.create(robot_test=self.test, application=self.app, result='pass', status='complete',
+                                        start_time=now, end_time=now)
+        self.assertGreater(catalog_version(self.app.pk), version)
+
+    def test_other_application_is_not_invalidated(self):
+        other_app = self.create_app('Other App')
+        version = catalog_version(other_app.pk)
+        self.create_test('Another Test', self.root)
+        self.assertEqual(catalog_version(other_app.pk), version)
+
+
+class TestSearch(ApplicationTestCase):
+    app_name = 'Search App'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.other_app = cls.create_app('Other Search App')
+        root = cls.create_suite('Root')
+        login = cls.create_suite('Login Pages', parent=root)
+        cls.valid_login = cls.create_test('Valid Login', login, documentation='Opens the browser and logs in.')
+        cls.documented = cls.create_test('Account Settings', root, documentation='Requires a valid login first.')
+        cls.tagged = cls.create_test('Checkout', root)
+        cls.tagged.robot_tags.add(RobotTag.objects.create(name='payments', application=cls.app))
+        other_root = cls.create_suite('Root', application=cls.other_app)
+        cls.create_test('Valid Login Elsewhere', other_root)
+        rebuild_search_index(cls.app)
+        rebuild_search_index(cls.other_app)
+
+    def test_name_matches_rank_above_documentation_matches(self):
+        results = search_tests('valid login', application=self.app)
+        self.assertEqual(results, [self.valid_login, self.documented])
+
+    def test_search_matches_suite_names_tags_and_prefixes(self):
+        self.assertEqual(search_tests('login pag', application=self.app), [self.valid_login])
+        self.assertEqual(search_tests('payments', application=self.app), [self.tagged])
+
+    def test_search_across_applications(self):
+        self.assertEqual(len(search_tests('valid login')), 3)
+
+    def test_search_results_endpoint(self):
+        response = self.client.get(reverse('testrunner:search-results'), {'q': 'checkout', 'app': self.app.pk})
+        self.assertEqual([r['name'] for r in response.json()['results']], ['Checkout'])
+
+    def test_blank_search_has_no_results(self):
+        response = self.client.get(reverse('testrunner:search'), {'q': ' "* '})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['results'], [])
+
+
+class TestTagPreview(ApplicationTestCase):
+    app_name = 'Tagged App'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        root = cls.create_suite('Root')
+        cls.child = cls.create_suite('Child', parent=root)
+        smoke = RobotTag.objects.create(name='Smoke', application=cls.app)
+        slow = RobotTag.objects.create(name='slow_test', application=cls.app)
+        for suite, name, tags in [(root, 'Fast Smoke', [smoke]), (root, 'Slow Smoke', [smoke, slow]),
+                                  (cls.child, 'Child Smoke', [smoke]), (cls.child, 'Untagged', [])]:
+            cls.create_test(name, suite).robot_tags.set(tags)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_preview_counts_selected_tests(self):
+        response = self.client.get(reverse('testrunner:tag-preview', args=(self.app.pk,)),
+                                   {'include': 'smoke', 'exclude': 'SLOW TEST'})
+        self.assertEqual(response.json()['count'], 2)
+        self.assertEqual([t['name'] for t in response.json()['tests']], ['Root.Fast Smoke', 'Root.Child.Child Smoke'])
+
+    def test_preview_within_suite(self):
+        response = self.client.get(reverse('testrunner:tag-preview', args=(self.app.pk,)),
+                                   {'exclude': 'smoke', 'suite': self.child.pk})
+        self.assertEqual([t['name'] for t in response.json()['tests']], ['Root.Child.Untagged'])
+
+
+class TestKeywordUsage(ApplicationTestCase):
+    app_name = 'Keyword App'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        root = cls.create_suite('Root')
+        cls.login = cls.create_test('Login', root)
+        logout = cls.create_test('Logout', root)
+        for test, keyword, depth in [(cls.login, 'Open Browser To Login Page', 0), (cls.login, 'Open Browser', 1),
+                                     (logout, 'Open Browser', 2), (logout, 'Close Browser', 0)]:
+            RobotKeywordUsage.objects.create(application=cls.app, robot_test=test, keyword=keyword,
+                                             normalized_keyword=keyword.replace(' ', '').lower(), depth=depth)
+        RobotTestStep.objects.create(name='Open Browser To Login Page', keyword='Open Browser To Login Page',
+                                     robot_test=cls.login, order=0, arguments='')
+        RobotTestStep.objects.create(name='Input Username', keyword='Input Username', robot_test=cls.login, order=1,
+                                     arguments='demo')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_usage_lists_tests_with_depth(self):
+        response = self.client.get(reverse('testrunner:keyword-usage', args=(self.app.pk,)),
+                                   {'keyword': 'open_browser'})
+        self.assertEqual(response.json()['count'], 2)
+        self.assertEqual([(t['name'], t['depth']) for t in response.json()['tests']],
+                         [('Root.Login', 1), ('Root.Logout', 2)])
+
+    def test_usage_ignores_bdd_prefix(self):
+        response = self.client.get(reverse('testrunner:keyword-usage', args=(self.app.pk,)),
+                                   {'keyword': 'Given open browser to login page'})
+        self.assertEqual([t['name'] for t in response.json()['tests']], ['Root.Login'])
+
+    def test_test_detail_lists_steps(self):
+        response = self.client.get(reverse('testrunner:test-detail',
+                                           args=(self.app.pk, self.login.robot_suite_id, self.login.pk)))
+        self.assertContains(response, 'Input Username')
+        self.assertContains(response, '<code>demo</code>', html=True)
+
+
+class TestRunImpacted(ApplicationTestCase):
+    app_name = 'Impact App'
+
+    def test_invalid_commit_range_is_rejected(self):
+        response = self.client.post(reverse('testrunner:run-impacted', args=(self.app.pk,)),
+                                    {'commit_range': 'main; rm -rf /'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'Invalid commit range: main; rm -rf /')
+
+
+class TestExecutionProgress(ApplicationTestCase):
+    app_name = 'Progress App'
+
+    def test_progress_of_running_execution(self):
+        start = timezone.now()
+        execution = self.create_execution(status='in progress', start_time=start, expected_tests=4,
+                                          expected_duration=40, completed_tests=1, completed_duration=10,
+                                          estimated_end=start + timedelta(seconds=40))
+        response = self.client.get(reverse('testrunner:execution-progress', args=(execution.pk,)))
+        self.assertEqual(response.json()['percent_complete'], 25)
+        self.assertEqual(response.json()['completed_tests'], 1)
+        self.assertIsNotNone(response.json()['estimated_end'])
+
+    def test_finished_execution_is_complete(self):
+        execution = self.create_execution(status='complete', end_time=timezone.now())
+        response = self.client.get(reverse('testrunner:execution-progress', args=(execution.pk,)))
+        self.assertEqual(response.json()['percent_complete'], 100)
+
+
+class TestArtifactView(ApplicationTestCase):
+    app_name = 'Artifact App'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.execution = cls.create_execution(status='complete')
+        cls.content = b'<html>' + b'robot log ' * 1000 + b'</html>'
+        directory = tempfile.mkdtemp()
+        with open(os.path.join(directory, 'log.html'), 'wb') as log:
+            log.write(cls.content)
+        cls.blob = store_blob(os.path.join(directory, 'log.html'))
+        shutil.rmtree(directory)
+        RobotArtifact.objects.create(execution=cls.execution, name='log.html', blob=cls.blob, content_type='text/html')
+        cls.url = reverse('testrunner:artifact', args=(cls.execution.pk, 'log.html'))
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(blob_path(cls.blob.digest))
+        os.removedirs(os.path.dirname(blob_path(cls.blob.digest)))
+        super().tearDownClass()
+
+    def test_gzip_content_is_served_as_stored(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['ETag'], '"{d}-gzip"'.format(d=self.blob.digest))
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), self.content)
+
+    def test_byte_range_of_decompressed_content(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=6-15')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 6-15/{n}'.format(n=len(self.content)))
+        self.assertEqual(b''.join(response.streaming_content), b'robot log ')
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-7')
+        self.assertEqual(b''.join(response.streaming_content), b'</html>')
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes={n}-'.format(n=len(self.content)))
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */{n}'.format(n=len(self.content)))
+
+    def test_matching_etag_is_not_modified(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"{d}"'.format(d=self.blob.digest))
+        self.assertEqual(response.status_code, 304)
+
+
+class TestLogViewer(ApplicationTestCase):
+    app_name = 'Log App'
+    OUTPUT = ('<?xml version="1.0" encoding="UTF-8"?>\n<robot generator="Robot 3.1.2">\n'
+              '<suite id="s1" name="Root"><test id="s1-t1" name="Login">'
+              '<kw name="Open Login Page"><kw name="Open Browser" library="SeleniumLibrary">'
+              '<msg timestamp="20190304 03:13:00.100" level="INFO">Opening browser \u2192 chrome</msg>'
+              '<status status="PASS" starttime="20190304 03:13:00.050" endtime="20190304 03:13:01.000"/></kw>'
+              '<msg timestamp="20190304 03:13:01.100" level="INFO">Page opened</msg>'
+              '<status status="PASS" starttime="20190304 03:13:00.000" endtime="20190304 03:13:01.100"/></kw>'
+              '<status status="PASS" starttime="20190304 03:13:00.000" endtime="20190304 03:13:01.200"/></test>'
+              '<status status="PASS" starttime="20190304 03:13:00.000" endtime="20190304 03:13:01.300"/></suite>'
+              '<errors></errors></robot>\n')
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.directory = tempfile.mkdtemp()
+        output_file = os.path.join(cls.directory, 'output.xml')
+        with open(output_file, 'w', encoding='utf-8') as output:
+            output.write(cls.OUTPUT)
+        cls.execution = cls.create_execution(status='complete', output_file=output_file)
+        index_log(output_file)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+        super().tearDownClass()
+
+    def children(self, **params):
+        return self.client.get(reverse('testrunner:log-children', args=(self.execution.pk,)), params).json()
+
+    def test_children_are_fetched_one_level_at_a_time(self):
+        root = self.children()
+        self.assertEqual([(n['kind'], n['name'], n['status']) for n in root['nodes']], [('suite', 'Root', 'PASS')])
+        test = self.children(parent=root['nodes'][0]['number'])['nodes'][0]
+        self.assertEqual((test['name'], test['child_count']), ('Login', 1))
+        keyword = self.children(parent=test['number'])
+        self.assertEqual(keyword['messages'], [])
+        self.assertEqual(keyword['nodes'][0]['name'], 'Open Login Page')
+
+    def test_keyword_messages_exclude_nested_keywords(self):
+        with LogIndex(self.execution.output_file) as index:
+            test = index.children(index.children()[0])[0]
+            keyword = index.children(test)[0]
+        self.assertEqual(keyword.name, 'Open Login Page')
+        page = self.children(parent=keyword.number)
+        self.assertEqual([n['name'] for n in page['nodes']], ['SeleniumLibrary.Open Browser'])
+        self.assertEqual([m['text'] for m in page['messages']], ['Page opened'])
+        nested = self.children(parent=page['nodes'][0]['number'])
+        self.assertEqual([m['text'] for m in nested['messages']], ['Opening browser \u2192 chrome'])
+
+    def test_missing_nodes_are_not_found(self):
+        response = self.client.get(reverse('testrunner:log-children', args=(self.execution.pk,)), {'parent': 2 ** 40})
+        self.assertEqual(response.status_code, 404)
+
+    def test_log_viewer_page(self):
+        response = self.client.get(reverse('testrunner:log-viewer', args=(self.execution.pk,)))
+        self.assertContains(response, 'class="log-tree"')
+
+
+class TestSlowestKeywords(ApplicationTestCase):
+    app_name = 'Timing App'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        RobotKeywordTiming.objects.create(application=cls.app, keyword='Login', call_count=100, total_duration=200,
+                                          max_duration=3, p50_duration=2, p95_duration=2.5)
+        RobotKeywordTiming.objects.create(application=cls.app, keyword='Sleep', call_count=2, total_duration=60,
+                                          max_duration=30, p50_duration=30, p95_duration=30)
+
+    def test_keywords_by_total_and_percentile(self):
+        url = reverse('testrunner:keyword-timings', args=(self.app.pk,))
+        self.assertEqual([k['keyword'] for k in self.client.get(url).json()['keywords']], ['Login', 'Sleep'])
+        self.assertEqual([k['keyword'] for k in self.client.get(url, {'order': 'p95'}).json()['keywords']],
+                         ['Sleep', 'Login'])
+        self.assertEqual(self.client.get(url).json()['keywords'][0]['mean'], 2)
+
+    def test_slowest_keywords_page(self):
+        response = self.client.get(reverse('testrunner:slowest-keywords', args=(self.app.pk,)))
+        self.assertContains(response, '<td>Login</td>', html=True)
+
+
+class TestTrends(ApplicationTestCase):
+    app_name = 'Trend App'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        suite = cls.create_suite('Trend Suite')
+        cls.test = cls.create_test('Trend Test', suite)
+        today = timezone.localtime().date()
+        RobotApplicationDailyRollup.objects.create(application=cls.app, day=today - timedelta(days=40), runs=1,
+                                                   passes=1)
+        RobotApplicationDailyRollup.objects.create(application=cls.app, day=today, runs=4, passes=3, fails=1,
+                                                   total_duration=8, histogram='{"31":4}', flips=2)
+        RobotTestDailyRollup.objects.create(robot_test=cls.test, day=today, runs=4, passes=3, fails=1, flips=2,
+                                            last_result='pass')
+
+    def test_trend_data_reads_rollups(self):
+        response = self.client.get(reverse('testrunner:trends-data', args=(self.app.pk,)))
+        self.assertEqual([(d['runs'], d['pass_rate'], d['mean_duration']) for d in response.json()['trend']],
+                         [(4, 0.75, 2)])
+        self.assertEqual(response.json()['flakiest'][0]['name'], 'Trend Test')
+        response = self.client.get(reverse('testrunner:trends-data', args=(self.app.pk,)), {'days': 60})
+        self.assertEqual(len(response.json()['trend']), 2)
+
+    def test_trends_page_of_a_test(self):
+        response = self.client.get(reverse('testrunner:trends', args=(self.app.pk,)), {'test': self.test.pk})
+        self.assertContains(response, '<h2>Trends of Trend Test</h2>', html=True)
+        self.assertContains(response, '<td>75%</td>', html=True)
+
+
+class TestSlowestTests(ApplicationTestCase):
+    app_name = 'Duration App'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        suite = cls.create_suite('Duration Suite')
+        cls.test = cls.create_test('Long Test', suite)
+        start = timezone.now() - timedelta(days=1)
+        for hours in (1, 2, 30):    # Durations beyond a day are stored too
+            run = RobotTestRun(robot_test=cls.test, result='pass', status='complete', start_time=start,
+                               end_time=start + timedelta(hours=hours))
+            run.set_execution_time()
+            run.save()
+
+    def test_slowest_tests_with_percentiles(self):
+        response = self.client.get(reverse('testrunner:slowest-tests', args=(self.app.pk,)), {'days': 7})
+        test = response.json()['tests'][0]
+        self.assertEqual((test['name'], test['runs'], test['p50'], test['max']),
+                         ('Long Test', 3, 2 * 3600 * 1000, 30 * 3600 * 1000))
+        self.assertEqual(RobotTestRun.objects.get(duration_ms=test['max']).execution_time, timedelta(hours=30))
+
+
+class TestExecutionComparison(ApplicationTestCase):
+    app_name = 'Comparison App'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        suite = cls.create_suite('Nightly')
+        tests = {name: cls.create_test(name, suite)
+                 for name in ('Broken', 'Repaired', 'Sluggish', 'Steady', 'Retired', 'Brand New')}
+        start = timezone.now() - timedelta(days=1)
+        cls.base = cls.create_execution(status='complete', start_time=start)
+        cls.head = cls.create_execution(status='complete', start_time=start + timedelta(hours=12))
+        for execution, results in ((cls.base, {'Broken': ('pass', 1000), 'Repaired': ('fail', 1000),
+                                               'Sluggish': ('pass', 1000), 'Steady': ('pass', 1000),
+                                               'Retired': ('pass', 1000)}),
+                                   (cls.head, {'Broken': ('fail', 1000), 'Repaired': ('pass', 1000),
+                                               'Sluggish': ('pass', 5000), 'Steady': ('pass', 1200),
+                                               'Brand New': ('pass', 1000)})):
+            for name, (result, duration) in results.items():
+                RobotTestRun.objects.create(robot_test=tests[name], execution=execution, result=result,
+                                            status='complete', start_time=execution.start_time,
+                                            end_time=execution.start_time, duration_ms=duration)
+
+    def test_comparison_with_previous_execution(self):
+        response = self.client.get(reverse('testrunner:execution-comparison-data', args=(self.head.pk,)))
+        comparison = response.json()
+        self.assertEqual(comparison['base'], self.base.pk)
+        self.assertEqual({kind: [c['name'] for c in comparison[kind]] for kind in ('newly_failed', 'fixed', 'slower',
+                                                                                   'faster', 'added', 'removed')},
+                         {'newly_failed': ['Broken'], 'fixed': ['Repaired'], 'slower': ['Sluggish'], 'faster': [],
+                          'added': ['Brand New'], 'removed': ['Retired']})
+        self.assertEqual(comparison['unchanged'], 1)
+        self.assertEqual((comparison['slower'][0]['base_duration'], comparison['slower'][0]['head_duration']),
+                         (1000, 5000))
+        response = self.client.get(reverse('testrunner:execution-comparison-data', args=(self.base.pk,)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_comparison_page_and_export(self):
+        url = reverse('testrunner:execution-comparison', args=(self.head.pk,))
+        response = self.client.get(url, {'base': self.base.pk})
+        self.assertContains(response, '<tr class="comparison-regression"><td>Broken</td><td>Nightly</td><td>pass</td>'
+                                      '<td>fail</td><td>1000</td><td>1000</td></tr>', html=True)
+        response = self.client.get(reverse('testrunner:execution-comparison-data', args=(self.head.pk,)),
+                                   {'base': self.base.pk, 'download': ''})
+        self.assertIn('attachment', response['Content-Disposition'])
+
+
+class TestShards(ApplicationTestCase):
+    app_name = 'Shard App'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        suite = cls.create_suite('Devices')
+        device = RobotTag.objects.create(name='lock:scanner', application=cls.app)
+        for name, estimate in (('Scan', 20), ('Rescan', 20), ('Browse', 30), ('Search', 5)):
+            test = cls.create_test(name, suite, duration_estimate=estimate)
+            if 'can' in name:
+                test.robot_tags.add(device)
+
+    def test_tests_sharing_a_resource_share_a_shard(self):
+        response = self.client.get(reverse('testrunner:test-shards', args=(self.app.pk,)), {'count': 2})
+        self.assertEqual(response.json()['shards'],
+                         [{'tests': ['Devices.Scan', 'Devices.Rescan'], 'resources': ['scanner'],
+                           'expected_duration': 40},
+                          {'tests': ['Devices.Browse', 'Devices.Search'], 'resources': [], 'expected_duration': 35}])
+
+
+class TestAdmission(ApplicationTestCase):
+    app_name = 'Busy App'
+    app_options = {'max_concurrent_runs': 1}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        suite = cls.create_suite('Queue')
+        cls.test = cls.create_test('Wait', suite)
+        cls.create_execution(status='in progress', host=socket.gethostname())
+
+    def test_run_over_capacity_is_rejected(self):
+        response = self.client.get(reverse('testrunner:run-test', args=(self.test.pk,)))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        capacity = self.client.get(reverse('testrunner:capacity')).json()
+        self.assertEqual((capacity['running'], capacity['queued']), (1, 0))
+
 
-# Create your tests here.
+class TestMetrics(TestCase):
+    def test_metrics_count_requests_by_url_name(self):
+        self.client.get(reverse('testrunner:capacity'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        text = response.content.decode()
+        self.assertRegex(text, r'robotweb_http_requests_total\{view="testrunner:capacity",status="200"\} [1-9]')
+        self.assertRegex(text, r'robotweb_http_request_queries_count\{view="testrunner:capacity"\} [1-9]')
+        self.assertIn('robotweb_admission_queued_runs 0', text)
@@ -1,27 +1,83 @@
 from django.urls import path
 
 from . import views
+from .cache import cache_catalog_view
 
 app_name = 'testrunner'
+# Read-only catalog pages are cached per application and invalidated when discovery or test runs change it.
 urlpatterns = [
     path('', views.index, name='index'),
     # All applications available to test will be listed on the testrunner index page.
-    path('applications/', views.ApplicationListView.as_view(), name='application-list'),
+    path('applications/', cache_catalog_view()(views.ApplicationListView.as_view()), name='application-list'),
     # This view will give details about the application and its test suites.
-    path('applications/<int:pk>/', views.ApplicationDetailView.as_view(), name='application-detail'),
+    path('applications/<int:pk>/',
+         cache_catalog_view('pk')(views.ApplicationDetailView.as_view()),
+         name='application-detail'),
     # This view will give details about test suites, along with any child suites and tests. An optional query parameter
     # ``parent`` is supported to limit the suites that are displayed on a given page (defaults to root test suite.)
-    path('applications/<int:pk>/suites/', views.SuiteListView.as_view(), name='suite-list'),
+    path('applications/<int:pk>/suites/', cache_catalog_view('pk')(views.SuiteListView.as_view()), name='suite-list'),
     # This view will give details about the test suite.
-    path('applications/<int:app_id>/suites/<int:pk>/', views.SuiteDetailView.as_view(), name='suite-detail'),
+    path('applications/<int:app_id>/suites/<int:pk>/',
+         cache_catalog_view('app_id')(views.SuiteDetailView.as_view()),
+         name='suite-detail'),
+    # A JSON listing of one page of a test suite's direct child suites and tests, used by the lazy-loading suite tree.
+    # Optional query parameters ``offset`` and ``limit`` page through the children.
+    path('applications/<int:app_id>/suites/<int:pk>/children/',
+         cache_catalog_view('app_id')(views.suite_children),
+         name='suite-children'),
     # This view will give details about the tests in a certain suite and allow them to be run.
-    path('applications/<int:app_id>/suites/<int:pk>/tests/', views.TestListView.as_view(), name='test-list'),
+    path('applications/<int:app_id>/suites/<int:pk>/tests/',
+         cache_catalog_view('app_id')(views.TestListView.as_view()),
+         name='test-list'),
     # This view will give details about the test.
     path('applications/<int:app_id>/suites/<int:suite_id>/tests/<int:pk>/',
-         views.TestDetailView.as_view(),
+         cache_catalog_view('app_id')(views.TestDetailView.as_view()),
          name='test-detail'),
+    # A JSON preview of the tests that ``include``/``exclude`` tag patterns select, evaluated without running robot.
+    path('applications/<int:pk>/tags/preview/', cache_catalog_view('pk')(views.tag_preview), name='tag-preview'),
+    # The tests the ``include``/``exclude`` tag patterns select, split over ``count`` shards to run in parallel, as
+    # JSON.
+    path('applications/<int:pk>/tests/shards/', views.test_shards, name='test-shards'),
+    # A JSON list of the tests that run the ``keyword`` query parameter, directly or through user keywords.
+    path('applications/<int:pk>/keywords/usage/',
+         cache_catalog_view('pk')(views.keyword_usage),
+         name='keyword-usage'),
+    # The keywords that took the most time across the runs of an application, as a page and as JSON. Query parameters:
+    # ``order`` (total, p95, p50, max or calls) and ``limit``.
+    path('applications/<int:pk>/keywords/slowest/', views.slowest_keywords_page, name='slowest-keywords'),
+    path('applications/<int:pk>/keywords/timings/', views.keyword_timings, name='keyword-timings'),
+    # A JSON list of the tests with the longest mean duration and their duration percentiles. Query parameters:
+    # ``days`` (the window, 30 by default) and ``limit``.
+    path('applications/<int:pk>/tests/slowest/', views.slowest_tests_data, name='slowest-tests'),
+    # The daily pass rate, durations and flakiness of an application, as a page and as JSON, read from its daily
+    # rollups. Query parameters: ``days``, and ``suite`` or ``test`` (a primary key) to narrow the trend down.
+    path('applications/<int:pk>/trends/', views.application_trends_page, name='trends'),
+    path('applications/<int:pk>/trends/data/', views.application_trends, name='trends-data'),
+    # Full-text search over test names, documentation, suite names and tags. Query parameters: ``q`` (the words to
+    # find), ``app`` (optional application primary key) and ``limit``.
+    path('search/', views.search, name='search'),
+    path('search/results/', views.search_results, name='search-results'),
     path('tests/<int:pk>/run', views.run_test, name='run-test'),
     path('suites/<int:pk>/run', views.run_suite, name='run-suite'),
+    # Run again only the tests whose latest result failed, merging the results into the run they failed in.
+    path('suites/<int:pk>/rerun-failed', views.rerun_failed_suite, name='rerun-failed-suite'),
+    path('applications/<int:pk>/rerun-failed', views.rerun_failed_application, name='rerun-failed-application'),
+    # Run only the tests affected by the changes in the posted git ``commit_range``, answering with what was selected.
+    path('applications/<int:pk>/run-impacted', views.run_impacted, name='run-impacted'),
+    # A JSON report of the robot run capacity of this host: running and queued runs, limits and rejections.
+    path('capacity/', views.capacity, name='capacity'),
+    # A JSON report of how far a robot execution is and when it is expected to finish, cheap enough to poll.
+    path('executions/<int:pk>/progress', views.execution_progress, name='execution-progress'),
+    # What changed since another execution (the ``base`` query parameter, the previous one by default): newly failed,
+    # fixed, slower and faster tests, as a page and as JSON (``download`` sends it as a file).
+    path('executions/<int:pk>/compare/', views.execution_comparison_page, name='execution-comparison'),
+    path('executions/<int:pk>/compare/data/', views.execution_comparison, name='execution-comparison-data'),
+    # The logs, reports and other files of a robot execution, with ETag, gzip Content-Encoding and byte range support.
+    path('executions/<int:pk>/artifacts/<path:name>', views.artifact, name='artifact'),
+    # A lazy viewer for the log of a robot execution, and the JSON listing of one page of the children of a suite, test
+    # or keyword of the log index (query parameters ``parent``, ``offset`` and ``limit``) that it expands the log with.
+    path('executions/<int:pk>/log/', views.log_viewer, name='log-viewer'),
+    path('executions/<int:pk>/log/children/', views.log_children, name='log-children'),
     # This view will be displayed when a test run is submitted successfully.
     path('success', views.run_success, name='run-success'),
 ]
@@ -1,9 +1,32 @@
+import os
+import re
+from datetime import timedelta
+
+from django.db.models import Min, Q
 from django.shortcuts import get_object_or_404, render, reverse
+from django.utils import timezone
+from django.utils.http import urlencode
 from django.views import generic
-from django.http import HttpResponseRedirect
-from .models import RobotApplicationUnderTest, RobotTestSuite, RobotTest
+from django.http import Http404, HttpResponse, HttpResponseNotModified, HttpResponseRedirect, JsonResponse, \
+    StreamingHttpResponse
+from .models import RobotApplicationUnderTest, RobotArtifact, RobotExecution, RobotTestSuite, RobotTest
+from .search import search_tests
 
+from robotapi.artifacts import open_blob
+from robotapi.compare import compare_executions, previous_execution
+from robotapi.estimates import duration_estimates
+from robotapi.durations import duration_percentiles, slowest_tests
+from robotapi import metrics
+from robotapi.admission import admission_status
+from robotapi.exceptions import RobotAdmissionException, RobotExecutionException
 from robotapi.execute import RobotExecutionEngine
+from robotapi.flakiness import quarantined_tests
+from robotapi.keywords import tests_using_keyword
+from robotapi.locks import plan_shards, test_resources
+from robotapi.logindex import LogIndex, index_path, node_messages
+from robotapi.profiler import slowest_keywords
+from robotapi.rollups import flakiest_tests, trends
+from robotapi.tags import select_tests
 
 
 def index(request):
@@ -28,26 +51,31 @@ class ApplicationDetailView(generic.DetailView):
 class SuiteListView(generic.ListView):
     template_name = 'testrunner/suite_list.html'
     context_object_name = 'suites'
+    paginate_by = 50
     application = None
     parent = None
 
     def get_queryset(self):
         parent_verbose = self.request.GET.get('parent')
         self.application = get_object_or_404(RobotApplicationUnderTest, pk=self.kwargs['pk'])
-        try:
-            self.parent = [suite for suite in RobotTestSuite.objects.all()
-                           if suite.verbose_name.lower() == parent_verbose.lower()][0]
-        except (AttributeError, IndexError):
-            self.parent = RobotTestSuite.objects.get(parent=None, application=self.application)
-        active_app_suites = RobotTestSuite.objects.filter(active=True,
-                                                          application=self.application,
-                                                          parent=self.parent)
+        app_suites = RobotTestSuite.objects.filter(application=self.application)
+        self.parent = None
+        if parent_verbose:
+            # Display names are matched case-insensitively, but try the indexed exact match first.
+            self.parent = (app_suites.filter(full_name=parent_verbose).first() or
+                           app_suites.filter(full_name__iexact=parent_verbose).first())
+        if self.parent is None:
+            self.parent = app_suites.filter(parent=None).first()
+        active_app_suites = (RobotTestSuite.objects.with_child_counts()
+                             .filter(active=True, application=self.application, parent=self.parent)
+                             .order_by('name', 'pk'))
         return active_app_suites
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['app'] = self.application
         context['parent'] = self.parent
+        context['page_query'] = urlencode({'parent': self.parent.verbose_name}) + '&' if self.parent else ''
         return context
 
 
@@ -55,24 +83,31 @@ class SuiteDetailView(generic.DetailView):
     model = RobotTestSuite
     template_name = 'testrunner/suite.html'
 
+    def get_queryset(self):
+        return RobotTestSuite.objects.select_related('application').filter(application_id=self.kwargs['app_id'])
+
 
 class TestListView(generic.ListView):
     template_name = 'testrunner/test_list.html'
     context_object_name = 'tests'
+    paginate_by = 50
     application = None
     test_suite = None
 
     def get_queryset(self):
-        self.test_suite = get_object_or_404(RobotTestSuite, pk=self.kwargs['pk'])
+        self.test_suite = get_object_or_404(RobotTestSuite.objects.select_related('application'),
+                                            pk=self.kwargs['pk'],
+                                            application_id=self.kwargs['app_id'])
         self.application = self.test_suite.application
         active_suite_tests = RobotTest.objects.filter(active=True,
-                                                      robot_suite=self.test_suite)
+                                                      robot_suite=self.test_suite).order_by('name', 'pk')
         return active_suite_tests
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['app'] = self.application
         context['suite'] = self.test_suite
+        context['page_query'] = ''
         return context
 
 
@@ -80,19 +115,561 @@ class TestDetailView(generic.DetailView):
     model = RobotTest
     template_name = 'testrunner/test.html'
 
+    def get_queryset(self):
+        return RobotTest.objects.select_related('robot_suite__application').filter(
+            robot_suite_id=self.kwargs['suite_id'], robot_suite__application_id=self.kwargs['app_id'])
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['steps'] = self.object.robotteststep_set.order_by('order')
+        return context
+
+
+TREE_PAGE_SIZE = 50
+TREE_MAX_PAGE_SIZE = 200
+TREND_DEFAULT_DAYS = 30
+TREND_MAX_DAYS = 366
+MAX_PRIMARY_KEY = 2 ** 31 - 1
+
+
+def _bounded_int(value, default, minimum, maximum):
+    try:
+        return max(minimum, min(int(value), maximum))
+    except (TypeError, ValueError):
+        return default
+
+
+def suite_children(request, app_id, pk):
+    """
+    Return one page of the direct children of a test suite as JSON for the lazy-loading suite tree. Child suites come
+    first (ordered by name), followed by the suite's own tests, and ``offset``/``limit`` query parameters page through
+    that combined sequence. Every child suite carries the number of its own child suites and tests so the tree can
+    tell which nodes are expandable without fetching them.
+    """
+    suite = get_object_or_404(RobotTestSuite.objects.with_child_counts(), pk=pk, application_id=app_id)
+    offset = _bounded_int(request.GET.get('offset'), 0, 0, suite.child_suite_count + suite.test_count)
+    limit = _bounded_int(request.GET.get('limit'), TREE_PAGE_SIZE, 1, TREE_MAX_PAGE_SIZE)
+    child_suites = list()
+    if offset < suite.child_suite_count:
+        child_suites = (RobotTestSuite.objects.with_child_counts()
+                        .filter(parent=suite, active=True)
+                        .order_by('name', 'pk')[offset:offset + limit])
+    tests = list()
+    remaining = limit - len(child_suites)
+    test_offset = max(0, offset - suite.child_suite_count)
+    if remaining > 0 and test_offset < suite.test_count:
+        tests = (RobotTest.objects.filter(robot_suite=suite, active=True)
+                 .order_by('name', 'pk')[test_offset:test_offset + remaining])
+    next_offset = offset + len(child_suites) + len(tests)
+    return JsonResponse({
+        'id': suite.pk,
+        'child_suite_count': suite.child_suite_count,
+        'test_count': suite.test_count,
+        'offset': offset,
+        'next_offset': next_offset if next_offset < suite.child_suite_count + suite.test_count else None,
+        'suites': [{'id': s.pk,
+                    'name': s.name,
+                    'url': reverse('testrunner:suite-detail', args=(app_id, s.pk)),
+                    'children_url': reverse('testrunner:suite-children', args=(app_id, s.pk)),
+                    'child_suite_count': s.child_suite_count,
+                    'test_count': s.test_count} for s in child_suites],
+        'tests': [{'id': t.pk,
+                   'name': t.name,
+                   'url': reverse('testrunner:test-detail', args=(app_id, suite.pk, t.pk))} for t in tests],
+    })
+
+
+SEARCH_RESULT_LIMIT = 50
+
+
+def _search(request):
+    query = request.GET.get('q', '').strip()
+    application = None
+    if request.GET.get('app'):
+        application = get_object_or_404(RobotApplicationUnderTest, pk=_bounded_int(request.GET.get('app'), 0, 0,
+                                                                                     MAX_PRIMARY_KEY))
+    limit = _bounded_int(request.GET.get('limit'), SEARCH_RESULT_LIMIT, 1, TREE_MAX_PAGE_SIZE)
+    return query, application, search_tests(query, application=application, limit=limit)
+
+
+def search(request):
+    """Search the tests of every application (or of the one given by ``app``) for the words in ``q``."""
+    template_name = 'testrunner/search.html'
+    query, application, results = _search(request)
+    return render(request, template_name=template_name, context={'query': query,
+                                                                 'app': application,
+                                                                 'results': results})
+
+
+def search_results(request):
+    """The JSON version of the search page, with results ranked best first."""
+    query, application, results = _search(request)
+    return JsonResponse({
+        'query': query,
+        'results': [{'id': t.pk,
+                     'name': t.name,
+                     'suite': t.robot_suite.verbose_name,
+                     'documentation': t.documentation,
+                     'url': reverse('testrunner:test-detail', args=(t.robot_suite.application_id, t.robot_suite_id,
+                                                                    t.pk))} for t in results],
+    })
+
+
+def tag_preview(request, pk):
+    """
+    Preview which tests a run with the given ``include`` and ``exclude`` tag patterns (both may be repeated) would
+    execute, evaluated against the tags recorded at discovery. An optional ``suite`` narrows the preview to that suite
+    and its children. Returns the number of matching tests and one page (``offset``/``limit``) of them as JSON.
+    """
+    application = get_object_or_404(RobotApplicationUnderTest, pk=pk)
+    tests = RobotTest.objects.filter(robot_suite__application=application)
+    if request.GET.get('suite'):
+        suite = get_object_or_404(RobotTestSuite, application=application,
+                                  pk=_bounded_int(request.GET.get('suite'), 0, 0, MAX_PRIMARY_KEY))
+        tests = tests.filter(Q(robot_suite=suite) | Q(robot_suite__full_name__startswith=suite.full_name + '.'))
+    selected = select_tests(application,
+                            include=request.GET.getlist('include'),
+                            exclude=request.GET.getlist('exclude'),
+                            tests=tests)
+    count = selected.count()
+    offset = _bounded_int(request.GET.get('offset'), 0, 0, count)
+    limit = _bounded_int(request.GET.get('limit'), TREE_PAGE_SIZE, 1, TREE_MAX_PAGE_SIZE)
+    page = selected.select_related('robot_suite').order_by('robot_suite__full_name', 'name')[offset:offset + limit]
+    return JsonResponse({
+        'include': request.GET.getlist('include'),
+        'exclude': request.GET.getlist('exclude'),
+        'count': count,
+        'offset': offset,
+        'tests': [{'id': t.pk,
+                   'name': t.verbose_name,
+                   'url': reverse('testrunner:test-detail', args=(pk, t.robot_suite_id, t.pk))} for t in page],
+    })
+
+
+MAX_SHARDS = 64
+
+
+def test_shards(request, pk):
+    """
+    Split the tests of an application that the ``include``/``exclude`` tag patterns select over ``count`` shards to run
+    in parallel, as JSON. Tests sharing a resource (a lock:<name> tag) are kept in one shard, so they never run at the
+    same time, and the expected durations of the shards are balanced. Quarantined tests are left out, as in suite and
+    application runs.
+    """
+    application = get_object_or_404(RobotApplicationUnderTest, pk=pk)
+    tests = select_tests(application, request.GET.getlist('include'), request.GET.getlist('exclude'))
+    tests = tests.exclude(pk__in=quarantined_tests(tests))
+    shards = plan_shards(duration_estimates(tests), test_resources(tests),
+                         _bounded_int(request.GET.get('count'), 2, 1, MAX_SHARDS))
+    names = {t.pk: t.verbose_name for t in tests.select_related('robot_suite')}
+    return JsonResponse({
+        'shards': [{'tests': [names[pk] for pk in shard['tests']],
+                    'resources': sorted(shard['resources']),
+                    'expected_duration': shard['expected_duration']} for shard in shards],
+    })
+
+
+def keyword_usage(request, pk):
+    """
+    List the tests of an application that run the ``keyword`` query parameter, directly or through user keywords, as
+    recorded at discovery. Returns the number of tests and one page (``offset``/``limit``) of them as JSON, each with
+    the shallowest depth at which it calls the keyword.
+    """
+    application = get_object_or_404(RobotApplicationUnderTest, pk=pk)
+    keyword = request.GET.get('keyword', '').strip()
+    tests = tests_using_keyword(application, keyword) if keyword else RobotTest.objects.none()
+    count = tests.count()
+    offset = _bounded_int(request.GET.get('offset'), 0, 0, count)
+    limit = _bounded_int(request.GET.get('limit'), TREE_PAGE_SIZE, 1, TREE_MAX_PAGE_SIZE)
+    page = (tests.select_related('robot_suite').annotate(depth=Min('keyword_usage__depth'))
+            .order_by('robot_suite__full_name', 'name')[offset:offset + limit])
+    return JsonResponse({
+        'keyword': keyword,
+        'count': count,
+        'offset': offset,
+        'tests': [{'id': t.pk,
+                   'name': t.verbose_name,
+                   'depth': t.depth,
+                   'url': reverse('testrunner:test-detail', args=(pk, t.robot_suite_id, t.pk))} for t in page],
+    })
+
+
+KEYWORD_TIMING_ORDERS = ('total', 'p95', 'p50', 'max', 'calls')
+
+
+def _keyword_timing_options(request):
+    order = request.GET.get('order', 'total')
+    return (order if order in KEYWORD_TIMING_ORDERS else 'total',
+            _bounded_int(request.GET.get('limit'), TREE_PAGE_SIZE, 1, TREE_MAX_PAGE_SIZE))
+
+
+def keyword_timings(request, pk):
+    """
+    List the keywords of an application that took the most time across its runs as JSON, ordered by the ``order``
+    query parameter: ``total`` (default), ``p95``, ``p50``, ``max`` or ``calls``. Durations are in seconds.
+    """
+    application = get_object_or_404(RobotApplicationUnderTest, pk=pk)
+    order, limit = _keyword_timing_options(request)
+    return JsonResponse({
+        'order': order,
+        'keywords': [{'keyword': t.keyword,
+                      'calls': t.call_count,
+                      'total': t.total_duration,
+                      'mean': t.mean_duration,
+                      'p50': t.p50_duration,
+                      'p95': t.p95_duration,
+                      'max': t.max_duration} for t in slowest_keywords(application, order, limit)],
+    })
+
+
+def slowest_keywords_page(request, pk):
+    application = get_object_or_404(RobotApplicationUnderTest, pk=pk)
+    order, limit = _keyword_timing_options(request)
+    return render(request, 'testrunner/slowest_keywords.html',
+                  context={'app': application, 'order': order, 'orders': KEYWORD_TIMING_ORDERS,
+                           'timings': list(slowest_keywords(application, order, limit))})
+
+
+def slowest_tests_data(request, pk):
+    """
+    List the tests of an application with the longest mean duration over the runs of the last ``days`` days (the
+    query parameter, 30 by default) as JSON, with their median, 95th and 99th percentile. Durations are in milliseconds.
+    """
+    application = get_object_or_404(RobotApplicationUnderTest, pk=pk)
+    days = _bounded_int(request.GET.get('days'), TREND_DEFAULT_DAYS, 1, TREND_MAX_DAYS)
+    since = timezone.now() - timedelta(days=days)
+    tests = slowest_tests(application, since, limit=_bounded_int(request.GET.get('limit'), TREE_PAGE_SIZE, 1,
+                                                                 TREE_MAX_PAGE_SIZE))
+    percentiles = duration_percentiles(application, since, tests=[t['robot_test'] for t in tests])
+    return JsonResponse({
+        'days': days,
+        'tests': [{'test': t['robot_test'],
+                   'name': t['robot_test__name'],
+                   'runs': t['runs'],
+                   'mean': t['mean_ms'],
+                   'p50': percentiles[t['robot_test']][0.5],
+                   'p95': percentiles[t['robot_test']][0.95],
+                   'p99': percentiles[t['robot_test']][0.99],
+                   'max': t['max_ms']} for t in tests],
+    })
+
+
+def _trend_options(request, application):
+    """The number of days and the optional suite or test of the ``days``, ``suite`` and ``test`` query parameters."""
+    days = _bounded_int(request.GET.get('days'), TREND_DEFAULT_DAYS, 1, TREND_MAX_DAYS)
+    suite = test = None
+    if request.GET.get('test'):
+        test = get_object_or_404(RobotTest, pk=_bounded_int(request.GET['test'], 0, 0, MAX_PRIMARY_KEY),
+                                 robot_suite__application=application)
+    elif request.GET.get('suite'):
+        suite = get_object_or_404(RobotTestSuite, pk=_bounded_int(request.GET['suite'], 0, 0, MAX_PRIMARY_KEY),
+                                  application=application)
+    return days, suite, test
+
+
+def application_trends(request, pk):
+    """
+    The daily pass rate, run count, durations (in seconds) and flips of an application, or of the suite or test of the
+    ``suite`` or ``test`` query parameter, over the last ``days`` days, and its flakiest tests, as JSON.
+    """
+    application = get_object_or_404(RobotApplicationUnderTest, pk=pk)
+    days, suite, test = _trend_options(request, application)
+    return JsonResponse({
+        'days': days,
+        'suite': suite.pk if suite is not None else None,
+        'test': test.pk if test is not None else None,
+        'trend': [dict(d, day=d['day'].isoformat()) for d in trends(application, days, suite, test)],
+        'flakiest': [{'test': t['robot_test'],
+                      'name': t['robot_test__name'],
+                      'suite': t['robot_test__robot_suite__full_name'],
+                      'runs': t['runs'],
+                      'flips': t['flips']} for t in flakiest_tests(application, days)],
+    })
+
+
+def application_trends_page(request, pk):
+    application = get_object_or_404(RobotApplicationUnderTest, pk=pk)
+    days, suite, test = _trend_options(request, application)
+    return render(request, 'testrunner/trends.html',
+                  context={'app': application, 'days': days, 'suite': suite, 'test': test,
+                           'trend': trends(application, days, suite, test),
+                           'flakiest': list(flakiest_tests(application, days))})
+
+
+def _tag_options(request):
+    """Collect the non-blank include/exclude tag patterns submitted with a run request."""
+    options = dict()
+    for option in ('include', 'exclude'):
+        pattern = request.POST.get(option, '').strip()
+        if pattern:
+            options[option] = pattern
+    return options
+
+
+def _over_capacity(error):
+    """Reject a run submitted while the host is at capacity (see robotapi.admission)."""
+    response = HttpResponse(str(error), status=429, content_type='text/plain')
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def _run(engine):
+    try:
+        engine.run_subprocess()
+    except RobotAdmissionException as e:
+        return _over_capacity(e)
+    return HttpResponseRedirect(reverse('testrunner:run-success'))
+
 
 def run_test(request, pk):
     robot_test = get_object_or_404(RobotTest, pk=pk)
-    engine = RobotExecutionEngine(tests=[robot_test])   # Engine requires a list of RobotTest
-    engine.run_subprocess()
-    return HttpResponseRedirect(reverse('testrunner:run-success'))
+    return _run(RobotExecutionEngine(tests=[robot_test]))   # Engine requires a list of RobotTest
 
 
 def run_suite(request, pk):
     robot_suite = get_object_or_404(RobotTestSuite, pk=pk)
-    engine = RobotExecutionEngine(suites=[robot_suite])  # Engine requires a list of RobotTestSuite
-    engine.run_subprocess()
-    return HttpResponseRedirect(reverse('testrunner:run-success'))
+    return _run(RobotExecutionEngine(suites=[robot_suite], **_tag_options(request)))  # Engine requires a list
+
+
+def rerun_failed_suite(request, pk):
+    robot_suite = get_object_or_404(RobotTestSuite, pk=pk)
+    return _run(RobotExecutionEngine(suites=[robot_suite], rerun_failed=True))
+
+
+def rerun_failed_application(request, pk):
+    application = get_object_or_404(RobotApplicationUnderTest, pk=pk)
+    return _run(RobotExecutionEngine(application=application, rerun_failed=True))
+
+
+def run_impacted(request, pk):
+    """
+    Run only the tests of an application affected by the changes in the posted ``commit_range`` of the git repository
+    holding its tests, and report what was selected as JSON: the changed files, and the selected against the total
+    number of tests.
+    """
+    application = get_object_or_404(RobotApplicationUnderTest, pk=pk)
+    commit_range = request.POST.get('commit_range', '').strip()
+    try:
+        engine = RobotExecutionEngine(application=application, commit_range=commit_range, **_tag_options(request))
+        engine.run_subprocess()
+    except RobotAdmissionException as e:
+        response = JsonResponse({'commit_range': commit_range, 'error': str(e)}, status=429)
+        response['Retry-After'] = str(e.retry_after)
+        return response
+    except RobotExecutionException as e:
+        return JsonResponse({'commit_range': commit_range, 'error': str(e)}, status=400)
+    return JsonResponse({
+        'commit_range': commit_range,
+        'changed_files': engine.changed_files,
+        'selected': engine.selected_count,
+        'total': engine.total_count,
+        'tests': [t.verbose_name for t in engine.tests],
+    })
+
+
+def capacity(request):
+    """
+    Report the robot run capacity of this host as JSON: the running and queued runs, the limits, the available
+    memory and the number of rejected runs.
+    """
+    return JsonResponse(admission_status())
+
+
+def prometheus_metrics(request):
+    """
+    The metrics of this process in the Prometheus text format (see robotapi.metrics), with the run capacity of the
+    host read at scrape time.
+    """
+    status = admission_status()
+    metrics.ADMISSION_RUNNING.set(status['running'])
+    metrics.ADMISSION_QUEUED.set(status['queued'])
+    metrics.ADMISSION_REJECTED.set(status['rejected'])
+    return HttpResponse(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def execution_progress(request, pk):
+    """
+    Report the progress of a robot execution as JSON: its status, how many of the expected tests finished, the percent
+    complete and the estimated finish time. The execution keeps these up to date as robot runs (see
+    robotapi.estimates), so polling reads one row.
+    """
+    execution = get_object_or_404(RobotExecution, pk=pk)
+    return JsonResponse({
+        'id': execution.pk,
+        'status': execution.status,
+        'expected_tests': execution.expected_tests,
+        'completed_tests': execution.completed_tests,
+        'percent_complete': execution.percent_complete,
+        'start_time': execution.start_time,
+        'estimated_end': execution.end_time or execution.estimated_end,
+    })
+
+
+def _compared_executions(request, pk):
+    """The execution to compare with (the ``base`` query parameter, or the previous run) and the execution ``pk``."""
+    head = get_object_or_404(RobotExecution, pk=pk)
+    if request.GET.get('base'):
+        base = get_object_or_404(RobotExecution, pk=_bounded_int(request.GET['base'], 0, 0, MAX_PRIMARY_KEY),
+                                 application=head.application_id)
+    else:
+        base = previous_execution(head)
+    return base, head
+
+
+def execution_comparison(request, pk):
+    """
+    Compare a robot execution with the execution of the ``base`` query parameter, or with the previous execution of
+    its application, as JSON: the tests that newly failed, got fixed, got slower or faster, were added or removed.
+    Durations are in milliseconds. With ``download``, the JSON is sent as a file attachment.
+    """
+    base, head = _compared_executions(request, pk)
+    if base is None:
+        return JsonResponse({'head': head.pk, 'error': 'There is no earlier execution to compare with.'}, status=404)
+    response = JsonResponse(dict(compare_executions(base, head), base=base.pk, head=head.pk))
+    if 'download' in request.GET:
+        response['Content-Disposition'] = 'attachment; filename="comparison-{b}-{h}.json"'.format(b=base.pk, h=head.pk)
+    return response
+
+
+def execution_comparison_page(request, pk):
+    base, head = _compared_executions(request, pk)
+    return render(request, 'testrunner/comparison.html',
+                  context={'base': base, 'head': head,
+                           'comparison': compare_executions(base, head) if base is not None else None})
+
+
+ARTIFACT_CHUNK_SIZE = 64 * 1024
+BYTE_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _byte_range(header, size):
+    """
+    Parse a Range header asking for a single range of content ``size`` bytes long.
+    :return: the first and last byte position, None if the header is absent or is to be ignored (e.g. several ranges),
+    or False if the range cannot be satisfied.
+    """
+    match = BYTE_RANGE.match(header.replace(' ', '')) if header else None
+    if match is None or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        return (max(size - int(last), 0), size - 1) if int(last) and size else False
+    if last and int(last) < int(first):
+        return None
+    if int(first) >= size:
+        return False
+    return int(first), (min(int(last), size - 1) if last else size - 1)
+
+
+def _read(stream, start, length):
+    with stream:
+        stream.seek(start)
+        while length > 0:
+            block = stream.read(min(ARTIFACT_CHUNK_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+
+
+def artifact(request, pk, name):
+    """
+    Serve an artifact of a robot execution from the artifact store (see robotapi.artifacts). Clients accepting gzip
+    get the stored compressed content as is, with Content-Encoding: gzip; others get it decompressed. Each of the two
+    representations has its own ETag, derived from the content hash, and supports conditional and single byte range
+    requests, so a large log can be fetched in parts.
+    """
+    stored = get_object_or_404(RobotArtifact.objects.select_related('blob'), execution_id=pk, name=name)
+    blob = stored.blob
+    gzipped = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+    etag = '"{digest}{suffix}"'.format(digest=blob.digest, suffix='-gzip' if gzipped else '')
+    size = blob.stored_size if gzipped else blob.size
+    if etag in [t.strip() for t in request.META.get('HTTP_IF_NONE_MATCH', '').split(',')]:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+    byte_range = None
+    if request.META.get('HTTP_IF_RANGE', etag) == etag:
+        byte_range = _byte_range(request.META.get('HTTP_RANGE'), size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = 'bytes */{size}'.format(size=size)
+        return response
+    start, end = byte_range or (0, size - 1)
+    response = StreamingHttpResponse(_read(open_blob(blob, decompress=not gzipped), start, end - start + 1),
+                                     status=206 if byte_range else 200,
+                                     content_type=stored.content_type)
+    response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Vary'] = 'Accept-Encoding'
+    if gzipped:
+        response['Content-Encoding'] = 'gzip'
+    if byte_range:
+        response['Content-Range'] = 'bytes {start}-{end}/{size}'.format(start=start, end=end, size=size)
+    return response
+
+
+LOG_MESSAGE_LIMIT = 500
+
+
+def log_viewer(request, pk):
+    execution = get_object_or_404(RobotExecution.objects.select_related('application'), pk=pk)
+    indexed = bool(execution.output_file) and os.path.isfile(index_path(execution.output_file))
+    return render(request, 'testrunner/log.html', context={'execution': execution, 'indexed': indexed})
+
+
+def log_children(request, pk):
+    """
+    Return one page of the children of a suite, test or keyword of a run's log as JSON, for the lazy log viewer: the
+    root suite when no ``parent`` (node number in the log index) is given, otherwise the suites, tests and keywords
+    directly inside that node in the order robot ran them. ``offset``/``limit`` page through the children. The first
+    page for a keyword also holds the messages it logged directly, read from its own part of the output.xml.
+    """
+    execution = get_object_or_404(RobotExecution, pk=pk)
+    if not execution.output_file:
+        raise Http404('Execution {pk} has no log.'.format(pk=pk))
+    try:
+        index = LogIndex(execution.output_file)
+    except OSError:
+        raise Http404('The log of execution {pk} is not indexed.'.format(pk=pk))
+    with index:
+        parent_number = _bounded_int(request.GET.get('parent'), None, 0, index.count)
+        parent = None
+        if parent_number is not None:
+            parent = index.node(parent_number)
+            if parent is None:
+                raise Http404('The log of execution {pk} has no node {n}.'.format(pk=pk, n=parent_number))
+            count = parent.child_count
+        else:
+            count = index.root_count
+        offset = _bounded_int(request.GET.get('offset'), 0, 0, count)
+        limit = _bounded_int(request.GET.get('limit'), TREE_PAGE_SIZE, 1, TREE_MAX_PAGE_SIZE)
+        nodes = index.children(parent, offset, limit)
+    messages = list()
+    if parent is not None and parent.kind == 'keyword' and offset == 0 and execution.output_file:
+        try:
+            messages = node_messages(execution.output_file, parent, LOG_MESSAGE_LIMIT)
+        except OSError:
+            pass
+    children_url = reverse('testrunner:log-children', args=(pk,))
+    next_offset = offset + len(nodes)
+    return JsonResponse({
+        'parent': parent_number,
+        'count': count,
+        'offset': offset,
+        'next_offset': next_offset if next_offset < count else None,
+        'nodes': [{'number': n.number,
+                   'kind': n.kind,
+                   'keyword_type': n.keyword_type,
+                   'name': n.name,
+                   'status': n.status,
+                   'start_time': n.start_time,
+                   'end_time': n.end_time,
+                   'child_count': n.child_count,
+                   'children_url': children_url + '?' + urlencode({'parent': n.number})} for n in nodes],
+        'messages': messages,
+    })
 
 
 def run_success(request):
@@ -0,0 +1,6 @@
+LOGIN_URL = 'http://localhost:7272/'
+WELCOME_URL = 'http://localhost:7272/welcome.html'
+ERROR_URL = 'http://localhost:7272/error.html'
+BROWSER = 'Firefox'
+VALID_USER = 'demo'
+VALID_PASSWORD = 'mode'
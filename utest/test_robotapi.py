@@ -1,11 +1,43 @@
+import json
 import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+from datetime import timedelta
+
 from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from robot.api import ExecutionResult
+from robot.model.tags import TagPatterns
 from robot.parsing.model import TestDataDirectory
 
-from testrunner.models import RobotApplicationUnderTest, RobotTestSuite, RobotTest
+from testrunner.models import RobotApplicationUnderTest, RobotTestSuite, RobotTest, RobotTag, RobotTestStep, \
+    RobotExecution, RobotHost, RobotTestRun, RobotArtifact, RobotArtifactBlob, RobotKeywordTiming, \
+    RobotApplicationDailyRollup, RobotSuiteDailyRollup, RobotTestDailyRollup
+from robotapi.artifacts import blob_path, prune_artifacts, store_artifacts
+from robotapi import histograms, metrics
+from robotapi.admission import admit_execution, capacity_problem, rejected_runs
+from robotapi.collector import ResultCollector
+from robotapi.durations import duration_percentiles, slowest_tests
 from robotapi.discover import DiscoveredRobotTest, DiscoveredRobotTestSuite, DiscoveredRobotApplication
-from robotapi.exceptions import RobotDiscoveryException, RobotExecutionException
+from robotapi.estimates import duration_estimates, start_progress, update_duration_estimates, update_progress
+from robotapi.exceptions import RobotAdmissionException, RobotDiscoveryException, RobotExecutionException
+from robotapi.flakiness import flakiness_scores, quarantined_tests, update_quarantine
 from robotapi.execute import RobotExecutionEngine
+from robotapi.impact import changed_files, impacted_tests
+from robotapi.processes import process_group_alive, reap_executions
+from robotapi.profiler import KeywordTimings, slowest_keywords
+from robotapi.retention import compact_test_runs
+from robotapi.rollups import backfill_rollups, flakiest_tests, rollup_results, trends
+from robotapi.keywords import suites_depending_on, tests_using_keyword
+from robotapi.locks import acquire_resources, plan_shards, release_resources, test_resources
+from robotapi.logindex import LogIndex, index_path, node_messages
+from robotapi.tags import select_tests
+from robotapi.workspace import SCRATCH_ROOT, artifact_dir, clean_scratch, create_scratch_dir
+from testrunner.cache import catalog_version
+from testrunner.search import search_tests
 
 from robotweb.settings import BASE_DIR
 
@@ -374,6 +406,553 @@ class TestConfiguration(TransactionTestCase):
                 self.assertIsNotNone(test_info.get(test.name))
                 self.assertEqual(test.documentation, test_info.get(test.name)['Doc'])
 
+    def test_configure_robot_app_loads_tags(self):
+        discovered_app = DiscoveredRobotApplication(self.test_robot_app)
+        discovered_app.discover_suites_and_tests()
+        discovered_app.configure_suites_and_tests()
+
+        def tags_of(test_name):
+            return sorted(t.name for t in RobotTest.objects.get(name=test_name).robot_tags.all())
+        self.assertEqual(tags_of('My Test'), ['api', 'smoke'])     # Force Tags plus Default Tags
+        self.assertEqual(tags_of('Another Test'), ['Auth_Login', 'regression', 'smoke'])    # [Tags] override defaults
+        self.assertEqual(tags_of('Division'), ['calculator'])     # Force Tags inherited from __init__.robot
+        self.assertEqual(tags_of('Valid Login'), [])
+        sub_directory = RobotTestSuite.objects.get(full_name='TestRobotAppSuite.RobotAppSubDirectory')
+        self.assertEqual([t.name for t in sub_directory.robot_tags.all()], ['calculator'])
+        discovered_app.configure_suites_and_tests()     # Reconfiguring replaces the tags rather than duplicating them
+        self.assertEqual(tags_of('Another Test'), ['Auth_Login', 'regression', 'smoke'])
+        self.assertEqual(RobotTag.objects.filter(application=self.test_robot_app).count(), 5)
+        quarantined = RobotTag.objects.create(name='quarantined', application=self.test_robot_app)
+        RobotTest.objects.get(name='Valid Login').robot_tags.add(quarantined)
+        discovered_app.configure_suites_and_tests()     # The quarantine of flaky tests is not part of their source
+        self.assertEqual(tags_of('Valid Login'), ['quarantined'])
+
+    def test_configure_robot_app_indexes_tests_for_search(self):
+        discovered_app = DiscoveredRobotApplication(self.test_robot_app)
+        discovered_app.discover_suites_and_tests()
+        discovered_app.configure_suites_and_tests()
+        results = search_tests('template invalid password', application=self.test_robot_app)
+        self.assertEqual([t.verbose_name for t in results],
+                         ['TestRobotAppSuite.RobotAppSubDirectory.TemplateSubSuite.Invalid Password',
+                          'TestRobotAppSuite.RobotAppSubDirectory.TemplateSubSuite.Invalid Username And Password'])
+
+
+    def test_configure_robot_app_loads_steps_and_keyword_usage(self):
+        discovered_app = DiscoveredRobotApplication(self.test_robot_app)
+        discovered_app.discover_suites_and_tests()
+        discovered_app.configure_suites_and_tests()
+        steps = RobotTestStep.objects.filter(robot_test__name='Valid Login').order_by('order')
+        self.assertEqual([(s.keyword, s.arguments) for s in steps],
+                         [('Open Browser To Login Page', ''), ('Input Username', 'demo'), ('Input Password', 'mode'),
+                          ('Submit Credentials', ''), ('Welcome Page Should Be Open', '')])
+        templated = RobotTestStep.objects.get(robot_test__name='Invalid Password')
+        self.assertEqual((templated.keyword, templated.arguments),
+                         ('Login With Invalid Credentials Should Fail', '${VALID USER}\ninvalid'))
+
+        def users_of(keyword):
+            return sorted(t.name for t in tests_using_keyword(self.test_robot_app, keyword))
+        # Reached through the resource file, the suite's own keywords, the Test Setup and BDD prefixes
+        self.assertEqual(users_of('Login Page Should Be Open'),
+                         ['Empty Password', 'Empty Username', 'Empty Username And Password', 'Invalid Password',
+                          'Invalid Username', 'Invalid Username And Password', 'Valid Login'])
+        self.assertEqual(users_of('input text'), users_of('Login Page Should Be Open'))
+        self.assertEqual(users_of('Push Button'), ['Addition'])
+        self.assertEqual(users_of('When user types "${expression}"'), ['Addition'])
+        self.assertEqual(users_of('Close Browser'), ['Valid Login'])
+        discovered_app.configure_suites_and_tests()     # Reconfiguring replaces the steps rather than duplicating them
+        self.assertEqual(RobotTestStep.objects.filter(robot_test__name='Valid Login').count(), 5)
+
+    def test_keyword_usage_is_a_single_query(self):
+        with self.assertNumQueries(1):
+            list(tests_using_keyword(self.test_robot_app, 'Open Browser'))
+
+
+    def test_configure_robot_app_records_dependencies(self):
+        discovered_app = DiscoveredRobotApplication(self.test_robot_app)
+        discovered_app.discover_suites_and_tests()
+        discovered_app.configure_suites_and_tests()
+
+        def dependents(*paths):
+            return sorted(s.verbose_name for s in suites_depending_on(self.test_robot_app, paths))
+        login_suites = ['TestRobotAppSuite.AppSubSuite1', 'TestRobotAppSuite.RobotAppSubDirectory.TemplateSubSuite']
+        self.assertEqual(dependents(SEP.join([TEST_ROBOT_APP_DIR, 'resource.robot'])), login_suites)
+        self.assertEqual(dependents(SEP.join([TEST_ROBOT_APP_DIR, 'login_variables.py'])), login_suites)
+        self.assertEqual(dependents('OperatingSystem'), ['TestRobotAppSuite.AppSubSuite2'])
+        self.assertEqual(dependents(SEP.join([TEST_ROBOT_APP_DIR, 'RobotAppSubDirectory', '__init__.robot'])),
+                         ['TestRobotAppSuite.RobotAppSubDirectory'])
+        template_suite = RobotTestSuite.objects.get(name='TemplateSubSuite')
+        self.assertEqual(sorted((d.kind, d.direct) for d in template_suite.dependency.all()),
+                         [('resource', True), ('variables', False)])
+
+    def test_rediscover_dependents_of_changed_resource(self):
+        discovered_app = DiscoveredRobotApplication(self.test_robot_app)
+        discovered_app.discover_suites_and_tests()
+        discovered_app.configure_suites_and_tests()
+        RobotTest.objects.filter(name='Valid Login').update(active=False)
+        RobotTestStep.objects.filter(robot_test__name__in=['Valid Login', 'My Test']).delete()
+        rediscovered = DiscoveredRobotApplication(self.test_robot_app).rediscover_dependents(
+            [SEP.join([TEST_ROBOT_APP_DIR, 'resource.robot'])])
+        self.assertEqual(sorted(s.name for s in rediscovered), ['AppSubSuite1', 'TemplateSubSuite'])
+        self.assertTrue(RobotTest.objects.get(name='Valid Login').active)
+        self.assertEqual(RobotTestStep.objects.filter(robot_test__name='Valid Login').count(), 5)
+        self.assertEqual(RobotTestStep.objects.filter(robot_test__name='My Test').count(), 0)  # Not a dependent
+        self.assertEqual(sorted(t.name for t in RobotTest.objects.get(name='Another Test').robot_tags.all()),
+                         ['Auth_Login', 'regression', 'smoke'])
+
+
+class TestTagSelection(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        print('\nRunning robotapi tag selection unit tests in: ' + HERE)
+        print('Dummy Robot test suite located here: ' + TEST_ROBOT_APP_DIR)
+        cls.test_robot_app = RobotApplicationUnderTest.objects.create(name='My Test Robot App',
+                                                                      description='An application created for testing '
+                                                                                  'RobotWeb tag selection.',
+                                                                      robot_location=HERE,
+                                                                      app_test_location=TEST_ROBOT_APP_DIR)
+        cls.discovered_app = DiscoveredRobotApplication(cls.test_robot_app)
+        cls.discovered_app.discover_suites_and_tests()
+        cls.discovered_app.configure_suites_and_tests()
+
+    def robot_selection(self, include, exclude):
+        """The tests Robot Framework itself would select from the discovered tags."""
+        include, exclude = TagPatterns(include), TagPatterns(exclude)
+        return sorted(s.name + '.' + t.name for s in self.discovered_app.test_suites for t in s.tests
+                      if (not include or include.match(t.tags)) and not exclude.match(t.tags))
+
+    def test_selection_matches_robot(self):
+        patterns = [(['smoke'], []),
+                    (['smokeANDapi'], []),
+                    (['smoke & regression'], []),
+                    (['auth login'], []),
+                    (['calc*'], []),
+                    (['calculatorNOTsmoke'], []),
+                    (['smokeORcalculator'], ['regression']),
+                    (['NOTsmoke'], []),
+                    ([], ['calculator', 'api']),
+                    (['?moke', 'regression'], ['auth*'])]
+        for include, exclude in patterns:
+            selected = select_tests(self.test_robot_app, include=include, exclude=exclude)
+            self.assertEqual(sorted(t.verbose_name for t in selected),
+                             self.robot_selection(include, exclude),
+                             msg='Unexpected selection for include {i} and exclude {e}'.format(i=include, e=exclude))
+
+    def test_selection_is_a_single_query(self):
+        with self.assertNumQueries(2):  # The tag vocabulary, then the selected tests
+            list(select_tests(self.test_robot_app, include='smokeORcalc*', exclude='regression'))
+
+
+class TestChangeImpact(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        print('\nRunning robotapi change impact unit tests in: ' + HERE)
+        # A copy of the dummy Robot test suite in its own git repository, with one commit changing the resource file
+        cls.repository = tempfile.mkdtemp()
+        cls.app_dir = SEP.join([cls.repository, 'TestRobotAppSuite'])
+        shutil.copytree(TEST_ROBOT_APP_DIR, cls.app_dir)
+        def git(*args):
+            subprocess.run(['git', '-C', cls.repository, '-c', 'user.name=robotweb',
+                            '-c', 'user.email=robotweb@localhost'] + list(args), check=True)
+        git('init', '-q')
+        git('add', '.')
+        git('commit', '-q', '-m', 'Add tests')
+        with open(SEP.join([cls.app_dir, 'resource.robot']), 'a') as resource:
+            resource.write('\nClose Login Page\n    Close Browser\n')
+        git('commit', '-q', '-a', '-m', 'Change the resource file')
+        cls.test_robot_app = RobotApplicationUnderTest.objects.create(name='My Changed Robot App',
+                                                                      robot_location='robot',
+                                                                      app_test_location=cls.app_dir)
+        discovered_app = DiscoveredRobotApplication(cls.test_robot_app)
+        discovered_app.discover_suites_and_tests()
+        discovered_app.configure_suites_and_tests()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.repository, ignore_errors=True)
+
+    def impacted(self, *paths):
+        return sorted(t.name for t in impacted_tests(self.test_robot_app, [SEP.join([self.app_dir, p]) for p in paths]))
+
+    def test_changed_files_in_commit_range(self):
+        self.assertEqual(changed_files(self.app_dir, 'HEAD~1..HEAD'), [SEP.join([self.app_dir, 'resource.robot'])])
+
+    def test_invalid_commit_range_raises(self):
+        with self.assertRaisesMessage(RobotExecutionException, 'Invalid commit range: --output=x'):
+            changed_files(self.app_dir, '--output=x')
+
+    def test_impacted_tests_follow_imports_and_child_suites(self):
+        login_tests = ['Empty Password', 'Empty Username', 'Empty Username And Password', 'Invalid Password',
+                       'Invalid Username', 'Invalid Username And Password', 'Valid Login']
+        self.assertEqual(self.impacted('resource.robot'), login_tests)
+        self.assertEqual(self.impacted('login_variables.py'), login_tests)
+        self.assertEqual(self.impacted('AppSubSuite2.robot'), ['Another Test', 'My Test'])
+        self.assertEqual(self.impacted(SEP.join(['RobotAppSubDirectory', 'NestedChildSuite', '__init__.robot'])),
+                         ['Addition'])
+        self.assertEqual(self.impacted('README.md'), [])
+
+    def test_engine_selects_changed_tests(self):
+        engine = RobotExecutionEngine(application=self.test_robot_app, commit_range='HEAD~1..HEAD')
+        engine.select_changed_tests()
+        self.assertEqual((engine.selected_count, engine.total_count), (7, 15))
+        self.assertIn('TestRobotAppSuite.AppSubSuite1.Valid Login', [t.verbose_name for t in engine.tests])
+
+    def test_commit_range_requires_an_application(self):
+        with self.assertRaisesMessage(RobotExecutionException, 'Tests can only be selected from a commit range for a '
+                                                               'whole application.'):
+            RobotExecutionEngine(tests=list(RobotTest.objects.all()[:1]), commit_range='HEAD~1..HEAD')
+
+
+class TestRunTimeouts(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        print('\nRunning robotapi run timeout unit tests in: ' + HERE)
+        cls.suite_dir = tempfile.mkdtemp()
+        with open(SEP.join([cls.suite_dir, 'Slow.robot']), 'w') as suite:
+            suite.write('*** Test Cases ***\nHangs\n    Run Process    sleep    60\n\n'
+                        '*** Settings ***\nLibrary    Process\n')
+        cls.slow_app = RobotApplicationUnderTest.objects.create(name='My Slow Robot App',
+                                                                robot_location='robot',
+                                                                app_test_location=cls.suite_dir,
+                                                                run_timeout=3)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.suite_dir, ignore_errors=True)
+
+    def test_run_is_stopped_after_application_timeout(self):
+        robot = RobotExecutionEngine(application=self.slow_app, outputdir=self.suite_dir)
+        robot.KILL_GRACE_PERIOD = 2
+        started = time.time()
+        robot.run_subprocess()
+        self.assertLess(time.time() - started, 20)
+        self.assertTrue(robot.timed_out)
+        self.assertEqual(robot.execution.status, 'timed out')
+        self.assertFalse(process_group_alive(robot.execution.pid), msg='Processes started by robot are still running.')
+
+    def test_reap_overdue_execution(self):
+        orphan = subprocess.Popen(['sleep', '60'], start_new_session=True)
+        self.addCleanup(orphan.wait)
+        execution = RobotExecution.objects.create(application=self.slow_app, status='in progress',
+                                                  host=socket.gethostname(), pid=orphan.pid,
+                                                  deadline=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(reap_executions(), [execution])
+        self.assertEqual(orphan.wait(timeout=5), -9)
+        execution.refresh_from_db()
+        self.assertEqual(execution.status, 'timed out')
+
+    def test_reap_execution_whose_worker_died_before_robot_started(self):
+        worker = subprocess.Popen(['true'])
+        worker.wait()
+        admitted = RobotExecution.objects.create(application=self.slow_app, status='in progress',
+                                                 host=socket.gethostname(), worker_pid=worker.pid)
+        waiting = RobotExecution.objects.create(application=self.slow_app, status='waiting',
+                                                host=socket.gethostname(), worker_pid=worker.pid)
+        acquire_resources(waiting, ['sleeper'])
+        alive = RobotExecution.objects.create(application=self.slow_app, status='queued', host=socket.gethostname(),
+                                              worker_pid=os.getpid())
+        self.assertEqual(sorted(reap_executions(), key=lambda e: e.pk), [admitted, waiting])
+        self.assertEqual([e.status for e in RobotExecution.objects.filter(pk__in=[admitted.pk, waiting.pk, alive.pk])
+                          .order_by('pk')], ['error', 'error', 'queued'])
+        self.assertFalse(waiting.resource_lock.exists())
+
+
+class TestEstimates(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        print('\nRunning robotapi duration estimate unit tests in: ' + HERE)
+        cls.app = RobotApplicationUnderTest.objects.create(name='My Estimated Robot App', robot_location='robot',
+                                                           app_test_location=TEST_ROBOT_APP_DIR)
+        suite = RobotTestSuite.objects.create(name='Suite', application=cls.app, parent=None)
+        cls.fast = RobotTest.objects.create(name='Fast', robot_suite=suite)
+        cls.slow = RobotTest.objects.create(name='Slow', robot_suite=suite)
+        cls.new = RobotTest.objects.create(name='New', robot_suite=suite)
+
+    def test_estimates_are_moving_averages(self):
+        update_duration_estimates({self.fast.pk: 2, self.slow.pk: 20})
+        update_duration_estimates({self.fast.pk: 12})
+        self.fast.refresh_from_db()
+        self.assertAlmostEqual(self.fast.duration_estimate, 0.3 * 12 + 0.7 * 2)
+        estimates = duration_estimates(RobotTest.objects.filter(robot_suite__application=self.app))
+        self.assertAlmostEqual(estimates[self.new.pk], (self.fast.duration_estimate + 20) / 2)
+
+    def test_estimated_end_follows_the_pace_of_the_run(self):
+        start = timezone.now()
+        execution = RobotExecution.objects.create(application=self.app, status='in progress', start_time=start)
+        start_progress(execution, {self.fast.pk: 10, self.slow.pk: 30})
+        self.assertEqual(execution.estimated_end, start + timedelta(seconds=40))
+        update_progress(execution, 1, 10, now=start + timedelta(seconds=15))    # 1.5 times slower than expected
+        self.assertEqual(execution.percent_complete, 25)
+        self.assertEqual(execution.estimated_end, start + timedelta(seconds=15 + 30 * 1.5))
+
+
+class TestKeywordProfiler(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        print('\nRunning robotapi keyword profiler unit tests in: ' + HERE)
+        cls.app = RobotApplicationUnderTest.objects.create(name='My Profiled Robot App', robot_location='robot',
+                                                           app_test_location=TEST_ROBOT_APP_DIR)
+
+    def test_histogram_percentiles(self):
+        histogram = dict()
+        for seconds in [0.1] * 90 + [5.0] * 10:
+            histograms.add(histogram, seconds)
+        self.assertAlmostEqual(histograms.percentile(histogram, 0.5), 0.1, delta=0.1 * 0.12)
+        self.assertAlmostEqual(histograms.percentile(histogram, 0.95), 5.0, delta=5.0 * 0.12)
+        self.assertEqual(histograms.loads(histograms.dumps(histogram)), histogram)
+
+    def test_timings_accumulate_across_runs(self):
+        for durations in ([0.2, 0.2, 30.0], [0.2]):
+            timings = KeywordTimings()
+            for seconds in durations:
+                timings.add('Wait Until Page Contains', seconds)
+            timings.add('BuiltIn.Log', 0.001)
+            timings.save(self.app)
+        slowest = list(slowest_keywords(self.app))
+        self.assertEqual([t.keyword for t in slowest], ['Wait Until Page Contains', 'BuiltIn.Log'])
+        self.assertEqual((slowest[0].call_count, slowest[0].max_duration), (4, 30.0))
+        self.assertAlmostEqual(slowest[0].total_duration, 30.6)
+        self.assertAlmostEqual(slowest[0].p50_duration, 0.2, delta=0.2 * 0.12)
+
+
+class TestRollups(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        print('\nRunning robotapi daily rollup unit tests in: ' + HERE)
+        cls.app = RobotApplicationUnderTest.objects.create(name='My Rolled Up Robot App', robot_location='robot',
+                                                           app_test_location=TEST_ROBOT_APP_DIR)
+        cls.top = RobotTestSuite.objects.create(name='Top', application=cls.app, parent=None)
+        cls.child = RobotTestSuite.objects.create(name='Child', application=cls.app, parent=cls.top)
+        cls.steady = RobotTest.objects.create(name='Steady', robot_suite=cls.top)
+        cls.flaky = RobotTest.objects.create(name='Flaky', robot_suite=cls.child)
+
+    def _run(self, test, result, start, seconds, status='complete', rolled_up=False):
+        execution = RobotExecution.objects.create(application=self.app, status='complete', start_time=start)
+        return RobotTestRun(robot_test=test, execution=execution, result=result, start_time=start,
+                            end_time=start + timedelta(seconds=seconds), duration_ms=seconds * 1000, status=status,
+                            rolled_up=rolled_up, application=self.app)
+
+    def _runs(self, rolled_up):
+        day = timezone.now().replace(hour=12) - timedelta(days=1)
+        runs = [self._run(self.steady, 'pass', day, 2, rolled_up=rolled_up),
+                self._run(self.flaky, 'pass', day, 4, rolled_up=rolled_up),
+                self._run(self.flaky, 'fail', day + timedelta(hours=1), 4, rolled_up=rolled_up),
+                self._run(self.flaky, 'pass', day + timedelta(days=1), 6, rolled_up=rolled_up),
+                self._run(self.flaky, 'pass', day, 1, status='cached', rolled_up=rolled_up)]
+        RobotTestRun.objects.bulk_create(runs)
+        return runs
+
+    def test_runs_are_rolled_up_per_test_suite_and_day(self):
+        runs = self._runs(rolled_up=True)
+        rollup_results(self.app, runs[:2])
+        rollup_results(self.app, runs[2:])
+        yesterday, today = trends(self.app, days=2)
+        self.assertEqual((yesterday['runs'], yesterday['passes'], yesterday['flips']), (3, 2, 1))
+        self.assertEqual((today['runs'], today['flips']), (1, 1))
+        self.assertAlmostEqual(yesterday['mean_duration'], 10 / 3)
+        self.assertAlmostEqual(today['p50_duration'], 6, delta=6 * 0.12)
+        self.assertEqual(RobotSuiteDailyRollup.objects.get(robot_suite=self.top, day=yesterday['day']).runs, 3)
+        self.assertEqual(RobotSuiteDailyRollup.objects.get(robot_suite=self.child, day=yesterday['day']).runs, 2)
+        self.assertEqual([d['pass_rate'] for d in trends(self.app, days=2, test=self.flaky)], [0.5, 1])
+        self.assertEqual([(t['robot_test'], t['flips']) for t in flakiest_tests(self.app)], [(self.flaky.pk, 2)])
+
+    def test_backfill_counts_every_run_once(self):
+        self._runs(rolled_up=False)
+        self.assertEqual(backfill_rollups(self.app), 4)
+        self.assertEqual(backfill_rollups(self.app), 0)
+        expected = list(RobotTestDailyRollup.objects.values_list('robot_test', 'day', 'runs', 'flips', 'last_result'))
+        self.assertEqual(backfill_rollups(self.app, rebuild=True), 4)
+        self.assertEqual(list(RobotTestDailyRollup.objects.values_list('robot_test', 'day', 'runs', 'flips',
+                                                                       'last_result')), expected)
+        self.assertEqual(sum(RobotApplicationDailyRollup.objects.values_list('runs', flat=True)), 4)
+
+    def test_duration_percentiles_and_slowest_tests(self):
+        self._runs(rolled_up=False)
+        since = timezone.now() - timedelta(days=3)
+        self.assertEqual(duration_percentiles(self.app, since)[self.flaky.pk], {0.5: 4000, 0.95: 6000, 0.99: 6000})
+        self.assertEqual([(t['robot_test'], t['runs'], t['max_ms']) for t in slowest_tests(self.app, since)],
+                         [(self.flaky.pk, 3, 6000), (self.steady.pk, 1, 2000)])   # Cached runs are not timed
+        self.assertEqual(duration_percentiles(self.app, since=timezone.now() + timedelta(days=2)), {})
+
+    def test_flaky_tests_are_quarantined_and_released(self):
+        start = timezone.now() - timedelta(days=1)
+        results = ['pass', 'fail', 'pass', 'fail', 'pass', 'pass']
+        RobotTestRun.objects.bulk_create(self._run(self.flaky, result, start + timedelta(minutes=i), 1)
+                                         for i, result in enumerate(results))
+        RobotTestRun.objects.bulk_create(self._run(self.steady, 'pass' if i < 3 else 'fail', start + timedelta(
+            minutes=i), 1) for i in range(6))
+        self.assertAlmostEqual(flakiness_scores([self.flaky.pk])[self.flaky.pk][0], 4 / 5)
+        version = catalog_version(self.app.pk)
+        self.assertEqual(update_quarantine(self.app, [self.flaky.pk, self.steady.pk]), ([self.flaky.pk], []))
+        self.assertGreater(catalog_version(self.app.pk), version)     # Cached tag previews show the quarantine tag
+        self.assertEqual(list(quarantined_tests(RobotTest.objects.all())), [self.flaky])
+        self.flaky.refresh_from_db()
+        self.assertAlmostEqual(self.flaky.flakiness, 0.8)
+        RobotTestRun.objects.bulk_create(self._run(self.flaky, 'pass', start + timedelta(hours=1, minutes=i), 1)
+                                         for i in range(18))
+        self.assertEqual(update_quarantine(self.app, [self.flaky.pk]), ([], [self.flaky.pk]))
+
+    def test_flips_after_a_change_are_not_flaky(self):
+        start = timezone.now() - timedelta(days=1)
+        runs = [self._run(self.flaky, result, start + timedelta(minutes=i), 1) for i, result in
+                enumerate(['pass', 'fail', 'pass', 'fail'])]
+        for run, fingerprint in zip(runs, ['a', 'b', 'c', 'c']):
+            run.fingerprint = fingerprint
+        RobotTestRun.objects.bulk_create(runs)
+        self.assertEqual(flakiness_scores([self.flaky.pk])[self.flaky.pk], (1 / 3, 4))
+
+    def test_compaction_keeps_rollups_and_latest_results(self):
+        self._runs(rolled_up=False)
+        self.assertEqual(compact_test_runs(now=timezone.now() + timedelta(days=5)), [])   # No retention configured
+        compacted = compact_test_runs(days=3, now=timezone.now() + timedelta(days=5), batch_size=2)
+        self.assertEqual(compacted, [(self.app, 4, 3)])
+        kept = RobotTestRun.objects.filter(robot_test__robot_suite__application=self.app)
+        self.assertEqual(kept.count(), 2)     # The latest run of each test
+        latest = kept.get(robot_test=self.flaky)
+        self.assertEqual(latest.end_time - latest.start_time, timedelta(seconds=6))
+        self.assertEqual(sum(RobotApplicationDailyRollup.objects.values_list('runs', flat=True)), 4)
+
+
+class TestResourceLocks(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        print('\nRunning robotapi resource lock unit tests in: ' + HERE)
+        cls.app = RobotApplicationUnderTest.objects.create(name='My Locking Robot App', robot_location='robot',
+                                                           app_test_location=TEST_ROBOT_APP_DIR)
+        suite = RobotTestSuite.objects.create(name='Payments', application=cls.app, parent=None)
+        cls.tests = [RobotTest.objects.create(name='Test {n}'.format(n=n), robot_suite=suite) for n in range(4)]
+        account = RobotTag.objects.create(name='lock:payments_account', application=cls.app)
+        device = RobotTag.objects.create(name='lock:card-reader', application=cls.app)
+        cls.tests[0].robot_tags.add(account)
+        cls.tests[1].robot_tags.add(account, device)
+        cls.tests[2].robot_tags.add(device)
+
+    def test_tests_sharing_resources_stay_in_one_shard(self):
+        resources = test_resources(RobotTest.objects.filter(robot_suite__application=self.app))
+        self.assertEqual(resources[self.tests[1].pk], {'paymentsaccount', 'card-reader'})
+        estimates = {self.tests[0].pk: 10, self.tests[1].pk: 10, self.tests[2].pk: 10, self.tests[3].pk: 5}
+        shards = plan_shards(estimates, resources, 3)
+        self.assertEqual([(s['tests'], s['expected_duration']) for s in shards],
+                         [([t.pk for t in self.tests[:3]], 30), ([self.tests[3].pk], 5), ([], 0)])
+        self.assertEqual(shards[0]['resources'], {'paymentsaccount', 'card-reader'})
+
+    def test_runs_needing_the_same_resource_take_turns(self):
+        first = RobotExecution.objects.create(application=self.app, status='in progress')
+        second = RobotExecution.objects.create(application=self.app, status='in progress')
+        self.assertEqual(acquire_resources(first, ['paymentsaccount']), [])
+        self.assertEqual(acquire_resources(second, ['card-reader', 'paymentsaccount'], timeout=0),
+                         ['paymentsaccount'])
+        self.assertEqual(list(second.resource_lock.all()), [])     # All or nothing
+        self.assertEqual(release_resources(first), 1)
+        self.assertEqual(acquire_resources(second, ['card-reader', 'paymentsaccount'], timeout=0), [])
+        second.status = 'error'     # Ended without releasing its resources
+        second.save()
+        self.assertEqual(acquire_resources(first, ['paymentsaccount'], timeout=0), [])
+
+    def test_run_waits_for_its_resources_before_admission(self):
+        holder = RobotExecution.objects.create(application=self.app, status='in progress')
+        acquire_resources(holder, ['paymentsaccount'])
+        engine = RobotExecutionEngine(tests=[self.tests[0]], lock_timeout=0)
+        engine.run_subprocess()
+        self.assertEqual(engine.execution.status, 'error')
+        self.assertIn('paymentsaccount', engine.robot_output)
+        self.assertEqual(list(engine.execution.resource_lock.all()), [])
+
+
+class TestAdmission(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        print('\nRunning robotapi admission control unit tests in: ' + HERE)
+        cls.app = RobotApplicationUnderTest.objects.create(name='My Crowded Robot App', robot_location='robot',
+                                                           app_test_location=TEST_ROBOT_APP_DIR,
+                                                           max_concurrent_runs=1)
+
+    def test_run_over_capacity_is_rejected_with_retry_after(self):
+        first = admit_execution(self.app)
+        self.assertEqual((first.status, first.host), ('in progress', socket.gethostname()))
+        first.estimated_end = timezone.now() + timedelta(minutes=10)
+        first.save()
+        self.assertIsNotNone(capacity_problem(self.app))
+        rejected = rejected_runs()
+        with self.assertRaises(RobotAdmissionException) as context:
+            admit_execution(self.app)
+        self.assertGreater(context.exception.retry_after, 590)
+        self.assertEqual(rejected_runs(), rejected + 1)
+
+    def test_queued_run_gives_up_after_the_queue_timeout(self):
+        first = admit_execution(self.app)
+        with self.assertRaises(RobotAdmissionException):
+            admit_execution(self.app, queue_timeout=0.05, poll_interval=0.01)
+        self.assertEqual(list(RobotExecution.objects.filter(status='queued')), [])
+        first.status = 'complete'
+        first.save()
+        self.assertEqual(admit_execution(self.app, queue_timeout=0.05, poll_interval=0.01).status, 'in progress')
+        self.assertTrue(RobotHost.objects.filter(name=socket.gethostname()).exists())
+
+    def test_runs_waiting_for_resources_take_no_slot(self):
+        waiting = RobotExecution.objects.create(application=self.app, status='waiting', host=socket.gethostname())
+        self.assertIsNone(capacity_problem(self.app))
+        admit_execution(self.app)
+        with self.assertRaises(RobotAdmissionException):
+            admit_execution(self.app, execution=waiting)
+        self.assertFalse(RobotExecution.objects.filter(pk=waiting.pk).exists())
+
+    def test_run_that_cannot_start_robot_frees_its_slot(self):
+        missing_robot = os.path.join(TEST_ROBOT_APP_DIR, 'missing', 'robot')
+        broken = RobotApplicationUnderTest.objects.create(name='My Broken Robot App', robot_location=missing_robot,
+                                                          app_test_location=TEST_ROBOT_APP_DIR, max_concurrent_runs=1)
+        engine = RobotExecutionEngine(application=broken)
+        with self.assertRaises(FileNotFoundError):
+            engine.run_subprocess()
+        execution = RobotExecution.objects.get(pk=engine.execution.pk)
+        self.assertEqual(execution.status, 'error')
+        self.assertIsNotNone(execution.end_time)
+        self.assertFalse([d for d in os.listdir(SCRATCH_ROOT) if d.startswith('execution-{pk}-'.format(
+            pk=execution.pk))], msg='The scratch directory of the failed run was not removed.')
+        self.assertIsNone(capacity_problem(broken))
+
+
+class TestMetrics(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        print('\nRunning robotapi metrics unit tests in: ' + HERE)
+        cls.app = RobotApplicationUnderTest.objects.create(name='My Measured Robot App', robot_location=HERE,
+                                                           app_test_location=TEST_ROBOT_APP_DIR)
+
+    def test_metrics_render_in_prometheus_text_format(self):
+        registry = metrics.Registry()
+        runs = metrics.Counter('runs_total', 'Runs.', ['status'], registry=registry)
+        seconds = metrics.Histogram('run_seconds', 'Run seconds.', buckets=(1, 10), registry=registry)
+        runs.inc(status='pass')
+        runs.inc(2, status='say "fail"')
+        for value in (0.5, 1, 30):
+            seconds.observe(value)
+        self.assertEqual(registry.render().split('\n'),
+                         ['# HELP runs_total Runs.',
+                          '# TYPE runs_total counter',
+                          'runs_total{status="pass"} 1',
+                          r'runs_total{status="say \"fail\""} 2',
+                          '# HELP run_seconds Run seconds.',
+                          '# TYPE run_seconds histogram',
+                          'run_seconds_bucket{le="1"} 2',
+                          'run_seconds_bucket{le="10"} 2',
+                          'run_seconds_bucket{le="+Inf"} 3',
+                          'run_seconds_sum 31.5',
+                          'run_seconds_count 3',
+                          ''])
+        with self.assertRaises(ValueError):
+            runs.inc()
+        with self.assertRaises(ValueError):
+            metrics.Counter('runs_total', 'Runs again.', registry=registry)
+
+    def test_discovery_phases_are_timed(self):
+        def phase_count(phase):
+            return sum(metrics.DISCOVERY_PHASE_SECONDS.values.get((phase,), [0])[:-1])
+        parsed, discovered = phase_count('parse'), phase_count('discover')
+        DiscoveredRobotApplication(self.app).discover_suites_and_tests()
+        self.assertEqual((phase_count('parse'), phase_count('discover')), (parsed + 1, discovered + 1))
+
 
 class TestExecution(TestCase):
     @classmethod
@@ -404,6 +983,19 @@ class TestExecution(TestCase):
                                                                                                                'tests'])
                                                                        )
 
+    def setUp(self):
+        self.addCleanup(self.remove_stored_blobs)
+
+    @staticmethod
+    def remove_stored_blobs():
+        for digest in RobotArtifactBlob.objects.values_list('digest', flat=True):
+            if os.path.isfile(blob_path(digest)):
+                os.remove(blob_path(digest))
+                try:
+                    os.removedirs(os.path.dirname(blob_path(digest)))
+                except OSError:
+                    pass
+
     @staticmethod
     def set_robot_for_app(app: RobotApplicationUnderTest, robot_location: str):
         app.robot_location = robot_location
@@ -467,6 +1059,254 @@ class TestExecution(TestCase):
                       msg='Test result did not contains the expected suite name.')
         self.addCleanup(self.set_robot_for_app, self.test_robot_app, HERE)
 
+    def test_execute_robot_records_results(self):
+        self.set_robot_for_app(self.test_robot_app, 'robot')
+        self.addCleanup(self.set_robot_for_app, self.test_robot_app, HERE)
+        suite = RobotTestSuite.objects.get(name='AppSubSuite2')
+        robot = RobotExecutionEngine(suites=[suite])
+        robot.run_subprocess()
+        self.addCleanup(shutil.rmtree, os.path.dirname(robot.execution.output_file), True)
+        self.assertEqual(robot.execution.status, 'complete')
+        self.assertTrue(robot.execution.output_file.endswith(SEP.join(['execution-' + str(robot.execution.pk),
+                                                                      'output.xml'])))
+        self.assertEqual(sorted((r.robot_test.name, r.result) for r in robot.execution.test_run.all()),
+                         [('Another Test', 'pass'), ('My Test', 'pass')])
+        self.assertEqual((robot.execution.expected_tests, robot.execution.completed_tests), (2, 2))
+        self.assertEqual(os.path.dirname(robot.execution.output_file), artifact_dir(robot.execution))
+        self.assertEqual(sorted(os.listdir(artifact_dir(robot.execution))), ['output.xml', 'output.xml.index'])
+        self.assertEqual(sorted(robot.execution.artifact.values_list('name', flat=True)),
+                         ['log.html', 'output.xml', 'report.html'])
+        self.assertTrue(os.path.isfile(index_path(robot.execution.output_file)))
+        with LogIndex(robot.execution.output_file) as index:
+            root = index.children()[0]
+            self.assertEqual((root.kind, root.name, root.status, root.child_count),
+                             ('suite', 'TestRobotAppSuite', 'PASS', 1))
+            suite = index.children(root)[0]
+            test = next(n for n in index.children(suite) if n.name == 'My Test')
+            log = index.children(test)[0]
+        self.assertEqual((test.kind, log.name, log.status), ('test', 'BuiltIn.Log', 'PASS'))
+        self.assertEqual([m['text'] for m in node_messages(robot.execution.output_file, log, 10)], ['Hello, world!'])
+        log_timing = RobotKeywordTiming.objects.get(application=self.test_robot_app, keyword='BuiltIn.Log')
+        self.assertEqual(log_timing.call_count, 1)
+        self.assertFalse([d for d in os.listdir(SCRATCH_ROOT) if d.startswith(
+            'execution-{pk}-'.format(pk=robot.execution.pk))], msg='The scratch directory of the run was not removed.')
+        self.assertIsNotNone(RobotTest.objects.get(name='My Test').duration_estimate)
+
+    def test_listener_progress_is_collected_while_running(self):
+        test = RobotTest.objects.get(name='My Test')
+        execution = RobotExecution.objects.create(application=self.test_robot_app, status='in progress')
+        collector = ResultCollector(execution)
+        host, port = collector.address.rsplit(':', 1)
+        listener = socket.create_connection((host, int(port)))
+        events = [{'event': 'start_suite', 'name': test.robot_suite.full_name, 'starttime': '20190304 03:13:00.000'},
+                  {'event': 'start_test', 'name': test.verbose_name, 'status': 'FAIL',
+                   'starttime': '20190304 03:13:00.000', 'endtime': None, 'message': ''}]
+        listener.sendall(''.join(json.dumps(e) + '\n' for e in events).encode('utf-8'))
+        for _ in range(50):
+            if collector.flush() or collector.test_runs:
+                break
+            time.sleep(0.1)
+        self.assertEqual(RobotTestRun.objects.get(execution=execution).status, 'in progress')
+        self.assertEqual(collector.suites, [test.robot_suite.full_name])
+        listener.sendall((json.dumps({'event': 'end_test', 'name': test.verbose_name, 'status': 'PASS',
+                                      'starttime': '20190304 03:13:00.000', 'endtime': '20190304 03:13:02.500',
+                                      'message': ''}) + '\n').encode('utf-8'))
+        listener.close()
+        collector.close()
+        test_run = RobotTestRun.objects.get(execution=execution)
+        self.assertEqual((test_run.result, test_run.status, test_run.duration_ms), ('pass', 'complete', 2500))
+        self.assertEqual(collector.finished_tests, 1)
+
+    def test_listener_progress_of_tests_with_dots_in_their_names(self):
+        suite = RobotTest.objects.get(name='My Test').robot_suite
+        test = RobotTest.objects.create(name='Verify v1.2 API', robot_suite=suite)
+        execution = RobotExecution.objects.create(application=self.test_robot_app, status='in progress')
+        collector = ResultCollector(execution)
+        host, port = collector.address.rsplit(':', 1)
+        listener = socket.create_connection((host, int(port)))
+        events = [{'event': 'start_suite', 'name': suite.full_name, 'starttime': '20190304 03:13:00.000'},
+                  {'event': 'start_test', 'name': test.verbose_name, 'status': 'FAIL',
+                   'starttime': '20190304 03:13:00.000', 'endtime': None, 'message': ''},
+                  {'event': 'end_test', 'name': test.verbose_name, 'status': 'PASS',
+                   'starttime': '20190304 03:13:00.000', 'endtime': '20190304 03:13:01.000', 'message': ''}]
+        listener.sendall(''.join(json.dumps(e) + '\n' for e in events).encode('utf-8'))
+        for _ in range(50):
+            if collector.flush():
+                break
+            time.sleep(0.1)
+        listener.close()
+        collector.close()
+        test_run = RobotTestRun.objects.get(execution=execution)
+        self.assertEqual((test_run.robot_test, test_run.result, test_run.duration_ms), (test, 'pass', 1000))
+
+    def test_identical_artifacts_are_stored_once_and_pruned(self):
+        old_run = RobotExecution.objects.create(application=self.test_robot_app, status='complete',
+                                                end_time=timezone.now() - timedelta(days=10))
+        new_run = RobotExecution.objects.create(application=self.test_robot_app, status='complete',
+                                                end_time=timezone.now())
+        for execution in (old_run, new_run):
+            directory = os.path.join(tempfile.mkdtemp(), 'screenshots')
+            self.addCleanup(shutil.rmtree, os.path.dirname(directory), True)
+            os.makedirs(directory)
+            with open(os.path.join(directory, 'selenium-screenshot-1.png'), 'wb') as screenshot:
+                screenshot.write(b'\x89PNG' + bytes(range(256)) * 100)
+            store_artifacts(execution, os.path.dirname(directory))
+            self.assertFalse(os.listdir(directory), msg='Stored artifacts should not stay in the output directory.')
+        blob = RobotArtifactBlob.objects.get()
+        self.assertEqual(RobotArtifact.objects.filter(blob=blob, name='screenshots/selenium-screenshot-1.png',
+                                                      content_type='image/png').count(), 2)
+        self.assertLess(blob.stored_size, blob.size)
+        self.set_robot_for_app(self.test_robot_app, HERE)
+        self.test_robot_app.artifact_retention_days = 7
+        self.test_robot_app.save()
+        self.assertEqual(prune_artifacts(), (1, 0))
+        self.assertEqual(prune_artifacts(now=timezone.now() + timedelta(days=30)), (1, 1))
+        self.assertFalse(os.path.isfile(blob_path(blob.digest)))
+        os.removedirs(os.path.dirname(blob_path(blob.digest)))
+
+    def test_reusing_an_orphaned_blob_keeps_it_from_being_pruned(self):
+        execution = RobotExecution.objects.create(application=self.test_robot_app, status='complete',
+                                                  end_time=timezone.now())
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+
+        def store_report():
+            with open(os.path.join(directory, 'report.html'), 'w') as report:
+                report.write('<html>the same report</html>')
+            store_artifacts(execution, directory)
+            RobotArtifact.objects.all().delete()    # orphaned, as if the run had expired
+            return RobotArtifactBlob.objects.get()
+
+        blob = store_report()
+        self.addCleanup(shutil.rmtree, os.path.dirname(os.path.dirname(blob_path(blob.digest))), True)
+        RobotArtifactBlob.objects.update(created=timezone.now() - timedelta(days=1))
+        self.assertEqual(store_report(), blob)
+        self.assertEqual(prune_artifacts(), (0, 0))
+        self.assertTrue(os.path.isfile(blob_path(blob.digest)))
+        self.assertEqual(prune_artifacts(now=timezone.now() + timedelta(days=1)), (0, 1))
+        self.assertFalse(os.path.isfile(blob_path(blob.digest)))
+
+    def test_clean_scratch_left_behind(self):
+        running = RobotExecution.objects.create(application=self.test_robot_app, status='in progress')
+        crashed = RobotExecution.objects.create(application=self.test_robot_app, status='error')
+        running_dir, crashed_dir = create_scratch_dir(running), create_scratch_dir(crashed)
+        self.addCleanup(shutil.rmtree, running_dir, True)
+        concurrent_dir = create_scratch_dir(running)
+        self.addCleanup(shutil.rmtree, concurrent_dir, True)
+        self.assertNotEqual(concurrent_dir, running_dir)
+        self.assertEqual(clean_scratch(), [])
+        removed = clean_scratch(max_age=0, now=time.time() + 1)
+        self.assertIn(crashed_dir, removed)
+        self.assertTrue(os.path.isdir(running_dir))
+        self.assertFalse(os.path.isdir(crashed_dir))
+
+    def test_rerun_failed_tests(self):
+        self.set_robot_for_app(self.test_robot_app, 'robot')
+        self.addCleanup(self.set_robot_for_app, self.test_robot_app, HERE)
+        first_run = RobotExecutionEngine(application=self.test_robot_app)
+        first_run.run_subprocess()
+        self.addCleanup(shutil.rmtree, os.path.dirname(first_run.execution.output_file), True)
+        failed = sorted(r.robot_test.verbose_name for r in first_run.execution.test_run.filter(result='fail'))
+        rerun = RobotExecutionEngine(application=self.test_robot_app, rerun_failed=True)
+        rerun.run_subprocess()
+        self.addCleanup(shutil.rmtree, os.path.dirname(rerun.execution.output_file), True)
+        self.assertEqual(sorted(t.verbose_name for t in rerun.tests), failed)
+        self.assertEqual((rerun.selected_count, rerun.total_count), (len(failed), 15))
+        self.assertEqual(rerun.execution.rerun_of, first_run.execution)
+        self.assertEqual(sorted(r.robot_test.verbose_name for r in rerun.execution.test_run.all()), failed)
+        merged = ExecutionResult(first_run.execution.output_file)  # The rerun was merged into the original output
+        self.assertEqual(merged.statistics.total.critical.total, 15)
+        with open(first_run.execution.output_file, encoding='utf-8') as output:
+            self.assertIn('Re-executed test has been merged.', output.read())
+
+    def test_rerun_failed_tests_twice_merges_into_the_original_run(self):
+        self.set_robot_for_app(self.test_robot_app, 'robot')
+        self.addCleanup(self.set_robot_for_app, self.test_robot_app, HERE)
+        first_run = RobotExecutionEngine(application=self.test_robot_app)
+        first_run.run_subprocess()
+        self.addCleanup(shutil.rmtree, os.path.dirname(first_run.execution.output_file), True)
+        failed = sorted(r.robot_test.verbose_name for r in first_run.execution.test_run.filter(result='fail'))
+        merges = list()
+        for _ in range(2):
+            rerun = RobotExecutionEngine(application=self.test_robot_app, rerun_failed=True)
+            rerun.run_subprocess()
+            self.addCleanup(shutil.rmtree, os.path.dirname(rerun.execution.output_file), True)
+            self.assertEqual(sorted(t.verbose_name for t in rerun.tests), failed)
+            self.assertEqual(rerun.execution.rerun_of, first_run.execution)
+            with open(first_run.execution.output_file, encoding='utf-8') as output:
+                merges.append(output.read().count('Re-executed test has been merged.'))
+        self.assertEqual(ExecutionResult(first_run.execution.output_file).statistics.total.critical.total, 15)
+        self.assertGreater(merges[1], merges[0])
+
+    def test_rerun_whose_results_cannot_be_merged_keeps_its_own_report(self):
+        self.set_robot_for_app(self.test_robot_app, 'robot')
+        self.addCleanup(self.set_robot_for_app, self.test_robot_app, HERE)
+        first_run = RobotExecutionEngine(application=self.test_robot_app)
+        first_run.run_subprocess()
+        self.addCleanup(shutil.rmtree, os.path.dirname(first_run.execution.output_file), True)
+        without_rebot = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, without_rebot)
+        robot = os.path.join(without_rebot, 'robot')
+        with open(robot, 'w') as script:
+            script.write('#!/bin/sh\nexec robot "$@"\n')
+        os.chmod(robot, 0o755)
+        self.set_robot_for_app(self.test_robot_app, robot)
+        rerun = RobotExecutionEngine(application=self.test_robot_app, rerun_failed=True)
+        rerun.run_subprocess()
+        self.addCleanup(shutil.rmtree, os.path.dirname(rerun.execution.output_file), True)
+        self.assertEqual(rerun.execution.status, 'complete')
+        self.assertEqual(rerun.execution.test_run.count(), len(rerun.tests))
+        self.assertIn('report.html', rerun.execution.artifact.values_list('name', flat=True))
+        with open(first_run.execution.output_file, encoding='utf-8') as output:
+            self.assertNotIn('Re-executed test has been merged.', output.read())
+
+    def test_rerun_failed_tests_of_the_latest_execution_only(self):
+        first, second = RobotTest.objects.filter(robot_suite__application=self.test_robot_app).order_by('pk')[:2]
+        older = RobotExecution.objects.create(application=self.test_robot_app, status='complete')
+        newer = RobotExecution.objects.create(application=self.test_robot_app, status='complete')
+        now = timezone.now()
+        for test, execution in ((first, older), (second, newer)):
+            RobotTestRun.objects.create(robot_test=test, execution=execution, result='fail', status='complete',
+                                        start_time=now, end_time=now)
+        rerun = RobotExecutionEngine(application=self.test_robot_app, rerun_failed=True)
+        self.assertEqual(rerun.select_failed_tests(), [second])
+        self.assertEqual((rerun.rerun_of, rerun.selected_count, rerun.failed_count), (newer, 1, 2))
+
+    def test_reuse_results_of_unchanged_cacheable_tests(self):
+        self.set_robot_for_app(self.test_robot_app, 'robot')
+        self.addCleanup(self.set_robot_for_app, self.test_robot_app, HERE)
+        suite = RobotTestSuite.objects.get(name='AppSubSuite2')
+        cacheable = RobotTag.objects.create(name='cacheable', application=self.test_robot_app)
+        RobotTest.objects.get(name='My Test').robot_tags.add(cacheable)
+        first_run = RobotExecutionEngine(suites=[suite], variables={'MESSAGE': 'Hello, world!'})
+        first_run.run_subprocess()
+        self.addCleanup(shutil.rmtree, os.path.dirname(first_run.execution.output_file), True)
+        self.assertEqual(list(first_run.fingerprints), [RobotTest.objects.get(name='My Test').pk])
+        second_run = RobotExecutionEngine(suites=[suite], variables={'MESSAGE': 'Hello, world!'})
+        second_run.run_subprocess()
+        self.addCleanup(shutil.rmtree, os.path.dirname(second_run.execution.output_file), True)
+        self.assertEqual(sorted((r.robot_test.name, r.status) for r in second_run.execution.test_run.all()),
+                         [('Another Test', 'complete'), ('My Test', 'cached')])
+        other_variables = RobotExecutionEngine(suites=[suite], variables={'MESSAGE': 'Hello, world!', 'A': 'b'})
+        other_variables.run_subprocess()
+        self.addCleanup(shutil.rmtree, os.path.dirname(other_variables.execution.output_file), True)
+        self.assertEqual(other_variables.reused, dict())
+        self.assertEqual(other_variables.execution.test_run.filter(status='cached').count(), 0)
+
+    def test_quarantined_tests_are_left_out_of_suite_runs(self):
+        suite = RobotTestSuite.objects.get(name='AppSubSuite2')
+        quarantined = RobotTag.objects.create(name='quarantined', application=self.test_robot_app)
+        RobotTest.objects.get(name='My Test').robot_tags.add(quarantined)
+        gating = RobotExecutionEngine(suites=[suite])
+        self.assertEqual([t.name for t in gating.select_quarantined_tests()], ['Another Test'])
+        self.assertEqual((gating.quarantined_count, gating.suites), (1, None))
+        retry_lane = RobotExecutionEngine(suites=[suite], quarantine='only', niceness=10)
+        self.assertEqual([t.name for t in retry_lane.select_quarantined_tests()], ['My Test'])
+        explicit = RobotExecutionEngine(tests=[RobotTest.objects.get(name='My Test')])
+        self.assertIsNone(explicit.select_quarantined_tests())
+        with self.assertRaises(RobotExecutionException):
+            RobotExecutionEngine(suites=[suite], quarantine='sometimes')
+
     def test_execute_robot_with_tags(self):
         include_tags = 'smokeORregression'
         exclude_tags = 'auth*'